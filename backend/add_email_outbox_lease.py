@@ -0,0 +1,37 @@
+"""
+Script de migration : réservation des emails de email_outbox par bail
+- ajoute le statut ENVOI_EN_COURS (email réservé par un worker jusqu'à next_attempt_at)
+- recrée l'index partiel ix_email_outbox_pending pour inclure les réservations expirées
+"""
+from sqlalchemy import text
+from app.database import engine
+
+
+def migrate_database():
+    """Ajoute le statut ENVOI_EN_COURS et recrée l'index des emails à envoyer"""
+    try:
+        print("Début de la migration...")
+
+        # ADD VALUE hors transaction : la nouvelle valeur n'est utilisable qu'après son commit
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ALTER TYPE emailoutboxstatus ADD VALUE IF NOT EXISTS 'ENVOI_EN_COURS'"))
+        print("OK - Statut 'ENVOI_EN_COURS' présent")
+
+        with engine.connect() as conn:
+            conn.execute(text("DROP INDEX IF EXISTS ix_email_outbox_pending"))
+            conn.execute(text("""
+                CREATE INDEX ix_email_outbox_pending ON email_outbox (next_attempt_at)
+                WHERE status IN ('EN_ATTENTE', 'ENVOI_EN_COURS')
+            """))
+            conn.commit()
+        print("OK - Index 'ix_email_outbox_pending' recréé")
+
+        print("\nMigration terminée avec succès !")
+        print("Arrêter les workers d'envoi avant la migration, les relancer ensuite")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,25 @@
+"""
+Script de migration : crée la table email_outbox (file d'attente durable des emails sortants)
+"""
+from app.database import engine
+from app import models
+
+
+def migrate_database():
+    """Crée la table email_outbox et son index partiel sur les emails en attente"""
+    try:
+        print("Début de la migration...")
+
+        # create() crée aussi le type enum et l'index ix_email_outbox_pending
+        models.EmailOutbox.__table__.create(bind=engine, checkfirst=True)
+        print("OK - Table 'email_outbox' présente")
+
+        print("\nMigration terminée avec succès !")
+        print("Lancer le worker d'envoi : python -m app.email_worker")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,53 @@
+"""
+Script de migration : chiffrement du mot de passe SMTP enregistré dans email_settings
+- ajoute la colonne smtp_password_encrypted
+- chiffre le mot de passe en clair existant avec EMAIL_SETTINGS_KEY
+- supprime la colonne smtp_password (mot de passe en clair)
+
+Sans EMAIL_SETTINGS_KEY, la migration s'arrête si un mot de passe en clair est enregistré.
+"""
+from sqlalchemy import text
+from app.database import engine
+from app.email_settings import EMAIL_SETTINGS_KEY, encrypt_password
+
+
+def migrate_database():
+    """Remplace email_settings.smtp_password par smtp_password_encrypted"""
+    try:
+        print("Début de la migration...")
+
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE email_settings ADD COLUMN IF NOT EXISTS smtp_password_encrypted TEXT"))
+            print("OK - Colonne 'smtp_password_encrypted' présente")
+
+            has_plaintext_column = conn.execute(text("""
+                SELECT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_name = 'email_settings' AND column_name = 'smtp_password'
+                )
+            """)).scalar()
+            if has_plaintext_column:
+                rows = conn.execute(text(
+                    "SELECT id, smtp_password FROM email_settings WHERE smtp_password IS NOT NULL AND smtp_password <> ''"
+                )).all()
+                if rows and not EMAIL_SETTINGS_KEY:
+                    print("ERREUR - Mot de passe SMTP en clair enregistré : définir EMAIL_SETTINGS_KEY puis relancer")
+                    return
+                for row_id, password in rows:
+                    conn.execute(
+                        text("UPDATE email_settings SET smtp_password_encrypted = :encrypted WHERE id = :id"),
+                        {"encrypted": encrypt_password(password), "id": row_id},
+                    )
+                conn.execute(text("ALTER TABLE email_settings DROP COLUMN smtp_password"))
+                print(f"OK - {len(rows)} mot(s) de passe chiffré(s), colonne 'smtp_password' supprimée")
+
+            conn.commit()
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
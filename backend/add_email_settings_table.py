@@ -0,0 +1,24 @@
+"""
+Script de migration : crée la table email_settings (paramètres email de la page Paramètres,
+partagés entre l'API et le worker d'envoi)
+"""
+from app.database import engine
+from app import models
+
+
+def migrate_database():
+    """Crée la table email_settings"""
+    try:
+        print("Début de la migration...")
+
+        models.EmailSettings.__table__.create(bind=engine, checkfirst=True)
+        print("OK - Table 'email_settings' présente")
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
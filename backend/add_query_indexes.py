@@ -0,0 +1,80 @@
+"""
+Script de migration : index composites et partiels des requêtes les plus fréquentes
+- listes paginées de tickets (tous, créés par, assignés à un utilisateur)
+- charge des techniciens, tickets résolus à rappeler ou clôturer (scheduler)
+- notifications d'un utilisateur, historique et commentaires d'un ticket
+
+Les index sont déclarés dans app/models.py ; ils sont créés ici avec CONCURRENTLY
+pour ne pas bloquer les écritures pendant la construction.
+"""
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from app import models
+from app.database import engine
+
+QUERY_INDEXES = {
+    "tickets": [
+        "ix_tickets_created_at_id",
+        "ix_tickets_creator_created_at",
+        "ix_tickets_technician_created_at",
+        "ix_tickets_technician_status",
+        "ix_tickets_status_resolved_at",
+    ],
+    "notifications": [
+        "ix_notifications_user_created_at",
+        "ix_notifications_user_unread",
+        "ix_notifications_ticket_type",
+    ],
+    "ticket_history": ["ix_ticket_history_ticket_status_changed_at"],
+    "comments": ["ix_comments_ticket_created_at"],
+}
+
+
+def create_index_sql(index, concurrently: bool = True) -> str:
+    statement = str(CreateIndex(index, if_not_exists=True).compile(dialect=postgresql.dialect()))
+    if not concurrently:
+        return statement
+    return statement.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+
+
+def migrate_database():
+    """Crée les index manquants sans verrouiller les tables en écriture"""
+    try:
+        print("Début de la migration...")
+
+        # CREATE INDEX CONCURRENTLY ne peut pas s'exécuter dans une transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for table_name, index_names in QUERY_INDEXES.items():
+                indexes = {index.name: index for index in models.Base.metadata.tables[table_name].indexes}
+                # CONCURRENTLY n'est pas possible sur une table partitionnée (notifications)
+                partitioned = conn.exec_driver_sql(
+                    f"SELECT relkind = 'p' FROM pg_class WHERE relname = '{table_name}'"
+                ).scalar()
+                for index_name in index_names:
+                    # Un index laissé invalide par une construction interrompue est reconstruit
+                    conn.exec_driver_sql(f"""
+                        DO $$
+                        BEGIN
+                            IF EXISTS (
+                                SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+                                WHERE pg_class.relname = '{index_name}' AND NOT pg_index.indisvalid
+                            ) THEN
+                                EXECUTE 'DROP INDEX {index_name}';
+                            END IF;
+                        END $$
+                    """)
+                    conn.exec_driver_sql(create_index_sql(indexes[index_name], concurrently=not partitioned))
+                    print(f"OK - Index '{index_name}' présent sur '{table_name}'")
+
+            conn.exec_driver_sql("ANALYZE tickets, notifications, ticket_history, comments")
+            print("OK - Statistiques mises à jour")
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,31 @@
+"""
+Script de migration : événements temps réel pour le flux GET /notifications/stream
+- trigger sur notifications : pg_notify à chaque insertion
+- trigger sur tickets : pg_notify à chaque création ou modification
+"""
+from sqlalchemy import text
+from app.database import engine
+from app.models import REALTIME_DDL
+
+
+def migrate_database():
+    """Crée les fonctions et triggers de publication LISTEN/NOTIFY"""
+    try:
+        print("Début de la migration...")
+
+        with engine.connect() as conn:
+            for table_name, statements in REALTIME_DDL.items():
+                for statement in statements:
+                    conn.execute(text(statement))
+                print(f"OK - Trigger de publication créé sur '{table_name}'")
+
+            conn.commit()
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,30 @@
+"""
+Script de migration : invalidation du cache des données de référence (app/reference_data.py)
+- triggers sur roles, ticket_types et ticket_categories : pg_notify à chaque modification
+"""
+from sqlalchemy import text
+from app.database import engine
+from app.models import REFERENCE_DATA_DDL
+
+
+def migrate_database():
+    """Crée la fonction et les triggers de publication des modifications"""
+    try:
+        print("Début de la migration...")
+
+        with engine.connect() as conn:
+            for table_name, statements in REFERENCE_DATA_DDL.items():
+                for statement in statements:
+                    conn.execute(text(statement))
+                print(f"OK - Trigger de publication créé sur '{table_name}'")
+
+            conn.commit()
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
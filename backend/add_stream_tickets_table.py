@@ -0,0 +1,24 @@
+"""
+Script de migration : crée la table stream_tickets (tickets à usage unique d'ouverture du flux
+SSE /notifications/stream, qui remplacent le JWT passé dans l'URL)
+"""
+from app.database import engine
+from app import models
+
+
+def migrate_database():
+    """Crée la table stream_tickets"""
+    try:
+        print("Début de la migration...")
+
+        models.StreamTicket.__table__.create(bind=engine, checkfirst=True)
+        print("OK - Table 'stream_tickets' présente")
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,39 @@
+"""
+Script de migration : crée la table technician_metrics et la remplit pour tous les techniciens
+"""
+from app.database import engine, SessionLocal
+from app import models
+from app.technician_metrics import refresh_technician_metrics
+
+
+def migrate_database():
+    """Crée la table technician_metrics puis calcule les métriques de chaque technicien"""
+    db = SessionLocal()
+    try:
+        print("Début de la migration...")
+
+        models.TechnicianMetrics.__table__.create(bind=engine, checkfirst=True)
+        print("OK - Table 'technician_metrics' présente")
+
+        technician_ids = [
+            row[0]
+            for row in db.query(models.User.id)
+            .join(models.Role, models.User.role_id == models.Role.id)
+            .filter(models.Role.name == "Technicien")
+            .all()
+        ]
+        refresh_technician_metrics(db, technician_ids)
+        db.commit()
+        print(f"OK - Métriques calculées pour {len(technician_ids)} technicien(s)")
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate_database()
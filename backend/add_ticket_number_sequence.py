@@ -0,0 +1,43 @@
+"""
+Script de migration : numéros de ticket attribués par une séquence PostgreSQL
+- crée la séquence tickets_number_seq, initialisée après le plus grand numéro existant
+- définit nextval('tickets_number_seq') comme valeur par défaut de tickets.number
+"""
+from sqlalchemy import text
+from app.database import engine
+
+
+def migrate_database():
+    """Crée et initialise la séquence des numéros de ticket"""
+    try:
+        print("Début de la migration...")
+
+        with engine.connect() as conn:
+            # Empêcher toute création de ticket pendant l'initialisation de la séquence
+            conn.execute(text("LOCK TABLE tickets IN SHARE ROW EXCLUSIVE MODE"))
+
+            conn.execute(text("CREATE SEQUENCE IF NOT EXISTS tickets_number_seq OWNED BY tickets.number"))
+            print("OK - Séquence 'tickets_number_seq' présente")
+
+            next_number = conn.execute(text("""
+                SELECT setval('tickets_number_seq', COALESCE(MAX(number), 0) + 1, false)
+                FROM tickets
+            """)).scalar()
+            print(f"OK - Prochain numéro de ticket : {next_number}")
+
+            conn.execute(text("""
+                ALTER TABLE tickets
+                ALTER COLUMN number SET DEFAULT nextval('tickets_number_seq')
+            """))
+            print("OK - Valeur par défaut de 'tickets.number' définie")
+
+            conn.commit()
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,66 @@
+"""
+Script de migration : ajoute la recherche plein texte sur les tickets
+- colonne générée search_vector (tsvector, configuration française) sur titre + description
+- index GIN sur search_vector
+- index trigrammes (pg_trgm) sur le titre pour les recherches partielles
+"""
+from sqlalchemy import text
+from app.database import engine
+
+
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('french', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('french', coalesce(description, '')), 'B')"
+)
+
+
+def migrate_database():
+    """Ajoute la colonne search_vector et les index de recherche à la table tickets"""
+    try:
+        print("Début de la migration...")
+
+        with engine.connect() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            print("OK - Extension 'pg_trgm' disponible")
+
+            # Vérifier si la colonne existe déjà
+            result = conn.execute(text("""
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE table_name = 'tickets' AND column_name = 'search_vector'
+            """))
+            columns = [row[0] for row in result]
+
+            if 'search_vector' not in columns:
+                print("Ajout de la colonne 'search_vector' dans la table 'tickets' (calcul sur les tickets existants)...")
+                conn.execute(text(f"""
+                    ALTER TABLE tickets
+                    ADD COLUMN search_vector tsvector
+                    GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPRESSION}) STORED
+                """))
+                print("OK - Colonne 'search_vector' ajoutée dans 'tickets'")
+            else:
+                print("OK - La colonne 'search_vector' existe déjà dans 'tickets'")
+
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_tickets_search_vector
+                ON tickets USING gin (search_vector)
+            """))
+            print("OK - Index 'ix_tickets_search_vector' présent")
+
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_tickets_title_trgm
+                ON tickets USING gin (title gin_trgm_ops)
+            """))
+            print("OK - Index 'ix_tickets_title_trgm' présent")
+
+            conn.commit()
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
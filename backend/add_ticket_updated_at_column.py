@@ -0,0 +1,51 @@
+"""
+Script de migration : date de dernière modification des tickets (tickets.updated_at)
+- ajoute la colonne, initialisée avec la date du dernier événement connu du ticket
+- crée le trigger qui la met à jour à chaque modification
+- crée l'index utilisé par l'ETag de la liste complète des tickets
+"""
+from sqlalchemy import text
+from app.database import engine
+from app.models import TICKET_UPDATED_AT_DDL
+
+
+def migrate_database():
+    """Ajoute et initialise tickets.updated_at"""
+    try:
+        print("Début de la migration...")
+
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE tickets ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITHOUT TIME ZONE"))
+            # Pas d'événement temps réel (trigger de publication) pour l'initialisation de la colonne
+            conn.execute(text("ALTER TABLE tickets DISABLE TRIGGER USER"))
+            updated = conn.execute(text("""
+                UPDATE tickets
+                SET updated_at = greatest(created_at, assigned_at, resolved_at, closed_at, auto_closed_at)
+                WHERE updated_at IS NULL
+            """)).rowcount
+            conn.execute(text("UPDATE tickets SET updated_at = now() AT TIME ZONE 'utc' WHERE updated_at IS NULL"))
+            conn.execute(text("ALTER TABLE tickets ENABLE TRIGGER USER"))
+            conn.execute(text("""
+                ALTER TABLE tickets
+                ALTER COLUMN updated_at SET DEFAULT (now() AT TIME ZONE 'utc'),
+                ALTER COLUMN updated_at SET NOT NULL
+            """))
+            print(f"OK - Colonne 'updated_at' ajoutée ({updated} ticket(s) initialisé(s))")
+
+            for statement in TICKET_UPDATED_AT_DDL:
+                conn.execute(text(statement))
+            print("OK - Trigger de mise à jour de 'updated_at' créé")
+
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_tickets_updated_at ON tickets (updated_at)"))
+            print("OK - Index 'ix_tickets_updated_at' présent")
+
+            conn.commit()
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
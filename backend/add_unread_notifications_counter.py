@@ -0,0 +1,48 @@
+"""
+Script de migration : compteur de notifications non lues par utilisateur
+- ajoute la colonne users.unread_notifications_count
+- la recalcule à partir de la table notifications
+- crée les triggers qui la tiennent à jour (insertion, lecture, suppression de notifications)
+"""
+from sqlalchemy import text
+from app.database import engine
+from app.models import UNREAD_COUNTER_DDL
+
+
+def migrate_database():
+    """Ajoute et initialise le compteur de notifications non lues"""
+    try:
+        print("Début de la migration...")
+
+        with engine.connect() as conn:
+            conn.execute(text("""
+                ALTER TABLE users
+                ADD COLUMN IF NOT EXISTS unread_notifications_count INTEGER NOT NULL DEFAULT 0
+            """))
+            print("OK - Colonne 'unread_notifications_count' présente")
+
+            # Bloquer les écritures sur notifications entre le recalcul et la pose des triggers
+            conn.execute(text("LOCK TABLE notifications IN SHARE ROW EXCLUSIVE MODE"))
+
+            updated = conn.execute(text("""
+                UPDATE users SET unread_notifications_count = coalesce((
+                    SELECT count(*) FROM notifications
+                    WHERE notifications.user_id = users.id AND notifications.read IS FALSE
+                ), 0)
+            """)).rowcount
+            print(f"OK - Compteur recalculé pour {updated} utilisateur(s)")
+
+            for statement in UNREAD_COUNTER_DDL:
+                conn.execute(text(statement))
+            print("OK - Triggers de mise à jour du compteur créés")
+
+            conn.commit()
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,52 @@
+"""
+Script de migration : date de dernière modification des utilisateurs (users.updated_at)
+- ajoute la colonne, initialisée avec la date de création de l'utilisateur, et son index
+- crée le trigger qui la met à jour quand une information affichée dans les tickets change,
+  et celui qui date les utilisateurs d'un rôle modifié
+- remplace la fonction du trigger de tickets.updated_at (clock_timestamp() au lieu de now())
+"""
+from sqlalchemy import text
+from app.database import engine
+from app.models import ROLE_TOUCH_USERS_DDL, TICKET_UPDATED_AT_DDL, USER_UPDATED_AT_DDL
+
+
+def migrate_database():
+    """Ajoute users.updated_at et met à jour les triggers de date de modification"""
+    try:
+        print("Début de la migration...")
+
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITHOUT TIME ZONE"))
+            updated = conn.execute(text("""
+                UPDATE users
+                SET updated_at = coalesce(created_at, now() AT TIME ZONE 'utc')
+                WHERE updated_at IS NULL
+            """)).rowcount
+            conn.execute(text("""
+                ALTER TABLE users
+                ALTER COLUMN updated_at SET DEFAULT (now() AT TIME ZONE 'utc'),
+                ALTER COLUMN updated_at SET NOT NULL
+            """))
+            print(f"OK - Colonne 'updated_at' ajoutée ({updated} utilisateur(s) initialisé(s))")
+
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_updated_at ON users (updated_at)"))
+            print("OK - Index 'ix_users_updated_at' présent")
+
+            for statement in USER_UPDATED_AT_DDL + ROLE_TOUCH_USERS_DDL:
+                conn.execute(text(statement))
+            print("OK - Triggers de mise à jour de 'users.updated_at' créés")
+
+            for statement in TICKET_UPDATED_AT_DDL:
+                conn.execute(text(statement))
+            print("OK - Trigger de 'tickets.updated_at' mis à jour (clock_timestamp)")
+
+            conn.commit()
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        print(f"ERREUR lors de la migration: {e}")
+
+
+if __name__ == "__main__":
+    migrate_database()
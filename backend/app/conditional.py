@@ -0,0 +1,46 @@
+"""
+Requêtes conditionnelles (ETag / If-None-Match) pour les listes interrogées en boucle.
+
+L'ETag est calculé à partir d'une empreinte peu coûteuse de la portée de la requête (nombre de
+lignes, date de dernière modification) : une liste inchangée est renvoyée en 304 sans charger
+ni sérialiser les lignes. Le navigateur renvoie lui-même If-None-Match grâce à Cache-Control.
+"""
+import hashlib
+
+from fastapi import Request, Response, status
+
+# Réponse propre à l'utilisateur, à revalider à chaque utilisation
+CACHE_CONTROL = "private, no-cache"
+
+
+def compute_etag(request: Request, *fingerprint) -> str:
+    """
+    ETag faible : chemin, paramètres de la requête et empreinte des données.
+    Faible car GZipMiddleware envoie le même ETag pour le corps compressé et non compressé :
+    les octets diffèrent, seul le contenu est équivalent.
+    """
+    parts = [request.url.path, str(sorted(request.query_params.multi_items()))]
+    parts.extend(str(part) for part in fingerprint)
+    return 'W/"' + hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Comparaison faible (RFC 9110) : un proxy peut avoir affaibli l'ETag lors de la compression
+    return etag.removeprefix("W/") in {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+
+
+def not_modified(etag: str, cache_control: str = CACHE_CONTROL) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
+
+
+def set_etag(response: Response, etag: str, cache_control: str = CACHE_CONTROL) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
@@ -1,11 +1,17 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError, DisconnectionError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import OperationalError, DisconnectionError
-from fastapi import HTTPException, status
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+import asyncio
 import os
 
+import asyncpg
 from dotenv import load_dotenv
 
+from .metrics import MeasuredQueuePool, instrument_engine
+
 load_dotenv()
 
 
@@ -20,6 +26,15 @@ DATABASE_URL = (
     f"@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 )
 
+# Dimensionnement du pool de connexions : les endpoints synchrones s'exécutent dans un
+# threadpool de 40 threads, pool_size + max_overflow doit pouvoir les servir
+POOL_SETTINGS = {
+    "size": int(os.getenv("DB_POOL_SIZE", "20")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "timeout_seconds": float(os.getenv("DB_POOL_TIMEOUT", "30")),  # Attente max d'une connexion libre
+    "recycle_seconds": int(os.getenv("DB_POOL_RECYCLE", "1800")),  # Renouveler les connexions anciennes
+}
+
 # Ajouter un timeout de connexion pour éviter les blocages
 engine = create_engine(
     DATABASE_URL, 
@@ -30,31 +45,130 @@ engine = create_engine(
         "options": "-c statement_timeout=10000"  # Timeout de 10 secondes pour les requêtes
     },
     pool_pre_ping=True,  # Vérifier la connexion avant de l'utiliser
+    poolclass=MeasuredQueuePool,
+    pool_size=POOL_SETTINGS["size"],
+    max_overflow=POOL_SETTINGS["max_overflow"],
+    pool_timeout=POOL_SETTINGS["timeout_seconds"],
+    pool_recycle=POOL_SETTINGS["recycle_seconds"],
 )
+instrument_engine(engine, POOL_SETTINGS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Moteur asynchrone (asyncpg) pour les endpoints de lecture très sollicités (listes, notifications) :
+# une requête en attente de PostgreSQL n'occupe pas de thread. Les endpoints synchrones
+# continuent d'utiliser engine/SessionLocal.
+# Pool distinct et plus petit : il s'ajoute au pool synchrone (voir le total par processus
+# dans .env.example, à comparer à max_connections de PostgreSQL)
+ASYNC_POOL_SETTINGS = {
+    "size": int(os.getenv("DB_ASYNC_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "5")),
+    "timeout_seconds": POOL_SETTINGS["timeout_seconds"],
+    "recycle_seconds": POOL_SETTINGS["recycle_seconds"],
+}
+ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}"
+    f"@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+)
+
+
+
+class DatabaseUnavailableError(Exception):
+    """PostgreSQL injoignable à l'ouverture d'une connexion asyncpg (connexion refusée, délai dépassé)"""
+
+
+async def _connect_asyncpg():
+    """
+    Ouverture d'une connexion du pool asynchrone. asyncpg remonte les erreurs réseau brutes
+    (OSError) : elles sont converties ici, à l'ouverture seulement, pour ne pas confondre une base
+    injoignable avec une autre erreur réseau d'un endpoint (SMTP...).
+    """
+    try:
+        return await asyncpg.connect(
+            host=POSTGRES_HOST,
+            port=int(POSTGRES_PORT),
+            user=POSTGRES_USER,
+            password=POSTGRES_PASSWORD,
+            database=POSTGRES_DB,
+            timeout=5,  # Timeout de 5 secondes pour la connexion
+            server_settings={"statement_timeout": "10000"},  # Timeout de 10 secondes pour les requêtes
+        )
+    except (OSError, asyncio.TimeoutError) as e:
+        raise DatabaseUnavailableError(str(e)) from e
+
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    async_creator=_connect_asyncpg,
+    pool_pre_ping=True,
+    pool_size=ASYNC_POOL_SETTINGS["size"],
+    max_overflow=ASYNC_POOL_SETTINGS["max_overflow"],
+    pool_timeout=ASYNC_POOL_SETTINGS["timeout_seconds"],
+    pool_recycle=ASYNC_POOL_SETTINGS["recycle_seconds"],
+)
+# expire_on_commit=False : les objets restent lisibles après commit sans nouvelle requête
+# (le chargement implicite d'attributs n'est pas possible en asynchrone)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
 def get_db():
+    """
+    Fournit une session par requête. La connexion est vérifiée une seule fois, au moment où
+    la session l'emprunte au pool (pool_pre_ping) : pas de requête de test supplémentaire ici.
+    Une base indisponible est convertie en 503 par database_unavailable_handler.
+    """
     db = SessionLocal()
     try:
-        # Tester la connexion avant de continuer
-        db.execute(text("SELECT 1"))
         yield db
-    except (OperationalError, DisconnectionError) as e:
-        db.close()
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Impossible de se connecter à la base de données. Vérifiez que PostgreSQL est démarré. Erreur: {str(e)}"
-        )
-    except Exception as e:
-        db.close()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Erreur de base de données: {str(e)}"
-        )
     finally:
         db.close()
 
 
+async def get_async_db():
+    """Équivalent asynchrone de get_db, pour les endpoints async def"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def is_connection_failure(exc: Exception) -> bool:
+    """
+    Vraie erreur de connexion : ouverture impossible, connexion coupée ou pool saturé.
+    Délais de requête (statement_timeout), interblocages et autres erreurs SQL n'en sont pas.
+    """
+    if isinstance(exc, (DatabaseUnavailableError, DisconnectionError, PoolTimeoutError)):
+        return True
+    if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+        return True
+    # Échec à l'ouverture par le pool : aucune requête ni code SQLSTATE (le serveur n'a pas répondu)
+    return (
+        isinstance(exc, OperationalError)
+        and exc.statement is None
+        and getattr(exc.orig, "pgcode", None) is None
+    )
+
+
+def database_unavailable_handler(request: Request, exc: Exception) -> JSONResponse:
+    """Réponse 503 quand PostgreSQL est injoignable (connexion refusée, coupée, délai dépassé)"""
+    print(f"Base de données indisponible ({request.method} {request.url.path}): {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "detail": "Impossible de se connecter à la base de données. Vérifiez que PostgreSQL est démarré."
+        },
+    )
+
+
+def database_error_handler(request: Request, exc: Exception) -> JSONResponse:
+    """
+    Erreurs SQLAlchemy non gérées par les endpoints : 503 pour une erreur de connexion, 500 sinon.
+    Le détail (requête SQL, paramètres) n'est écrit que dans les logs du serveur.
+    """
+    if is_connection_failure(exc):
+        return database_unavailable_handler(request, exc)
+    print(f"Erreur de base de données ({request.method} {request.url.path}): {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={"detail": "Erreur de base de données"},
+    )
@@ -0,0 +1,59 @@
+"""
+File d'attente durable des emails sortants (table email_outbox).
+Les endpoints et le scheduler déposent les envois ici, dans leur propre transaction,
+au lieu d'appeler le SMTP ; le worker (python -m app.email_worker) les envoie ensuite.
+"""
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .email_service import email_service
+
+
+def _check_method(method_name: str) -> None:
+    if not method_name.startswith("send_") or not callable(getattr(email_service, method_name, None)):
+        raise ValueError(f"Méthode d'envoi inconnue: {method_name}")
+
+
+def enqueue_email(db: Session, method_name: str, **kwargs) -> models.EmailOutbox:
+    """
+    Ajoute un envoi à la table email_outbox : method_name est le nom d'une méthode send_*
+    de EmailService, kwargs ses arguments (sérialisables en JSON).
+    La ligne est écrite au commit de la transaction de l'appelant : si la transaction est
+    annulée, aucun email n'est envoyé.
+    """
+    _check_method(method_name)
+    outbox = models.EmailOutbox(
+        method=method_name,
+        payload=kwargs,
+        status=models.EmailOutboxStatus.EN_ATTENTE,
+        attempts=0,
+    )
+    db.add(outbox)
+    return outbox
+
+
+def enqueue_emails(db: Session, method_name: str, kwargs_list: Iterable[dict]) -> int:
+    """
+    Variante en masse pour les tâches planifiées : un seul INSERT multi-lignes
+    pour tous les envois d'un lot. Retourne le nombre d'emails mis en file.
+    """
+    _check_method(method_name)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "method": method_name,
+            "payload": kwargs,
+            "status": models.EmailOutboxStatus.EN_ATTENTE,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }
+        for kwargs in kwargs_list
+    ]
+    if rows:
+        db.execute(insert(models.EmailOutbox), rows)
+    return len(rows)
@@ -3,15 +3,123 @@ Service d'envoi d'emails pour les notifications de tickets
 """
 import smtplib
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import List, Optional
+from typing import Callable, List, Optional
 from urllib.parse import urlencode
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+class SMTPConnectionPool:
+    """
+    Pool thread-safe de connexions SMTP persistantes.
+    Une connexion (connexion TCP + STARTTLS + login) est réutilisée pour plusieurs messages ;
+    au-delà de `keepalive_seconds` d'inactivité elle est vérifiée par un NOOP avant réutilisation,
+    et au-delà de `max_idle_seconds` elle est fermée et recréée.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], smtplib.SMTP],
+        size: int = 4,
+        keepalive_seconds: float = 30.0,
+        max_idle_seconds: float = 300.0,
+        acquire_timeout: float = 60.0,
+    ):
+        self._connect = connect
+        self.size = size
+        self.keepalive_seconds = keepalive_seconds
+        self.max_idle_seconds = max_idle_seconds
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """
+        Fournit une connexion prête à l'emploi. Si le bloc lève une exception,
+        la connexion est considérée comme invalide et fermée au lieu d'être remise au pool.
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError("Aucune connexion SMTP disponible dans le pool")
+        try:
+            server, generation = self._checkout()
+            try:
+                yield server
+            except BaseException:
+                self._close(server)
+                raise
+            self._checkin(server, generation)
+        finally:
+            self._slots.release()
+
+    def _checkout(self):
+        while True:
+            try:
+                server, generation, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            idle_for = time.monotonic() - last_used
+            if generation != self._generation or idle_for > self.max_idle_seconds:
+                self._close(server)
+                continue
+            if idle_for > self.keepalive_seconds and not self._is_alive(server):
+                self._close(server)
+                continue
+            return server, generation
+        return self._connect(), self._generation
+
+    def _checkin(self, server: smtplib.SMTP, generation: int) -> None:
+        if generation != self._generation:
+            # Paramètres SMTP modifiés depuis l'ouverture : ne pas réutiliser
+            self._close(server)
+            return
+        self._idle.put((server, generation, time.monotonic()))
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                server.close()
+            except OSError:
+                pass
+
+    def reset(self) -> None:
+        """Ferme les connexions inactives ; celles en cours d'utilisation seront fermées à leur retour"""
+        with self._lock:
+            self._generation += 1
+        while True:
+            try:
+                server, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(server)
+
+
+# Paramètres modifiables depuis la page Paramètres (table email_settings, voir app/email_settings.py)
+SETTINGS_FIELDS = (
+    "smtp_server", "smtp_port", "smtp_username", "smtp_password", "sender_email",
+    "sender_name", "use_tls", "verify_ssl", "email_enabled",
+)
+
+
 class EmailService:
     """Service pour envoyer des emails via SMTP"""
     
@@ -28,6 +136,48 @@ class EmailService:
         self.verify_ssl = os.getenv("VERIFY_SSL", "true").lower() == "true"
         self.app_base_url = os.getenv("APP_BASE_URL", "http://localhost:5173")
         self.email_enabled = os.getenv("EMAIL_ENABLED", "true").lower() == "true"
+        # Valeurs de l'environnement, reprises quand un paramètre n'est pas défini en base
+        self._defaults = {field: getattr(self, field) for field in SETTINGS_FIELDS}
+        
+        # Connexions SMTP persistantes partagées par toutes les méthodes send_*
+        self.smtp_pool = SMTPConnectionPool(
+            self._open_smtp_connection,
+            size=int(os.getenv("SMTP_POOL_SIZE", "4")),
+            keepalive_seconds=float(os.getenv("SMTP_KEEPALIVE_SECONDS", "30")),
+            max_idle_seconds=float(os.getenv("SMTP_MAX_IDLE_SECONDS", "300")),
+        )
+    
+    def _open_smtp_connection(self) -> smtplib.SMTP:
+        """Ouvre et authentifie une nouvelle connexion SMTP"""
+        if self.use_tls:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+            server.starttls()
+        else:
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=30)
+        
+        # Authentification si nécessaire
+        if self.smtp_username and self.smtp_password:
+            server.login(self.smtp_username, self.smtp_password)
+        return server
+    
+    def reset_smtp_connections(self) -> None:
+        """À appeler après une modification des paramètres SMTP"""
+        self.smtp_pool.reset()
+    
+    def apply_settings(self, overrides: dict) -> None:
+        """
+        Applique les paramètres enregistrés en base (None : valeur de l'environnement).
+        Les connexions SMTP ouvertes ne sont fermées que si un paramètre a changé.
+        """
+        values = {
+            field: overrides[field] if overrides.get(field) is not None else self._defaults[field]
+            for field in SETTINGS_FIELDS
+        }
+        if all(getattr(self, field) == value for field, value in values.items()):
+            return
+        for field, value in values.items():
+            setattr(self, field, value)
+        self.reset_smtp_connections()
     
     def _format_ticket_number(self, ticket_number: int) -> str:
         """Formate le numéro de ticket en TKT-XXX"""
@@ -92,20 +242,14 @@ class EmailService:
                 html_part = MIMEText(html_body, 'html', 'utf-8')
                 msg.attach(html_part)
             
-            # Connexion au serveur SMTP
-            if self.use_tls:
-                server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-                server.starttls()
-            else:
-                server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
-            
-            # Authentification si nécessaire
-            if self.smtp_username and self.smtp_password:
-                server.login(self.smtp_username, self.smtp_password)
-            
-            # Envoyer l'email
-            server.send_message(msg)
-            server.quit()
+            # Envoyer l'email via une connexion du pool ; une connexion coupée par le serveur
+            # est remplacée et l'envoi retenté une fois
+            try:
+                with self.smtp_pool.connection() as server:
+                    server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                with self.smtp_pool.connection() as server:
+                    server.send_message(msg)
             
             print(f"[EMAIL] Email envoyé avec succès à {to_emails}")
             return True
@@ -0,0 +1,81 @@
+"""
+Paramètres email partagés entre l'API et le worker d'envoi (table email_settings).
+
+La page Paramètres enregistre ses modifications en base ; le worker (python -m app.email_worker),
+seul processus qui envoie les emails de la file, les relit avant chaque lot.
+
+Le mot de passe SMTP est chiffré (Fernet) avec la clé EMAIL_SETTINGS_KEY. Sans cette clé, il ne
+peut pas être enregistré depuis la page Paramètres et reste celui de SMTP_PASSWORD (.env).
+"""
+import os
+from typing import Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+from sqlalchemy.orm import Session
+
+from . import models
+from .email_service import SETTINGS_FIELDS, email_service
+
+SETTINGS_ROW_ID = 1
+# Générer : python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
+EMAIL_SETTINGS_KEY = os.getenv("EMAIL_SETTINGS_KEY", "")
+_fernet = Fernet(EMAIL_SETTINGS_KEY.encode()) if EMAIL_SETTINGS_KEY else None
+
+
+class EmailSettingsError(ValueError):
+    """Paramètre impossible à enregistrer (mot de passe sans clé de chiffrement)"""
+
+
+def encrypt_password(password: str) -> str:
+    if _fernet is None:
+        raise EmailSettingsError(
+            "EMAIL_SETTINGS_KEY n'est pas configurée : le mot de passe SMTP ne peut pas être "
+            "enregistré en base (utiliser SMTP_PASSWORD dans le .env)"
+        )
+    return _fernet.encrypt(password.encode("utf-8")).decode("ascii")
+
+
+def decrypt_password(token: Optional[str]) -> Optional[str]:
+    """Mot de passe enregistré ; None (valeur du .env) s'il est absent ou illisible avec la clé actuelle"""
+    if not token:
+        return None
+    if _fernet is None:
+        print("[EMAIL] Mot de passe SMTP enregistré ignoré : EMAIL_SETTINGS_KEY n'est pas configurée")
+        return None
+    try:
+        return _fernet.decrypt(token.encode("ascii")).decode("utf-8")
+    except InvalidToken:
+        print("[EMAIL] Mot de passe SMTP enregistré illisible avec EMAIL_SETTINGS_KEY, valeur du .env utilisée")
+        return None
+
+
+def load_email_settings(db: Session) -> None:
+    """Applique à email_service les paramètres enregistrés (une lecture par clé primaire)"""
+    row = db.get(models.EmailSettings, SETTINGS_ROW_ID, populate_existing=True)
+    if row is None:
+        email_service.apply_settings({})
+        return
+    settings = {field: getattr(row, field) for field in SETTINGS_FIELDS if field != "smtp_password"}
+    settings["smtp_password"] = decrypt_password(row.smtp_password_encrypted)
+    email_service.apply_settings(settings)
+
+
+def save_email_settings(db: Session, updates: dict) -> None:
+    """
+    Enregistre les paramètres fournis (les autres sont conservés) puis les applique localement.
+    Lève EmailSettingsError si un mot de passe est fourni sans clé de chiffrement.
+    """
+    password = updates.get("smtp_password")
+    # Chiffré avant toute écriture : rien n'est enregistré si la clé manque
+    encrypted_password = encrypt_password(password) if password is not None else None
+    row = db.get(models.EmailSettings, SETTINGS_ROW_ID, with_for_update=True)
+    if row is None:
+        row = models.EmailSettings(id=SETTINGS_ROW_ID)
+        db.add(row)
+    for field, value in updates.items():
+        if field in SETTINGS_FIELDS and field != "smtp_password" and value is not None:
+            setattr(row, field, value)
+    if encrypted_password is not None:
+        row.smtp_password_encrypted = encrypted_password
+    db.commit()
+    load_email_settings(db)
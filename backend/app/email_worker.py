@@ -0,0 +1,168 @@
+"""
+Worker d'envoi des emails de la table email_outbox.
+
+Processus séparé de l'API : python -m app.email_worker
+Plusieurs workers peuvent tourner en parallèle. Chaque lot est réservé dans une transaction courte
+(SELECT ... FOR UPDATE SKIP LOCKED, statut ENVOI_EN_COURS et bail de EMAIL_LEASE_SECONDS dans
+next_attempt_at, commit) ; les emails sont ensuite envoyés hors de toute transaction et le résultat
+de chacun est enregistré dans sa propre transaction.
+
+Livraison « au moins une fois » : si un worker s'arrête entre l'envoi SMTP et l'enregistrement du
+résultat, l'email est repris par un worker à l'expiration du bail et peut être reçu deux fois.
+Les paramètres de la page Paramètres (table email_settings) sont relus avant chaque lot ;
+tant que l'envoi est désactivé, les emails restent en attente dans la file.
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+from .email_service import email_service
+from .email_settings import load_email_settings
+
+BATCH_SIZE = int(os.getenv("EMAIL_WORKER_BATCH_SIZE", "50"))
+POLL_INTERVAL_SECONDS = float(os.getenv("EMAIL_WORKER_POLL_SECONDS", "5"))
+MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+# Délai avant la tentative n : RETRY_BASE_SECONDS * 2^(n-1), plafonné à RETRY_MAX_SECONDS
+RETRY_BASE_SECONDS = int(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+RETRY_MAX_SECONDS = int(os.getenv("EMAIL_RETRY_MAX_SECONDS", "3600"))
+# Durée de réservation d'un lot : au-delà, un autre worker reprend les emails non enregistrés
+LEASE_SECONDS = int(os.getenv("EMAIL_LEASE_SECONDS", "600"))
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Délai exponentiel avant la prochaine tentative après `attempts` échecs"""
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def _send(method_name: str, payload: Optional[dict]) -> None:
+    """Envoie un email ; lève une exception en cas d'échec"""
+    method = getattr(email_service, method_name, None)
+    if not method_name.startswith("send_") or not callable(method):
+        raise ValueError(f"Méthode d'envoi inconnue: {method_name}")
+    if not method(**(payload or {})):
+        raise RuntimeError("Échec de l'envoi (voir les logs [EMAIL])")
+
+
+def claim_batch(db: Session, now: datetime) -> List[Tuple[int, int, str, dict]]:
+    """
+    Réserve un lot d'emails dus (en attente, ou réservés par un worker dont le bail a expiré) et
+    commit aussitôt : aucun verrou n'est gardé pendant l'envoi.
+    Retourne (id, tentative, méthode, arguments) de chaque email réservé.
+    """
+    batch = (
+        db.query(models.EmailOutbox)
+        .filter(
+            models.EmailOutbox.status.in_([
+                models.EmailOutboxStatus.EN_ATTENTE,
+                models.EmailOutboxStatus.ENVOI_EN_COURS,
+            ]),
+            models.EmailOutbox.next_attempt_at <= now,
+        )
+        .order_by(models.EmailOutbox.next_attempt_at, models.EmailOutbox.id)
+        .limit(BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    claimed = []
+    for outbox in batch:
+        outbox.attempts += 1
+        outbox.status = models.EmailOutboxStatus.ENVOI_EN_COURS
+        outbox.next_attempt_at = now + timedelta(seconds=LEASE_SECONDS)
+        claimed.append((outbox.id, outbox.attempts, outbox.method, outbox.payload))
+    db.commit()
+    return claimed
+
+
+def _record_result(db: Session, outbox_id: int, attempt: int, error: Optional[Exception]) -> str:
+    """
+    Enregistre le résultat d'un envoi dans sa propre transaction.
+    Ignoré si l'email a été repris entre-temps par un autre worker (bail expiré : autre tentative).
+    """
+    if error is None:
+        values = {"status": models.EmailOutboxStatus.ENVOYE, "sent_at": datetime.utcnow(), "last_error": None}
+        result = "sent"
+    elif attempt >= MAX_ATTEMPTS:
+        values = {"status": models.EmailOutboxStatus.ECHEC, "last_error": str(error)}
+        result = "dead"
+    else:
+        values = {
+            "status": models.EmailOutboxStatus.EN_ATTENTE,
+            "next_attempt_at": datetime.utcnow() + retry_delay(attempt),
+            "last_error": str(error),
+        }
+        result = "failed"
+    updated = (
+        db.query(models.EmailOutbox)
+        .filter(
+            models.EmailOutbox.id == outbox_id,
+            models.EmailOutbox.status == models.EmailOutboxStatus.ENVOI_EN_COURS,
+            models.EmailOutbox.attempts == attempt,
+        )
+        .update(values, synchronize_session=False)
+    )
+    db.commit()
+    return result if updated else "lost"
+
+
+def process_batch(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    Réserve un lot d'emails dus, les envoie hors transaction et enregistre chaque résultat.
+    Retourne le nombre d'emails traités.
+    """
+    if not email_service.email_enabled:
+        # Envoi désactivé : les emails restent en attente et partiront à la réactivation
+        return 0
+
+    claimed = claim_batch(db, now or datetime.utcnow())
+    if not claimed:
+        return 0
+
+    results = {"sent": 0, "failed": 0, "dead": 0, "lost": 0}
+    for outbox_id, attempt, method_name, payload in claimed:
+        error = None
+        try:
+            _send(method_name, payload)
+        except Exception as e:
+            error = e
+        results[_record_result(db, outbox_id, attempt, error)] += 1
+
+    print(
+        f"[EMAIL_WORKER] Lot de {len(claimed)} email(s) : {results['sent']} envoyé(s), "
+        f"{results['failed']} à retenter, {results['dead']} abandonné(s)"
+        + (f", {results['lost']} repris par un autre worker" if results["lost"] else "")
+    )
+    return len(claimed)
+
+
+def run_worker() -> None:
+    """Boucle principale : enchaîne les lots tant qu'il y a du travail, sinon attend"""
+    print(
+        f"[EMAIL_WORKER] Démarrage (lots de {BATCH_SIZE}, attente {POLL_INTERVAL_SECONDS}s, "
+        f"{MAX_ATTEMPTS} tentatives max)"
+    )
+    while True:
+        db = SessionLocal()
+        try:
+            # Paramètres modifiés depuis la page Paramètres (SMTP, activation de l'envoi)
+            load_email_settings(db)
+            processed = process_batch(db)
+        except Exception as e:
+            print(f"[EMAIL_WORKER] Erreur lors du traitement d'un lot: {str(e)}")
+            db.rollback()
+            processed = 0
+        finally:
+            db.close()
+        if processed < BATCH_SIZE:
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    try:
+        run_worker()
+    except KeyboardInterrupt:
+        print("[EMAIL_WORKER] Arrêt")
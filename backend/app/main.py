@@ -1,10 +1,14 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
+from fastapi.middleware.gzip import GZipMiddleware
+from sqlalchemy.exc import SQLAlchemyError
 
-from .routers import auth, tickets, users, notifications, settings, ticket_config
-from .scheduler import run_scheduled_tasks
+from .database import DatabaseUnavailableError, database_error_handler, database_unavailable_handler
+from .password_hashing import shutdown_executor
+from .realtime import realtime_listener
+from .reference_data import load_reference_data
+from .routers import auth, tickets, users, notifications, settings, ticket_config, metrics
+from .scheduler import SCHEDULER_ENABLED, create_scheduler, scheduler_leader
 
 
 def create_app() -> FastAPI:
@@ -25,6 +29,14 @@ def create_app() -> FastAPI:
         expose_headers=["*"],
     )
 
+    # Compression gzip des réponses de plus de 1 Kio (listes de tickets, statistiques) ;
+    # les flux SSE (text/event-stream) ne sont pas compressés
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+    # Erreurs de base de données : 503 si PostgreSQL est injoignable, 500 sinon (voir is_connection_failure)
+    app.add_exception_handler(DatabaseUnavailableError, database_unavailable_handler)
+    app.add_exception_handler(SQLAlchemyError, database_error_handler)
+
     # Routers principaux
     app.include_router(auth.router, prefix="/auth", tags=["auth"])
     app.include_router(tickets.router, prefix="/tickets", tags=["tickets"])
@@ -32,18 +44,25 @@ def create_app() -> FastAPI:
     app.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
     app.include_router(settings.router, tags=["settings"])
     app.include_router(ticket_config.router)
+    app.include_router(metrics.router)
 
-    # Configurer le scheduler pour exécuter les tâches planifiées
-    scheduler = BackgroundScheduler()
-    # Exécuter toutes les heures
-    scheduler.add_job(
-        run_scheduled_tasks,
-        trigger=CronTrigger(minute=0),  # Toutes les heures à la minute 0
-        id='run_scheduled_tasks',
-        name='Exécuter les tâches planifiées (rappels et clôtures)',
-        replace_existing=True
-    )
-    scheduler.start()
+    # Scheduler des tâches planifiées : démarré dans chaque worker, seul le leader (verrou
+    # consultatif PostgreSQL) exécute les tâches ; SCHEDULER_ENABLED=false si python -m app.scheduler tourne à part
+    if SCHEDULER_ENABLED:
+        scheduler = create_scheduler()
+        scheduler.start()
+        app.add_event_handler("shutdown", lambda: scheduler.shutdown(wait=False))
+        app.add_event_handler("shutdown", scheduler_leader.release)
+
+    # Données de référence (rôles, types et catégories) chargées au démarrage, puis invalidées
+    # par LISTEN/NOTIFY : le thread d'écoute démarre sans attendre le premier flux SSE
+    app.add_event_handler("startup", load_reference_data)
+    app.add_event_handler("startup", realtime_listener.start)
+
+    # Arrêter les processus de hachage bcrypt avec l'application
+    app.add_event_handler("shutdown", shutdown_executor)
+    # Arrêter le thread d'écoute LISTEN/NOTIFY des flux SSE
+    app.add_event_handler("shutdown", realtime_listener.stop)
 
     return app
 
@@ -0,0 +1,174 @@
+"""
+Métriques du processus au format texte Prometheus (exposées par GET /metrics).
+Implémentation minimale sans dépendance : compteurs, histogrammes et jauges lues à la demande.
+"""
+import hmac
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Bornes (en secondes) des histogrammes de latence
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Bornes (en secondes) des histogrammes de durée des tâches planifiées
+JOB_DURATION_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self._value}",
+        ]
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[index] += 1
+                    break
+
+    def render(self) -> List[str]:
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+class Gauge:
+    """Jauge dont la valeur est lue au moment de l'export"""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {self.read()}",
+        ]
+
+
+_registry: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+
+def register(metric):
+    """Enregistre une métrique (une seule par nom) et la renvoie"""
+    with _registry_lock:
+        return _registry.setdefault(metric.name, metric)
+
+
+def render_metrics() -> str:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Jeton attendu dans « Authorization: Bearer ... » (bearer_token de Prometheus) ;
+# sans jeton configuré, seules les requêtes locales (127.0.0.1, ::1) sont acceptées
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+LOCAL_CLIENTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def metrics_access_allowed(authorization: Optional[str], client_host: Optional[str]) -> bool:
+    """Contrôle d'accès commun à GET /metrics (API) et au serveur de métriques du scheduler"""
+    if METRICS_TOKEN:
+        scheme, _, token = (authorization or "").partition(" ")
+        return scheme.lower() == "bearer" and hmac.compare_digest(token.strip(), METRICS_TOKEN)
+    return client_host in LOCAL_CLIENTS
+
+
+# --- Pool de connexions PostgreSQL -------------------------------------------------------
+
+pool_checkout_wait = register(Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Temps d'attente pour obtenir une connexion du pool (y compris ouverture d'une connexion en débordement)",
+))
+pool_connection_hold = register(Histogram(
+    "db_pool_connection_hold_seconds",
+    "Durée pendant laquelle une connexion reste empruntée au pool",
+))
+pool_checkout_timeouts = register(Counter(
+    "db_pool_checkout_timeouts_total",
+    "Emprunts abandonnés après pool_timeout (pool saturé)",
+))
+
+
+class MeasuredQueuePool(QueuePool):
+    """QueuePool qui mesure le temps d'attente de chaque emprunt de connexion"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_checkout_timeouts.inc()
+            raise
+        finally:
+            pool_checkout_wait.observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine, settings: Dict[str, float]) -> None:
+    """Ajoute les jauges d'occupation du pool et la mesure de durée d'emprunt des connexions"""
+    pool = engine.pool
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            pool_connection_hold.observe(time.perf_counter() - checked_out_at)
+
+    gauges: Tuple[Tuple[str, str, Callable[[], float]], ...] = (
+        ("db_pool_checked_out", "Connexions actuellement empruntées", pool.checkedout),
+        ("db_pool_checked_in", "Connexions inactives disponibles dans le pool", pool.checkedin),
+        ("db_pool_overflow", "Connexions ouvertes au-delà de pool_size (négatif : places libres)", pool.overflow),
+    )
+    for name, documentation, read in gauges:
+        register(Gauge(name, documentation, read))
+    for key, value in settings.items():
+        register(Gauge(f"db_pool_{key}", f"Paramètre {key} du pool", lambda value=value: value))
@@ -1,20 +1,30 @@
 from datetime import datetime
 
 from sqlalchemy import (
+    DDL,
     Boolean,
     Column,
+    Computed,
     DateTime,
     Enum,
+    Float,
     ForeignKey,
+    Index,
     Integer,
+    Sequence,
     String,
     Text,
+    event,
+    text,
 )
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
 from .database import Base
 
+# Extension nécessaire aux index trigrammes (recherche partielle sur le titre)
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
 
 class Role(Base):
     __tablename__ = "roles"
@@ -43,6 +53,17 @@ class User(Base):
     notes = Column(Text, nullable=True)  # Notes optionnelles
     created_at = Column(DateTime, default=datetime.utcnow)
     last_login_at = Column(DateTime, nullable=True)
+    # Nombre de notifications non lues, tenu à jour par les triggers de la table notifications
+    unread_notifications_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Dernière modification d'une information affichée dans les tickets (nom, rôle...), mise à jour
+    # par trigger (ETag des listes de tickets, lu par l'index ix_users_updated_at)
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        server_default=text("(now() AT TIME ZONE 'utc')"),
+        index=True,
+    )
 
     username = Column(String(100), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
@@ -58,6 +79,52 @@ class User(Base):
     )
 
 
+# users.updated_at ne change qu'avec les colonnes renvoyées dans les tickets (UserRead, noms de la vue
+# compacte) : connexions et compteur de notifications non lues ne modifient pas les ETag des listes.
+# Une modification de rôle (RoleRead imbriqué) date les utilisateurs qui l'ont.
+USER_UPDATED_AT_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION users_touch_updated_at() RETURNS trigger AS $$
+    BEGIN
+        IF (NEW.full_name, NEW.email, NEW.agency, NEW.phone, NEW.specialization,
+            NEW.max_tickets_capacity, NEW.notes, NEW.role_id, NEW.actif)
+           IS DISTINCT FROM
+           (OLD.full_name, OLD.email, OLD.agency, OLD.phone, OLD.specialization,
+            OLD.max_tickets_capacity, OLD.notes, OLD.role_id, OLD.actif) THEN
+            NEW.updated_at := clock_timestamp() AT TIME ZONE 'utc';
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS users_touch_updated_at ON users",
+    """
+    CREATE TRIGGER users_touch_updated_at BEFORE UPDATE ON users
+    FOR EACH ROW EXECUTE PROCEDURE users_touch_updated_at()
+    """,
+]
+for _statement in USER_UPDATED_AT_DDL:
+    event.listen(User.__table__, "after_create", DDL(_statement))
+
+ROLE_TOUCH_USERS_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION roles_touch_users() RETURNS trigger AS $$
+    BEGIN
+        UPDATE users SET updated_at = clock_timestamp() AT TIME ZONE 'utc' WHERE role_id = NEW.id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS roles_touch_users ON roles",
+    """
+    CREATE TRIGGER roles_touch_users AFTER UPDATE ON roles
+    FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*) EXECUTE PROCEDURE roles_touch_users()
+    """,
+]
+# Après la création de users (la fonction met à jour cette table)
+for _statement in ROLE_TOUCH_USERS_DDL:
+    event.listen(User.__table__, "after_create", DDL(_statement))
+
 from enum import Enum as PyEnum
 
 
@@ -82,11 +149,23 @@ class TicketStatus(str, PyEnum):
     CLOTURE = "cloture"
 
 
+# Numéros de ticket attribués par PostgreSQL : pas de collision entre créations concurrentes
+TICKET_NUMBER_SEQUENCE = Sequence("tickets_number_seq", metadata=Base.metadata)
+
+
 class Ticket(Base):
     __tablename__ = "tickets"
+    # Renvoyer le numéro généré par l'INSERT (RETURNING) plutôt que par un SELECT ultérieur
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    number = Column(Integer, autoincrement=True, unique=True, nullable=False)
+    number = Column(
+        Integer,
+        TICKET_NUMBER_SEQUENCE,
+        server_default=TICKET_NUMBER_SEQUENCE.next_value(),
+        unique=True,
+        nullable=False,
+    )
     title = Column(String(255), nullable=False)
     description = Column(Text, nullable=False)
     type = Column(Enum(TicketType), nullable=False)
@@ -105,17 +184,97 @@ class Ticket(Base):
     resolved_at = Column(DateTime, nullable=True)
     closed_at = Column(DateTime, nullable=True)
     auto_closed_at = Column(DateTime, nullable=True)  # Date de clôture automatique (si applicable)
+    # Dernière modification, mise à jour par trigger à chaque UPDATE (ETag des listes de tickets)
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        server_default=text("(now() AT TIME ZONE 'utc')"),
+    )
 
     attachments = Column(JSONB, nullable=True)
     feedback_score = Column(Integer, nullable=True)
     feedback_comment = Column(Text, nullable=True)
 
+    # Vecteur de recherche plein texte (configuration française), calculé par PostgreSQL
+    # à chaque insertion/modification du titre ou de la description
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('french', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('french', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+    ))
+
     creator = relationship("User", foreign_keys=[creator_id], back_populates="created_tickets")
     technician = relationship("User", foreign_keys=[technician_id], back_populates="assigned_tickets")
 
     comments = relationship("Comment", back_populates="ticket", cascade="all, delete-orphan")
     history = relationship("TicketHistory", back_populates="ticket", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_tickets_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_tickets_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        # Listes paginées (created_at DESC, id DESC) : tous les tickets, créés par / assignés à un utilisateur
+        Index("ix_tickets_created_at_id", "created_at", "id"),
+        Index("ix_tickets_creator_created_at", "creator_id", "created_at", "id"),
+        Index("ix_tickets_technician_created_at", "technician_id", "created_at", "id"),
+        # Charge et statistiques des techniciens
+        Index("ix_tickets_technician_status", "technician_id", "status"),
+        # Rappels et clôture automatique des tickets résolus (scheduler)
+        Index("ix_tickets_status_resolved_at", "status", "resolved_at"),
+        # Date de dernière modification de la liste complète (ETag de GET /tickets/)
+        Index("ix_tickets_updated_at", "updated_at"),
+    )
+
+
+# updated_at est posé par la base : les mises à jour en masse (scheduler, scripts SQL) le modifient aussi.
+# clock_timestamp() et non now() (début de la transaction) : une transaction longue ne doit pas dater
+# sa modification d'avant celles déjà validées par d'autres transactions.
+TICKET_UPDATED_AT_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION tickets_touch_updated_at() RETURNS trigger AS $$
+    BEGIN
+        NEW.updated_at := clock_timestamp() AT TIME ZONE 'utc';
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tickets_touch_updated_at ON tickets",
+    """
+    CREATE TRIGGER tickets_touch_updated_at BEFORE UPDATE ON tickets
+    FOR EACH ROW EXECUTE PROCEDURE tickets_touch_updated_at()
+    """,
+]
+for _statement in TICKET_UPDATED_AT_DDL:
+    event.listen(Ticket.__table__, "after_create", DDL(_statement))
+
+
+class TechnicianMetrics(Base):
+    """
+    Métriques agrégées par technicien (page de statistiques).
+    Recalculées en SQL à chaque transition de statut d'un ticket du technicien.
+    """
+    __tablename__ = "technician_metrics"
+
+    technician_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    assigned_tickets_count = Column(Integer, nullable=False, default=0)
+    in_progress_tickets_count = Column(Integer, nullable=False, default=0)
+    resolved_tickets_count = Column(Integer, nullable=False, default=0)
+    closed_tickets_count = Column(Integer, nullable=False, default=0)
+    resolved_this_month = Column(Integer, nullable=False, default=0)
+    resolved_today = Column(Integer, nullable=False, default=0)
+    avg_resolution_time_days = Column(Float, nullable=False, default=0)
+    avg_response_time_minutes = Column(Float, nullable=False, default=0)
+    success_rate = Column(Float, nullable=False, default=0)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
 
 class CommentType(str, PyEnum):
     TECHNIQUE = "technique"
@@ -138,6 +297,10 @@ class Comment(Base):
     ticket = relationship("Ticket", back_populates="comments")
     user = relationship("User")
 
+    __table_args__ = (
+        Index("ix_comments_ticket_created_at", "ticket_id", "created_at"),
+    )
+
 
 class TicketHistory(Base):
     __tablename__ = "ticket_history"
@@ -153,6 +316,11 @@ class TicketHistory(Base):
     ticket = relationship("Ticket", back_populates="history")
     user = relationship("User")
 
+    __table_args__ = (
+        # Historique d'un ticket et première prise en charge (EN_COURS) pour les métriques
+        Index("ix_ticket_history_ticket_status_changed_at", "ticket_id", "new_status", "changed_at"),
+    )
+
 
 class TicketTypeModel(Base):
     """
@@ -229,6 +397,12 @@ class NotificationType(str, PyEnum):
 
 
 class Notification(Base):
+    """
+    Table partitionnée par mois sur created_at (voir app/notification_retention.py) :
+    les anciens mois lus sont archivés ou supprimés partition par partition.
+    La clé de partitionnement doit faire partie de la clé primaire (id, created_at) ;
+    l'ORM continue d'identifier une notification par son seul id.
+    """
     __tablename__ = "notifications"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -237,9 +411,267 @@ class Notification(Base):
     ticket_id = Column(Integer, ForeignKey("tickets.id"), nullable=True)
     message = Column(Text, nullable=False)
     read = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
     read_at = Column(DateTime, nullable=True)
 
+    __mapper_args__ = {"primary_key": [id]}
+    __table_args__ = (
+        # Liste des notifications d'un utilisateur, les plus récentes d'abord
+        Index("ix_notifications_user_created_at", "user_id", "created_at", "id"),
+        # Même liste limitée aux non lues (unread_only) : index partiel, réduit aux lignes non lues
+        Index("ix_notifications_user_unread", "user_id", "created_at", "id", postgresql_where=text("read = false")),
+        # Rappels déjà envoyés pour un ticket (scheduler)
+        Index("ix_notifications_ticket_type", "ticket_id", "type"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+# Compteur users.unread_notifications_count maintenu par des triggers "par instruction" :
+# un INSERT ... SELECT de diffusion ou un "tout marquer comme lu" fait une seule mise à jour
+# par utilisateur concerné, quel que soit le nombre de lignes.
+UNREAD_COUNTER_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION notifications_unread_after_insert() RETURNS trigger AS $$
+    BEGIN
+        UPDATE users SET unread_notifications_count = users.unread_notifications_count + delta.unread
+        FROM (
+            SELECT user_id, count(*) AS unread FROM new_rows
+            WHERE read IS FALSE GROUP BY user_id
+        ) AS delta
+        WHERE users.id = delta.user_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION notifications_unread_after_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE users SET unread_notifications_count = greatest(users.unread_notifications_count + delta.unread, 0)
+        FROM (
+            SELECT user_id, sum(change) AS unread FROM (
+                SELECT user_id, 1 AS change FROM new_rows WHERE read IS FALSE
+                UNION ALL
+                SELECT user_id, -1 AS change FROM old_rows WHERE read IS FALSE
+            ) AS changes
+            GROUP BY user_id
+            HAVING sum(change) <> 0
+        ) AS delta
+        WHERE users.id = delta.user_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION notifications_unread_after_delete() RETURNS trigger AS $$
+    BEGIN
+        UPDATE users SET unread_notifications_count = greatest(users.unread_notifications_count - delta.unread, 0)
+        FROM (
+            SELECT user_id, count(*) AS unread FROM old_rows
+            WHERE read IS FALSE GROUP BY user_id
+        ) AS delta
+        WHERE users.id = delta.user_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS notifications_unread_insert ON notifications",
+    """
+    CREATE TRIGGER notifications_unread_insert AFTER INSERT ON notifications
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE notifications_unread_after_insert()
+    """,
+    "DROP TRIGGER IF EXISTS notifications_unread_update ON notifications",
+    """
+    CREATE TRIGGER notifications_unread_update AFTER UPDATE ON notifications
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE notifications_unread_after_update()
+    """,
+    "DROP TRIGGER IF EXISTS notifications_unread_delete ON notifications",
+    """
+    CREATE TRIGGER notifications_unread_delete AFTER DELETE ON notifications
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE notifications_unread_after_delete()
+    """,
+]
+for _statement in UNREAD_COUNTER_DDL:
+    event.listen(Notification.__table__, "after_create", DDL(_statement))
+
+# Partition recevant les notifications hors des partitions mensuelles (créées par le scheduler,
+# voir app/notification_retention.py) : une insertion n'échoue jamais faute de partition
+event.listen(
+    Notification.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS notifications_default PARTITION OF notifications DEFAULT"),
+)
+
+
+# Événements temps réel (LISTEN/NOTIFY, relayés en Server-Sent Events par app/realtime.py).
+# pg_notify n'est délivré qu'au commit de la transaction ; la charge utile est limitée à 8000 octets.
+NOTIFICATION_EVENTS_CHANNEL = "notification_events"
+TICKET_EVENTS_CHANNEL = "ticket_events"
+
+REALTIME_DDL = {
+    "notifications": [
+        f"""
+        CREATE OR REPLACE FUNCTION notifications_publish() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{NOTIFICATION_EVENTS_CHANNEL}', json_build_object(
+                'id', id, 'user_id', user_id, 'type', type, 'ticket_id', ticket_id,
+                'message', left(message, 1000), 'read', coalesce(read, false), 'created_at', created_at
+            )::text)
+            FROM new_rows;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS notifications_publish_insert ON notifications",
+        """
+        CREATE TRIGGER notifications_publish_insert AFTER INSERT ON notifications
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE PROCEDURE notifications_publish()
+        """,
+    ],
+    # Trigger par instruction (tables de transition) : une clôture automatique de N tickets ne publie
+    # qu'un événement. Au-delà de la taille maximale d'une notification, seul le nombre est publié.
+    "tickets": [
+        f"""
+        CREATE OR REPLACE FUNCTION tickets_publish_change() RETURNS trigger AS $$
+        DECLARE
+            payload text;
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM changed_rows) THEN
+                RETURN NULL;
+            END IF;
+            SELECT json_build_object('operation', lower(TG_OP), 'tickets', json_agg(json_build_object(
+                'id', id, 'number', number, 'status', status,
+                'creator_id', creator_id, 'technician_id', technician_id, 'secretary_id', secretary_id
+            )))::text
+            INTO payload FROM changed_rows;
+            IF octet_length(payload) > 7900 THEN
+                SELECT json_build_object('operation', lower(TG_OP), 'count', count(*))::text
+                INTO payload FROM changed_rows;
+            END IF;
+            PERFORM pg_notify('{TICKET_EVENTS_CHANNEL}', payload);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        # Ancien trigger par ligne
+        "DROP TRIGGER IF EXISTS tickets_publish_change ON tickets",
+        # Une table de transition n'est possible que sur un trigger à un seul événement
+        "DROP TRIGGER IF EXISTS tickets_publish_insert ON tickets",
+        """
+        CREATE TRIGGER tickets_publish_insert AFTER INSERT ON tickets
+        REFERENCING NEW TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE PROCEDURE tickets_publish_change()
+        """,
+        "DROP TRIGGER IF EXISTS tickets_publish_update ON tickets",
+        """
+        CREATE TRIGGER tickets_publish_update AFTER UPDATE ON tickets
+        REFERENCING NEW TABLE AS changed_rows
+        FOR EACH STATEMENT EXECUTE PROCEDURE tickets_publish_change()
+        """,
+    ],
+}
+for _table in (Notification.__table__, Ticket.__table__):
+    for _statement in REALTIME_DDL[_table.name]:
+        event.listen(_table, "after_create", DDL(_statement))
+
+
+# Données de référence (rôles, types et catégories de tickets) mises en cache par chaque processus
+# (app/reference_data.py) : toute modification est signalée pour invalider les caches
+REFERENCE_DATA_CHANNEL = "reference_data_changes"
+
+REFERENCE_DATA_FUNCTION_DDL = f"""
+    CREATE OR REPLACE FUNCTION reference_data_publish_change() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('{REFERENCE_DATA_CHANNEL}', TG_TABLE_NAME);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+REFERENCE_DATA_DDL = {
+    table_name: [
+        REFERENCE_DATA_FUNCTION_DDL,
+        f"DROP TRIGGER IF EXISTS {table_name}_publish_change ON {table_name}",
+        f"""
+        CREATE TRIGGER {table_name}_publish_change AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table_name}
+        FOR EACH STATEMENT EXECUTE PROCEDURE reference_data_publish_change()
+        """,
+    ]
+    for table_name in ("roles", "ticket_types", "ticket_categories")
+}
+for _table in (Role.__table__, TicketTypeModel.__table__, TicketCategory.__table__):
+    for _statement in REFERENCE_DATA_DDL[_table.name]:
+        event.listen(_table, "after_create", DDL(_statement))
+
+
+class EmailOutboxStatus(str, PyEnum):
+    EN_ATTENTE = "en_attente"
+    ENVOI_EN_COURS = "envoi_en_cours"  # Réservé par un worker jusqu'à next_attempt_at (bail)
+    ENVOYE = "envoyé"
+    ECHEC = "échec"  # Abandonné après le nombre maximal de tentatives (dead letter)
+
+
+class EmailOutbox(Base):
+    """
+    Emails sortants à envoyer par le worker (python -m app.email_worker).
+    Les endpoints insèrent une ligne dans leur transaction au lieu d'appeler le SMTP.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # Seules les lignes en attente (ou réservées par un worker arrêté, bail expiré) sont lues
+        Index(
+            "ix_email_outbox_pending",
+            "next_attempt_at",
+            postgresql_where=text("status IN ('EN_ATTENTE', 'ENVOI_EN_COURS')"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    method = Column(String(100), nullable=False)  # Méthode send_* de EmailService
+    payload = Column(JSONB, nullable=False)  # Arguments nommés de la méthode
+    status = Column(Enum(EmailOutboxStatus), nullable=False, default=EmailOutboxStatus.EN_ATTENTE)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+
+class EmailSettings(Base):
+    """
+    Paramètres email modifiés depuis la page Paramètres (une seule ligne, id = 1).
+    Lue par l'API et par le worker d'envoi avant chaque lot ; une colonne NULL reprend
+    la valeur de la variable d'environnement correspondante.
+    """
+    __tablename__ = "email_settings"
+
+    id = Column(Integer, primary_key=True)
+    smtp_server = Column(String(255), nullable=True)
+    smtp_port = Column(Integer, nullable=True)
+    smtp_username = Column(String(255), nullable=True)
+    smtp_password_encrypted = Column(Text, nullable=True)  # Chiffré avec EMAIL_SETTINGS_KEY (email_settings.py)
+    sender_email = Column(String(255), nullable=True)
+    sender_name = Column(String(255), nullable=True)
+    use_tls = Column(Boolean, nullable=True)
+    verify_ssl = Column(Boolean, nullable=True)
+    email_enabled = Column(Boolean, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class StreamTicket(Base):
+    """
+    Ticket d'ouverture du flux SSE (/notifications/stream) : EventSource ne peut pas envoyer
+    l'en-tête Authorization et le JWT ne doit pas apparaître dans l'URL (journaux, historique).
+    Valable quelques secondes et supprimé à sa première utilisation.
+    """
+    __tablename__ = "stream_tickets"
+
+    ticket = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
 
 class Report(Base):
     __tablename__ = "reports"
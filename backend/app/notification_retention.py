@@ -0,0 +1,199 @@
+"""
+Partitions mensuelles de la table notifications et rétention des notifications lues.
+
+- ensure_partitions : crée à l'avance les partitions des mois à venir (notifications_pAAAAMM) ;
+  la partition notifications_default ne reçoit que les lignes hors de ces plages.
+- apply_retention : pour chaque mois entièrement plus ancien que NOTIFICATION_RETENTION_DAYS,
+  les notifications lues sont archivées (table notifications_archive) ou supprimées.
+  Un mois sans notification non lue est détaché et supprimé en une opération, sans DELETE
+  ligne à ligne ; s'il reste des non lues, seules les lignes lues sont retirées.
+
+Appelé chaque nuit par le scheduler (voir main.py).
+"""
+import os
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "180"))
+# "archive" : copie des notifications lues dans notifications_archive avant suppression ; "drop" : suppression
+NOTIFICATION_RETENTION_MODES = ("archive", "drop")
+NOTIFICATION_RETENTION_MODE = os.getenv("NOTIFICATION_RETENTION_MODE", "archive")
+# Une valeur mal saisie ne doit pas supprimer les notifications au lieu de les archiver
+if NOTIFICATION_RETENTION_MODE not in NOTIFICATION_RETENTION_MODES:
+    raise ValueError(
+        f"NOTIFICATION_RETENTION_MODE invalide: {NOTIFICATION_RETENTION_MODE!r} "
+        f"(valeurs possibles : {', '.join(NOTIFICATION_RETENTION_MODES)})"
+    )
+NOTIFICATION_PARTITION_MONTHS_AHEAD = int(os.getenv("NOTIFICATION_PARTITION_MONTHS_AHEAD", "3"))
+
+DEFAULT_PARTITION = "notifications_default"
+ARCHIVE_TABLE = "notifications_archive"
+
+# Table d'archive : mêmes colonnes, sans contrainte (les tickets et utilisateurs peuvent être supprimés)
+CREATE_ARCHIVE_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        type notificationtype NOT NULL,
+        ticket_id INTEGER,
+        message TEXT NOT NULL,
+        read BOOLEAN,
+        created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        read_at TIMESTAMP WITHOUT TIME ZONE,
+        archived_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+    )
+"""
+ARCHIVE_COLUMNS = "id, user_id, type, ticket_id, message, read, created_at, read_at"
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(moment: datetime) -> datetime:
+    return month_start(month_start(moment) + timedelta(days=32))
+
+
+def partition_name(start: datetime) -> str:
+    return f"notifications_p{start:%Y%m}"
+
+
+def _monthly_partitions(db: Session) -> List[Tuple[str, datetime, datetime]]:
+    """Partitions mensuelles existantes : (nom, début inclus, fin exclue), la plus ancienne d'abord"""
+    rows = db.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'notifications' AND child.relname LIKE 'notifications\\_p%'
+        ORDER BY child.relname
+    """)).scalars().all()
+    partitions = []
+    for name in rows:
+        start = datetime.strptime(name[len("notifications_p"):], "%Y%m")
+        partitions.append((name, start, next_month(start)))
+    return partitions
+
+
+def _create_partition(db: Session, start: datetime) -> None:
+    """
+    Crée la partition du mois. Si la partition par défaut contient déjà des lignes de ce mois,
+    elles y sont déplacées (en s'adressant directement aux partitions : les triggers de la table
+    notifications, dont le compteur de non lues, ne sont pas déclenchés).
+    """
+    name, end = partition_name(start), next_month(start)
+    bounds = {"start": start, "end": end}
+    has_default = db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": DEFAULT_PARTITION}).scalar()
+    stray_rows = has_default and db.execute(text(f"""
+        SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end)
+    """), bounds).scalar()
+
+    if not stray_rows:
+        db.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {name} PARTITION OF notifications
+            FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')
+        """))
+        return
+
+    db.execute(text(f"ALTER TABLE notifications DETACH PARTITION {DEFAULT_PARTITION}"))
+    db.execute(text(f"""
+        CREATE TABLE {name} PARTITION OF notifications
+        FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')
+    """))
+    moved = db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= :start AND created_at < :end RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), bounds).rowcount
+    db.execute(text(f"ALTER TABLE notifications ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    print(f"Partition {name} créée, {moved} notification(s) déplacée(s) depuis {DEFAULT_PARTITION}")
+
+
+def ensure_partitions(db: Session, now: datetime = None, since: datetime = None) -> None:
+    """
+    Crée la partition par défaut et celles des mois de `since` (par défaut le mois courant)
+    jusqu'à NOTIFICATION_PARTITION_MONTHS_AHEAD mois après le mois courant. Rien n'est commité.
+    """
+    now = now or datetime.utcnow()
+    db.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF notifications DEFAULT"))
+    start = month_start(min(since or now, now))
+    last = month_start(now)
+    for _ in range(NOTIFICATION_PARTITION_MONTHS_AHEAD):
+        last = next_month(last)
+    while start <= last:
+        _create_partition(db, start)
+        start = next_month(start)
+
+
+def _archive(db: Session, condition: str, params: dict) -> None:
+    if NOTIFICATION_RETENTION_MODE == "archive":
+        db.execute(text(CREATE_ARCHIVE_TABLE))
+        db.execute(text(f"""
+            INSERT INTO {ARCHIVE_TABLE} ({ARCHIVE_COLUMNS})
+            SELECT {ARCHIVE_COLUMNS} FROM notifications WHERE {condition}
+        """), params)
+
+
+def apply_retention(db: Session, now: datetime = None) -> int:
+    """
+    Archive ou supprime les notifications lues plus anciennes que NOTIFICATION_RETENTION_DAYS.
+    Les non lues sont conservées (elles comptent dans users.unread_notifications_count).
+    Retourne le nombre de partitions supprimées.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=NOTIFICATION_RETENTION_DAYS)
+    dropped = 0
+
+    for name, start, end in _monthly_partitions(db):
+        if end > cutoff:
+            break
+        bounds = {"start": start, "end": end}
+        in_month = "created_at >= :start AND created_at < :end"
+        has_unread = db.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM notifications WHERE {in_month} AND read IS NOT TRUE)"), bounds
+        ).scalar()
+
+        _archive(db, f"{in_month} AND read IS TRUE", bounds)
+        if has_unread:
+            deleted = db.execute(text(f"DELETE FROM notifications WHERE {in_month} AND read IS TRUE"), bounds).rowcount
+            print(f"{name} : {deleted} notification(s) lue(s) retirée(s), non lues conservées")
+        else:
+            db.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+            db.execute(text(f"DROP TABLE {name}"))
+            dropped += 1
+            print(f"{name} : partition supprimée ({NOTIFICATION_RETENTION_MODE})")
+        db.commit()
+
+    # Lignes anciennes restées dans la partition par défaut
+    condition = "created_at < :cutoff AND read IS TRUE"
+    params = {"cutoff": cutoff}
+    _archive(db, f"tableoid = '{DEFAULT_PARTITION}'::regclass AND {condition}", params)
+    db.execute(
+        text(f"DELETE FROM notifications WHERE tableoid = '{DEFAULT_PARTITION}'::regclass AND {condition}"), params
+    )
+    db.commit()
+    return dropped
+
+
+def manage_notification_partitions() -> int:
+    """Tâche planifiée : partitions à venir puis rétention. Retourne le nombre de partitions supprimées."""
+    db = SessionLocal()
+    try:
+        print(f"[{datetime.utcnow()}] Gestion des partitions de notifications...")
+        ensure_partitions(db)
+        db.commit()
+        dropped = apply_retention(db)
+        print(f"[{datetime.utcnow()}] Partitions de notifications à jour ({dropped} partition(s) supprimée(s))")
+        return dropped
+    except Exception as e:
+        db.rollback()
+        print(f"Erreur lors de la gestion des partitions de notifications: {e}")
+        raise  # Comptée en échec par ScheduledJob
+    finally:
+        db.close()
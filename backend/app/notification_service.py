@@ -0,0 +1,106 @@
+"""
+Diffusion des notifications à un ensemble de destinataires (rôles ou utilisateurs)
+en requêtes ensemblistes, dans la transaction de l'appelant.
+"""
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import false, insert, literal, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .reference_data import reference_data
+
+# Rôles qui analysent et assignent les tickets
+AGENT_ROLES = ("Secrétaire DSI", "Adjoint DSI", "DSI", "Admin")
+
+
+def _role_users(db: Session, role_names: Iterable[str], exclude_user_ids: Iterable[Optional[int]] = ()):
+    """Utilisateurs actifs ayant l'un des rôles donnés (identifiants des rôles lus dans le cache, sans jointure)"""
+    role_ids = reference_data.get(db).role_ids(role_names)
+    query = (
+        select(models.User.id, models.User.email, models.User.role_id)
+        .where(models.User.role_id.in_(role_ids), models.User.actif == True)
+    )
+    excluded = {user_id for user_id in exclude_user_ids if user_id}
+    if excluded:
+        query = query.where(models.User.id.notin_(excluded))
+    return query
+
+
+def notify_roles(
+    db: Session,
+    role_names: Iterable[str],
+    notification_type: models.NotificationType,
+    ticket_id: Optional[int],
+    message: str,
+    exclude_user_ids: Iterable[Optional[int]] = (),
+) -> int:
+    """
+    Crée une notification pour chaque utilisateur actif des rôles donnés avec un seul
+    INSERT ... SELECT. Rien n'est commité : la notification fait partie de la transaction
+    de l'appelant. Retourne le nombre de notifications créées.
+    """
+    recipients = _role_users(db, role_names, exclude_user_ids).subquery()
+    columns = models.Notification.__table__.c
+    rows = select(
+        recipients.c.id,
+        literal(notification_type, columns.type.type),
+        literal(ticket_id, columns.ticket_id.type),
+        literal(message, columns.message.type),
+        false(),
+        literal(datetime.utcnow(), columns.created_at.type),
+    )
+    statement = insert(models.Notification).from_select(
+        ["user_id", "type", "ticket_id", "message", "read", "created_at"], rows
+    )
+    return db.execute(statement).rowcount
+
+
+def notify_users(
+    db: Session,
+    user_ids: Iterable[Optional[int]],
+    notification_type: models.NotificationType,
+    ticket_id: Optional[int],
+    message: str,
+) -> int:
+    """Crée la même notification pour chaque utilisateur (doublons et None ignorés) en un INSERT"""
+    ids = {user_id for user_id in user_ids if user_id}
+    if not ids:
+        return 0
+    now = datetime.utcnow()
+    db.execute(
+        insert(models.Notification),
+        [
+            {
+                "user_id": user_id,
+                "type": notification_type,
+                "ticket_id": ticket_id,
+                "message": message,
+                "read": False,
+                "created_at": now,
+            }
+            for user_id in ids
+        ],
+    )
+    return len(ids)
+
+
+def role_email_recipients(
+    db: Session,
+    role_names: Iterable[str],
+    exclude_user_ids: Iterable[Optional[int]] = (),
+) -> List[Tuple[str, str]]:
+    """
+    Adresses email (avec le nom du rôle) des utilisateurs actifs des rôles donnés,
+    sans doublon d'adresse. Retourne une liste de (email, nom du rôle).
+    """
+    roles_by_id = reference_data.get(db).roles_by_id
+    seen = set()
+    recipients = []
+    for _, email, role_id in db.execute(_role_users(db, role_names, exclude_user_ids)):
+        email = (email or "").strip()
+        if email and email not in seen:
+            seen.add(email)
+            recipients.append((email, roles_by_id[role_id].name))
+    return recipients
@@ -0,0 +1,56 @@
+"""
+Pagination par curseur (keyset) sur le couple (created_at, id)
+"""
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode la position (created_at, id) du dernier élément en curseur opaque"""
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Décode un curseur opaque en (created_at, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Curseur de pagination invalide",
+        )
+
+
+def apply_keyset(query, created_at_column, id_column, cursor: Optional[str], limit: int):
+    """
+    Applique le tri (created_at DESC, id DESC), le filtre de curseur et la limite.
+    Une ligne supplémentaire est demandée pour savoir s'il existe une page suivante.
+    Fonctionne aussi bien sur un Query ORM que sur un select().
+    """
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.filter(
+            tuple_(created_at_column, id_column) < tuple_(cursor_created_at, cursor_id)
+        )
+    return query.order_by(created_at_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def build_page(rows: List, limit: int) -> Tuple[List, Optional[str]]:
+    """Découpe les lignes récupérées en (éléments de la page, curseur suivant)"""
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit and items:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return items, next_cursor
@@ -0,0 +1,82 @@
+"""
+Hachage et vérification bcrypt dans un pool de processus dédié.
+
+À coût 12, un calcul bcrypt prend environ 250 ms de CPU : exécuté dans le threadpool de
+l'API, il bloque les autres requêtes pendant les vagues de connexion du matin.
+Le pool est borné (PASSWORD_HASH_WORKERS processus) et créé à la première utilisation.
+
+Ce module n'importe que bcrypt : il est rechargé par chaque processus du pool (mode spawn).
+"""
+import asyncio
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+# Coût bcrypt des nouveaux hachages ; les hachages existants d'un autre coût sont
+# recalculés à la connexion suivante de l'utilisateur
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_BCRYPT_COST = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """Calcule un hachage bcrypt (dans le processus appelant)"""
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def check_password(password: str, hashed_password: str) -> bool:
+    """Vérifie un mot de passe contre un hachage bcrypt (dans le processus appelant)"""
+    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+def needs_rehash(hashed_password: str, rounds: int = BCRYPT_ROUNDS) -> bool:
+    """Vrai si le hachage n'utilise pas le coût configuré"""
+    match = _BCRYPT_COST.match(hashed_password or "")
+    return match is None or int(match.group(1)) != rounds
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def hash_password_async(password: str) -> str:
+    """Hache dans le pool de processus sans bloquer la boucle d'événements"""
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), hash_password, password)
+
+
+async def check_password_async(password: str, hashed_password: str) -> bool:
+    """Vérifie dans le pool de processus sans bloquer la boucle d'événements"""
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), check_password, password, hashed_password
+    )
+
+
+def hash_password_in_pool(password: str) -> str:
+    """
+    Pour les endpoints synchrones : le calcul se fait dans le pool de processus,
+    le thread appelant attend sans consommer de CPU.
+    """
+    return get_executor().submit(hash_password, password).result()
@@ -0,0 +1,182 @@
+"""
+Diffusion temps réel des notifications et des changements de tickets (Server-Sent Events).
+
+Un seul thread par processus écoute PostgreSQL (LISTEN) sur une connexion dédiée, hors pool,
+et répartit les événements publiés par les triggers (voir REALTIME_DDL dans models.py) entre
+les flux SSE ouverts : un tableau de bord inactif ne coûte qu'une socket, plus aucune requête.
+Le même thread invalide le cache des données de référence (app/reference_data.py) quand
+les rôles, types ou catégories de tickets sont modifiés.
+"""
+import asyncio
+import json
+import os
+import select
+import threading
+from typing import Optional, Set
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from . import models
+from .database import DATABASE_URL
+from .notification_service import AGENT_ROLES
+from .reference_data import reference_data
+
+# Commentaire envoyé sur un flux inactif : garde la connexion ouverte à travers les proxys
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Événements en attente par client ; au-delà (client trop lent), les suivants sont ignorés
+SUBSCRIBER_QUEUE_SIZE = 100
+RECONNECT_DELAY_SECONDS = 5
+# Délai de select() : permet de s'arrêter rapidement à la fermeture de l'application
+LISTEN_POLL_SECONDS = 1.0
+
+
+class Subscription:
+    """Un flux SSE ouvert : les événements sont déposés dans une file lue par l'endpoint"""
+
+    def __init__(self, user_id: int, role_name: Optional[str], loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.role_name = role_name
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def select(self, channel: str, data: dict) -> Optional[dict]:
+        """Données de l'événement destinées à ce flux, ou None s'il ne le concerne pas"""
+        if channel == models.NOTIFICATION_EVENTS_CHANNEL:
+            return data if data.get("user_id") == self.user_id else None
+        # Les agents (secrétariat, DSI) suivent tous les tickets ; les autres, ceux qui les concernent
+        if self.role_name in AGENT_ROLES or "tickets" not in data:
+            # Sans liste (instruction modifiant trop de tickets) : chacun recharge ses tickets
+            return data
+        tickets = [
+            ticket for ticket in data["tickets"]
+            if self.user_id in (ticket.get("creator_id"), ticket.get("technician_id"), ticket.get("secretary_id"))
+        ]
+        return {**data, "tickets": tickets} if tickets else None
+
+    def push(self, event: str, data: dict) -> None:
+        """Appelé dans la boucle d'événements du flux (via call_soon_threadsafe)"""
+        try:
+            self.queue.put_nowait((event, data))
+        except asyncio.QueueFull:
+            # Client trop lent : les événements en attente sont remplacés par un seul "resync",
+            # le client recharge tout au lieu de manquer des événements sans le savoir
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(("resync", {}))
+
+
+class RealtimeListener:
+    """Thread d'écoute LISTEN/NOTIFY, démarré avec l'application (ou à la première souscription)"""
+
+    def __init__(self):
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, user_id: int, role_name: Optional[str]) -> Subscription:
+        subscription = Subscription(user_id, role_name, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        self.start()
+        return subscription
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="realtime-listener", daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        reconnected = False
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = psycopg2.connect(DATABASE_URL, connect_timeout=5)
+                connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {models.NOTIFICATION_EVENTS_CHANNEL}")
+                    cursor.execute(f"LISTEN {models.TICKET_EVENTS_CHANNEL}")
+                    cursor.execute(f"LISTEN {models.REFERENCE_DATA_CHANNEL}")
+                print("Écoute des événements temps réel (LISTEN) démarrée")
+                if reconnected:
+                    # Des événements ont pu être perdus pendant la coupure : les clients rechargent
+                    self._broadcast("resync", {})
+                    reference_data.invalidate()
+
+                while not self._stop.is_set():
+                    if select.select([connection], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        self._dispatch(notify.channel, notify.payload)
+            except (psycopg2.Error, OSError) as e:
+                print(f"Erreur de l'écoute temps réel, nouvelle tentative dans {RECONNECT_DELAY_SECONDS}s: {e}")
+                reconnected = True
+                self._stop.wait(RECONNECT_DELAY_SECONDS)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def _dispatch(self, channel: str, payload: str) -> None:
+        if channel == models.REFERENCE_DATA_CHANNEL:
+            # Charge utile : nom de la table modifiée ; rechargement à la prochaine lecture du cache
+            reference_data.invalidate(payload)
+            return
+
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            print(f"Événement temps réel illisible sur {channel}: {payload[:200]}")
+            return
+
+        if channel == models.NOTIFICATION_EVENTS_CHANNEL:
+            event = "notification"
+            # Les colonnes Enum sont stockées par nom : renvoyer la valeur, comme l'API REST
+            if data.get("type") in models.NotificationType.__members__:
+                data["type"] = models.NotificationType[data["type"]].value
+        else:
+            # Un événement par instruction SQL : liste des tickets créés ou modifiés
+            event = "ticket"
+            for ticket in data.get("tickets", []):
+                if ticket.get("status") in models.TicketStatus.__members__:
+                    ticket["status"] = models.TicketStatus[ticket["status"]].value
+
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            selected = subscription.select(channel, data)
+            if selected is not None:
+                self._deliver(subscription, event, selected)
+
+    def _broadcast(self, event: str, data: dict) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            self._deliver(subscription, event, data)
+
+    @staticmethod
+    def _deliver(subscription: Subscription, event: str, data: dict) -> None:
+        try:
+            subscription.loop.call_soon_threadsafe(subscription.push, event, data)
+        except RuntimeError:
+            # Boucle d'événements fermée (processus en cours d'arrêt)
+            pass
+
+
+realtime_listener = RealtimeListener()
+
+
+def format_event(event: str, data: dict) -> str:
+    """Sérialise un événement au format text/event-stream"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
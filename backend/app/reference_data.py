@@ -0,0 +1,194 @@
+"""
+Cache mémoire (par processus) des données de référence : rôles, types et catégories de tickets.
+
+Ces tables ne changent presque jamais mais étaient relues à chaque appel de /ticket-config/*,
+/auth/roles et à chaque recherche d'un rôle par son nom (techniciens, destinataires des
+notifications). Le cache est chargé au démarrage puis rechargé :
+- dès qu'une de ces tables est modifiée (trigger pg_notify sur REFERENCE_DATA_CHANNEL, écouté
+  par le thread de app/realtime.py) ;
+- au plus tard après REFERENCE_DATA_TTL_SECONDS (notification perdue, écoute interrompue).
+
+Chaque chargement produit un instantané en lecture seule. Sa version est une empreinte du contenu :
+identique dans tous les processus, elle sert d'ETag aux endpoints de configuration.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .database import SessionLocal
+
+REFERENCE_DATA_TTL_SECONDS = float(os.getenv("REFERENCE_DATA_TTL_SECONDS", "300"))
+# Durée pendant laquelle le navigateur réutilise la réponse sans la revalider
+REFERENCE_DATA_MAX_AGE_SECONDS = int(os.getenv("REFERENCE_DATA_MAX_AGE_SECONDS", "300"))
+CACHE_CONTROL = f"private, max-age={REFERENCE_DATA_MAX_AGE_SECONDS}"
+
+
+class ReferenceSnapshot:
+    """Contenu des tables de référence à un instant donné (ne pas modifier)"""
+
+    def __init__(
+        self,
+        types: List[schemas.TicketTypeConfig],
+        categories: List[schemas.TicketCategoryConfig],
+        roles: List[schemas.RoleRead],
+    ):
+        self.types: Tuple[schemas.TicketTypeConfig, ...] = tuple(types)  # Actifs, triés par libellé
+        self.categories: Tuple[schemas.TicketCategoryConfig, ...] = tuple(categories)  # Actives, triées par nom
+        self.roles: Tuple[schemas.RoleRead, ...] = tuple(roles)
+        self.roles_by_name: Dict[str, schemas.RoleRead] = {role.name: role for role in roles}
+        self.roles_by_id: Dict[int, schemas.RoleRead] = {role.id: role for role in roles}
+        content = json.dumps(
+            [[item.model_dump() for item in items] for items in (self.types, self.categories, self.roles)],
+            sort_keys=True,
+            default=str,
+        )
+        self.version = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+
+    def categories_for(self, type_code: Optional[str]) -> List[schemas.TicketCategoryConfig]:
+        if not type_code:
+            return list(self.categories)
+        return [category for category in self.categories if category.type_code == type_code]
+
+    def role_ids(self, role_names: Iterable[str]) -> List[int]:
+        """Identifiants des rôles existants parmi les noms donnés"""
+        return [self.roles_by_name[name].id for name in set(role_names) if name in self.roles_by_name]
+
+
+def _load(db: Session) -> ReferenceSnapshot:
+    """Trois requêtes, sans relation chargée à la demande"""
+    types = (
+        db.query(models.TicketTypeModel)
+        .filter(models.TicketTypeModel.is_active.is_(True))
+        .order_by(models.TicketTypeModel.label.asc())
+        .all()
+    )
+    categories = (
+        db.query(
+            models.TicketCategory.id,
+            models.TicketCategory.name,
+            models.TicketCategory.description,
+            models.TicketTypeModel.code.label("type_code"),
+            models.TicketCategory.is_active,
+        )
+        .outerjoin(models.TicketTypeModel, models.TicketCategory.ticket_type_id == models.TicketTypeModel.id)
+        .filter(models.TicketCategory.is_active.is_(True))
+        .order_by(models.TicketCategory.name.asc())
+        .all()
+    )
+    roles = db.query(models.Role).order_by(models.Role.id.asc()).all()
+    return ReferenceSnapshot(
+        types=[schemas.TicketTypeConfig.model_validate(ticket_type) for ticket_type in types],
+        categories=[
+            schemas.TicketCategoryConfig(
+                id=row.id,
+                name=row.name,
+                description=row.description,
+                type_code=row.type_code or "",
+                is_active=row.is_active,
+            )
+            for row in categories
+        ],
+        roles=[schemas.RoleRead.model_validate(role) for role in roles],
+    )
+
+
+class ReferenceDataCache:
+    """
+    Instantané courant, rechargé à l'expiration du TTL ou après invalidate().
+    Thread-safe : un seul thread recharge, les autres attendent puis lisent le nouvel instantané.
+    """
+
+    def __init__(self, ttl: float = REFERENCE_DATA_TTL_SECONDS):
+        self.ttl = ttl
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._loaded_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+        self._role_listeners: List[Callable[[], None]] = []
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._snapshot is not None
+            and not self._stale
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    def get(self, db: Optional[Session] = None) -> ReferenceSnapshot:
+        """
+        Instantané courant (rechargé si nécessaire avec la session fournie, sinon une session dédiée).
+        Si la base est injoignable, l'instantané précédent continue d'être servi.
+        """
+        if self._is_fresh():
+            return self._snapshot
+        return self._reload(db, force=False)
+
+    def refresh(self, db: Optional[Session] = None) -> ReferenceSnapshot:
+        """Recharge immédiatement (démarrage, identifiant inconnu du cache)"""
+        return self._reload(db, force=True)
+
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Appelé par le thread LISTEN à chaque modification d'une table de référence"""
+        self._stale = True
+        if table_name in (None, models.Role.__tablename__):
+            self._notify_roles_changed()
+
+    def on_roles_changed(self, callback: Callable[[], None]) -> None:
+        """Enregistre une fonction appelée quand les rôles changent (cache des utilisateurs authentifiés)"""
+        self._role_listeners.append(callback)
+
+    def _notify_roles_changed(self) -> None:
+        for callback in self._role_listeners:
+            callback()
+
+    def _reload(self, db: Optional[Session], force: bool) -> ReferenceSnapshot:
+        with self._lock:
+            # Un autre thread a pu recharger pendant l'attente du verrou
+            if not force and self._is_fresh():
+                return self._snapshot
+            # Une invalidation reçue pendant le chargement déclenchera un nouveau rechargement
+            self._stale = False
+            session = db if db is not None else SessionLocal()
+            try:
+                snapshot = _load(session)
+            except Exception as e:
+                self._stale = True
+                if self._snapshot is None:
+                    raise
+                print(f"Erreur lors du rechargement des données de référence, ancienne version conservée: {e}")
+                return self._snapshot
+            finally:
+                if db is None:
+                    session.close()
+            if self._snapshot is None or snapshot.version != self._snapshot.version:
+                print(f"Données de référence chargées (version {snapshot.version})")
+            # Modification de rôle reçue sans notification (écoute interrompue) : découverte au rechargement
+            roles_changed = self._snapshot is not None and snapshot.roles != self._snapshot.roles
+            self._snapshot = snapshot
+            self._loaded_at = time.monotonic()
+        if roles_changed:
+            self._notify_roles_changed()
+        return snapshot
+
+    def role_by_id(self, role_id: int, db: Optional[Session] = None) -> Optional[schemas.RoleRead]:
+        """Rôle par identifiant ; un identifiant inconnu force un rechargement (rôle tout juste créé)"""
+        role = self.get(db).roles_by_id.get(role_id)
+        if role is None:
+            role = self.refresh(db).roles_by_id.get(role_id)
+        return role
+
+
+reference_data = ReferenceDataCache()
+
+
+def load_reference_data() -> None:
+    """Chargement au démarrage : sans base disponible, le cache sera chargé à la première requête"""
+    try:
+        reference_data.refresh()
+    except Exception as e:
+        print(f"Données de référence non chargées au démarrage: {e}")
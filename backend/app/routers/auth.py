@@ -1,17 +1,20 @@
 from datetime import timedelta
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from .. import models, schemas
-from ..database import get_db
+from ..conditional import compute_etag, etag_matches, not_modified, set_etag
+from ..database import get_async_db, get_db
+from ..reference_data import CACHE_CONTROL, reference_data
 from ..security import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     authenticate_user,
     create_access_token,
-    get_password_hash,
+    get_password_hash_offloaded,
     get_current_user,
 )
 
@@ -40,7 +43,7 @@ def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
         agency=user_in.agency,
         phone=user_in.phone,
         username=user_in.username,
-        password_hash=get_password_hash(user_in.password),
+        password_hash=get_password_hash_offloaded(user_in.password),
         role_id=user_in.role_id,
     )
     db.add(db_user)
@@ -50,10 +53,11 @@ def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    # bcrypt s'exécute dans le pool de processus : la connexion n'occupe ni thread ni boucle d'événements
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -69,8 +73,7 @@ def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Charger le rôle pour s'assurer qu'il existe
-    user.role = db.query(models.Role).filter(models.Role.id == user.role_id).first()
+    # Vérifier que le rôle existe (chargé avec l'utilisateur)
     if not user.role:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -87,23 +90,25 @@ def login_for_access_token(
 
 @router.get("/me", response_model=schemas.UserRead)
 def get_current_user_info(
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
-    """Récupère les informations de l'utilisateur connecté"""
-    # S'assurer que le rôle est chargé
-    if current_user.role_id:
-        current_user.role = db.query(models.Role).filter(models.Role.id == current_user.role_id).first()
+    """Récupère les informations de l'utilisateur connecté (rôle déjà chargé par get_current_user)"""
     return current_user
 
 
 @router.get("/roles", response_model=List[schemas.RoleRead])
 def list_roles(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
-    """Liste tous les rôles disponibles"""
-    roles = db.query(models.Role).all()
-    return roles
+    """Liste tous les rôles disponibles (depuis le cache des données de référence)"""
+    snapshot = reference_data.get(db)
+    etag = compute_etag(request, snapshot.version)
+    if etag_matches(request, etag):
+        return not_modified(etag, CACHE_CONTROL)
+    set_etag(response, etag, CACHE_CONTROL)
+    return list(snapshot.roles)
 
 
@@ -0,0 +1,22 @@
+"""
+Router d'exposition des métriques du processus (format texte Prometheus)
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+from ..metrics import metrics_access_allowed, render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics(request: Request, authorization: Optional[str] = Header(None)):
+    """
+    Métriques du pool de connexions PostgreSQL (occupation, attente, durée d'emprunt).
+    Accès avec le jeton METRICS_TOKEN, ou depuis la machine locale si aucun jeton n'est configuré.
+    """
+    if not metrics_access_allowed(authorization, request.client.host if request.client else None):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Permission denied")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
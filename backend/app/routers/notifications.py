@@ -1,65 +1,191 @@
-from typing import List
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import os
+import secrets
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import delete, desc, func, select
 
 from .. import models, schemas
-from ..database import get_db
-from ..security import get_current_user
+from ..conditional import compute_etag, etag_matches, not_modified, set_etag
+from ..database import AsyncSessionLocal, get_async_db, get_db
+from ..pagination import apply_keyset, build_page
+from ..realtime import HEARTBEAT_SECONDS, format_event, realtime_listener
+from ..security import get_current_user, get_current_user_async, load_current_user_async
+
+# Durée de validité d'un ticket d'ouverture du flux SSE (le client l'utilise aussitôt)
+STREAM_TICKET_TTL_SECONDS = int(os.getenv("STREAM_TICKET_TTL_SECONDS", "30"))
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[schemas.NotificationRead])
-def get_my_notifications(
-    skip: int = Query(0, ge=0),
+async def get_my_notifications(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (en-tête X-Next-Cursor de la page précédente)"),
+    skip: int = Query(0, ge=0, deprecated=True, description="Obsolète : utiliser cursor"),
     limit: int = Query(50, ge=1, le=100),
     unread_only: bool = Query(False),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_async),
 ):
-    """Récupérer les notifications de l'utilisateur connecté"""
-    query = db.query(models.Notification).filter(
+    """
+    Récupérer les notifications de l'utilisateur connecté, les plus récentes d'abord.
+    Pagination par curseur : l'en-tête X-Next-Cursor contient le curseur de la page suivante
+    (absent sur la dernière page). Le paramètre skip reste accepté pour les anciens clients.
+    Réponse 304 si rien n'a changé (ETag : nombre, dernière création, compteur de non lues).
+    """
+    statement = select(models.Notification).filter(
         models.Notification.user_id == current_user.id
     )
     
     if unread_only:
-        query = query.filter(models.Notification.read == False)
+        statement = statement.filter(models.Notification.read == False)
     
-    notifications = (
-        query.order_by(desc(models.Notification.created_at))
-        .offset(skip)
-        .limit(limit)
-        .all()
+    # Une notification marquée comme lue fait baisser le compteur de non lues
+    fingerprint = select(
+        func.count(models.Notification.id),
+        func.max(models.Notification.created_at),
+        select(models.User.unread_notifications_count)
+        .where(models.User.id == current_user.id)
+        .scalar_subquery(),
+    ).where(statement.whereclause)
+    etag = compute_etag(request, current_user.id, *(await db.execute(fingerprint)).one())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+
+    if skip and not cursor:
+        result = await db.execute(
+            statement.order_by(desc(models.Notification.created_at), desc(models.Notification.id))
+            .offset(skip)
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    result = await db.execute(
+        apply_keyset(statement, models.Notification.created_at, models.Notification.id, cursor, limit)
     )
-    
-    return notifications
+    items, next_cursor = build_page(result.scalars().all(), limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 
 @router.get("/unread/count", response_model=dict)
-def get_unread_count(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+async def get_unread_count(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_async),
 ):
-    """Récupérer le nombre de notifications non lues"""
-    count = (
-        db.query(models.Notification)
-        .filter(
-            models.Notification.user_id == current_user.id,
-            models.Notification.read == False
+    """
+    Récupérer le nombre de notifications non lues.
+    Lu dans le compteur users.unread_notifications_count (tenu à jour par triggers) ;
+    si le compteur n'a pas changé depuis le dernier appel (If-None-Match), réponse 304 sans corps.
+    """
+    # Ne pas utiliser current_user : l'instance peut venir du cache d'authentification
+    count = await db.scalar(
+        select(models.User.unread_notifications_count).filter(models.User.id == current_user.id)
+    ) or 0
+
+    etag = f'W/"unread-{current_user.id}-{count}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    set_etag(response, etag)
+    return {"unread_count": count}
+
+
+@router.post("/stream-ticket", response_model=dict)
+async def create_stream_ticket(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_async),
+):
+    """
+    Ticket à usage unique pour ouvrir /notifications/stream (EventSource ne permet pas d'envoyer
+    l'en-tête Authorization ; le JWT ne doit pas apparaître dans l'URL).
+    Valable STREAM_TICKET_TTL_SECONDS secondes ; en demander un nouveau à chaque (re)connexion.
+    """
+    now = datetime.utcnow()
+    # Tickets jamais utilisés (onglet fermé entre les deux appels)
+    await db.execute(delete(models.StreamTicket).where(models.StreamTicket.expires_at <= now))
+    ticket = secrets.token_urlsafe(32)
+    db.add(models.StreamTicket(
+        ticket=ticket,
+        user_id=current_user.id,
+        expires_at=now + timedelta(seconds=STREAM_TICKET_TTL_SECONDS),
+    ))
+    await db.commit()
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_TTL_SECONDS}
+
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    ticket: str = Query(..., description="Ticket obtenu par POST /notifications/stream-ticket (usage unique)"),
+):
+    """
+    Flux Server-Sent Events remplaçant l'interrogation périodique des tableaux de bord :
+    - "notification" : nouvelle notification de l'utilisateur
+    - "ticket" : tickets créés ou modifiés par une même opération (tous les tickets pour les agents,
+      sinon ceux de l'utilisateur) ; {"count": n} sans liste quand l'opération en modifie trop
+    - "resync" : des événements ont pu être perdus, recharger les données
+    """
+    # Session fermée avant l'ouverture du flux : aucune connexion n'est gardée pendant l'écoute
+    async with AsyncSessionLocal() as db:
+        # Suppression atomique : un ticket ne peut ouvrir qu'un seul flux, quel que soit le worker
+        user_id = await db.scalar(
+            delete(models.StreamTicket)
+            .where(
+                models.StreamTicket.ticket == ticket,
+                models.StreamTicket.expires_at > datetime.utcnow(),
+            )
+            .returning(models.StreamTicket.user_id)
         )
-        .count()
+        await db.commit()
+        if user_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Ticket de flux invalide ou expiré",
+            )
+        current_user = await load_current_user_async(db, user_id)
+    role_name = current_user.role.name if current_user.role else None
+
+    async def event_stream():
+        subscription = realtime_listener.subscribe(current_user.id, role_name)
+        try:
+            # Délai de reconnexion automatique du navigateur (ms)
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                yield format_event(event, data)
+        finally:
+            realtime_listener.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    return {"unread_count": count}
 
 
 @router.put("/{notification_id}/read", response_model=schemas.NotificationRead)
 def mark_notification_as_read(
     notification_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     """Marquer une notification comme lue"""
     notification = (
@@ -88,7 +214,7 @@ def mark_notification_as_read(
 @router.put("/read-all", response_model=dict)
 def mark_all_as_read(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     """Marquer toutes les notifications comme lues"""
     updated = (
@@ -6,10 +6,11 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 
-from .. import models
+from .. import models, schemas
 from ..database import get_db
 from ..security import get_current_user, require_role
 from ..email_service import email_service
+from ..email_settings import EmailSettingsError, load_email_settings, save_email_settings
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
@@ -42,13 +43,7 @@ class EmailSettingsRead(BaseModel):
         from_attributes = True
 
 
-@router.get("/email", response_model=EmailSettingsRead)
-def get_email_settings(
-    current_user: models.User = Depends(
-        require_role("DSI", "Admin")
-    ),
-):
-    """Récupérer les paramètres email actuels"""
+def _current_settings() -> EmailSettingsRead:
     return EmailSettingsRead(
         smtp_server=email_service.smtp_server,
         smtp_port=email_service.smtp_port,
@@ -61,58 +56,48 @@ def get_email_settings(
     )
 
 
+@router.get("/email", response_model=EmailSettingsRead)
+def get_email_settings(
+    db: Session = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(
+        require_role("DSI", "Admin")
+    ),
+):
+    """Récupérer les paramètres email actuels (environnement, remplacé par les valeurs enregistrées)"""
+    load_email_settings(db)
+    return _current_settings()
+
+
 @router.put("/email", response_model=EmailSettingsRead)
 def update_email_settings(
     settings: EmailSettingsUpdate,
-    current_user: models.User = Depends(
+    db: Session = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(
         require_role("DSI", "Admin")
     ),
 ):
-    """Mettre à jour les paramètres email"""
-    # Mettre à jour les paramètres du service email
-    if settings.smtp_server is not None:
-        email_service.smtp_server = settings.smtp_server
-    if settings.smtp_port is not None:
-        email_service.smtp_port = settings.smtp_port
-    if settings.smtp_username is not None:
-        email_service.smtp_username = settings.smtp_username
-    if settings.smtp_password is not None:
-        email_service.smtp_password = settings.smtp_password
-    if settings.sender_email is not None:
-        email_service.sender_email = settings.sender_email
-    if settings.sender_name is not None:
-        email_service.sender_name = settings.sender_name
-    if settings.use_tls is not None:
-        email_service.use_tls = settings.use_tls
-    if settings.verify_ssl is not None:
-        email_service.verify_ssl = settings.verify_ssl
-    if settings.email_enabled is not None:
-        email_service.email_enabled = settings.email_enabled
-    
-    # Note: Dans un environnement de production, vous devriez sauvegarder
-    # ces paramètres dans la base de données ou un fichier de configuration
-    # sécurisé plutôt que dans la mémoire
-    
-    return EmailSettingsRead(
-        smtp_server=email_service.smtp_server,
-        smtp_port=email_service.smtp_port,
-        smtp_username=email_service.smtp_username or "",
-        sender_email=email_service.sender_email,
-        sender_name=email_service.sender_name,
-        use_tls=email_service.use_tls,
-        verify_ssl=email_service.verify_ssl,
-        email_enabled=email_service.email_enabled
-    )
+    """
+    Mettre à jour les paramètres email.
+    Enregistrés en base : le worker d'envoi les applique avant son prochain lot.
+    Le mot de passe SMTP est chiffré ; sans EMAIL_SETTINGS_KEY il est refusé (400).
+    """
+    try:
+        save_email_settings(db, settings.model_dump(exclude_unset=True))
+    except EmailSettingsError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return _current_settings()
 
 
 @router.post("/email/test")
 def test_email_configuration(
     test_email: EmailStr,
-    current_user: models.User = Depends(
+    db: Session = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(
         require_role("DSI", "Admin")
     ),
 ):
     """Tester la configuration email en envoyant un email de test"""
+    load_email_settings(db)
     subject = "Test de configuration email - Système de Gestion des Tickets"
     body = f"""
 Bonjour,
@@ -1,35 +1,149 @@
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, or_, cast, String
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy import func, literal_column, or_, select, tuple_
 
 from .. import models, schemas
-from ..database import get_db
-from ..security import get_current_user, require_role
-from ..email_service import email_service
+from ..cache import TTLCache
+from ..conditional import compute_etag, etag_matches, not_modified, set_etag
+from ..database import get_async_db, get_db
+from ..security import get_current_user, get_current_user_async, require_role, require_role_async
+from ..email_queue import enqueue_email, enqueue_emails
+from ..notification_service import AGENT_ROLES, notify_roles, role_email_recipients
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, apply_keyset, build_page
+from ..search import ranked_ticket_search, ticket_search_filter
+from ..technician_metrics import refresh_technician_metrics
 
 router = APIRouter()
 
+# Statistiques agrégées, mises en cache par filtres (identiques pour tous les rôles autorisés)
+STATS_CACHE_TTL_SECONDS = 60
+_stats_cache = TTLCache(maxsize=256, ttl=STATS_CACHE_TTL_SECONDS)
+
+
+# Relations sérialisées par TicketRead (créateur, technicien et leur rôle), chargées dans la même requête
+TICKET_READ_OPTIONS = (
+    joinedload(models.Ticket.creator).joinedload(models.User.role),
+    joinedload(models.Ticket.technician).joinedload(models.User.role),
+)
+
+
+# Vue compacte (schemas.TicketListItem) : requête sur les seules colonnes affichées, noms du
+# créateur et du technicien par jointure ; ni description, ni pièces jointes, ni objets ORM
+_creator = aliased(models.User)
+_technician = aliased(models.User)
+TICKET_LIST_COLUMNS = (
+    models.Ticket.id,
+    models.Ticket.number,
+    models.Ticket.title,
+    models.Ticket.type,
+    models.Ticket.priority,
+    models.Ticket.status,
+    models.Ticket.category,
+    models.Ticket.created_at,
+    models.Ticket.assigned_at,
+    models.Ticket.resolved_at,
+    models.Ticket.closed_at,
+    models.Ticket.creator_id,
+    _creator.full_name.label("creator_name"),
+    models.Ticket.technician_id,
+    _technician.full_name.label("technician_name"),
+)
+
+TicketListResponse = Union[
+    schemas.TicketPage, List[schemas.TicketRead], schemas.TicketListPage, List[schemas.TicketListItem]
+]
+
+
+def _ticket_list_statement(view: str):
+    """Requête de base d'une liste de tickets selon la vue demandée (filtres à ajouter par l'appelant)"""
+    if view == "compact":
+        return (
+            select(*TICKET_LIST_COLUMNS)
+            .select_from(models.Ticket)
+            .outerjoin(_creator, _creator.id == models.Ticket.creator_id)
+            .outerjoin(_technician, _technician.id == models.Ticket.technician_id)
+        )
+    return select(models.Ticket).options(*TICKET_READ_OPTIONS)
+
+
+async def _list_tickets_response(
+    db: AsyncSession,
+    request: Request,
+    response: Response,
+    current_user: schemas.CurrentUser,
+    statement,
+    paginate: bool,
+    cursor: Optional[str],
+    limit: int,
+    view: str = "full",
+):
+    """
+    Exécute une requête de liste de tickets.
+    Par défaut la réponse est paginée par curseur ; paginate=false renvoie l'ancienne liste complète.
+    Requête conditionnelle : l'ETag est calculé sur (nombre de tickets, dernière modification) de la
+    portée de la requête et la dernière modification d'un utilisateur ; si le client a déjà cette
+    version, réponse 304 sans charger les tickets.
+    """
+    # Empreinte lue dans les index, calculée seulement quand un 304 est possible (If-None-Match)
+    # ou pour une réponse à revalider ensuite (liste complète, première page) : les pages suivantes
+    # d'un parcours par curseur n'en ont pas besoin. Les utilisateurs (noms et rôles affichés dans
+    # les tickets) changent rarement : leur date de modification globale suffit.
+    etag = None
+    if not paginate or cursor is None or request.headers.get("if-none-match"):
+        fingerprint = select(
+            func.count(models.Ticket.id),
+            func.max(models.Ticket.updated_at),
+            select(func.max(models.User.updated_at)).scalar_subquery(),
+        )
+        if statement.whereclause is not None:
+            fingerprint = fingerprint.where(statement.whereclause)
+        etag = compute_etag(request, current_user.id, *(await db.execute(fingerprint)).one())
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    if paginate:
+        statement = apply_keyset(statement, models.Ticket.created_at, models.Ticket.id, cursor, limit)
+    else:
+        statement = statement.order_by(models.Ticket.created_at.desc())
+    result = await db.execute(statement)
+
+    if view != "compact":
+        if etag:
+            set_etag(response, etag)
+        tickets = result.scalars().all()
+        if not paginate:
+            return tickets
+        items, next_cursor = build_page(tickets, limit)
+        return schemas.TicketPage(items=items, next_cursor=next_cursor)
+
+    # Vue compacte : les lignes viennent d'une requête sur des colonnes typées (TICKET_LIST_COLUMNS),
+    # déjà conformes à TicketListItem. La validation Pydantic est sautée, orjson encode directement.
+    rows = result.all()
+    if paginate:
+        items, next_cursor = build_page(rows, limit)
+        content = {"items": [row._asdict() for row in items], "next_cursor": next_cursor}
+    else:
+        content = [row._asdict() for row in rows]
+    compact_response = ORJSONResponse(content)
+    if etag:
+        set_etag(compact_response, etag)
+    return compact_response
+
 
 @router.post("/", response_model=schemas.TicketRead)
 def create_ticket(
     ticket_in: schemas.TicketCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_role("Utilisateur")),
+    current_user: schemas.CurrentUser = Depends(require_role("Utilisateur")),
 ):
     """Créer un nouveau ticket"""
-    # Générer le numéro de ticket automatiquement
-    # Récupérer le dernier numéro de ticket
-    last_ticket = db.query(models.Ticket).order_by(models.Ticket.number.desc()).first()
-    next_number = 1
-    if last_ticket and last_ticket.number:
-        next_number = last_ticket.number + 1
-    
+    # Le numéro est attribué par la séquence tickets_number_seq à l'insertion
     ticket = models.Ticket(
-        number=next_number,  # Assigner le numéro généré
         title=ticket_in.title,
         description=ticket_in.description,
         type=ticket_in.type,
@@ -40,57 +154,35 @@ def create_ticket(
         status=models.TicketStatus.EN_ATTENTE_ANALYSE,
     )
     db.add(ticket)
-    db.commit()
-    db.refresh(ticket)
-    
-    # Créer une notification pour les Secrétaires/Adjoints DSI, DSI et Admin
-    # Récupérer tous les utilisateurs concernés (Secrétaire DSI, Adjoint DSI, DSI, Admin)
-    # Ces rôles sont ceux qui peuvent assigner des tickets à des techniciens
-    target_roles = db.query(models.Role).filter(
-        models.Role.name.in_(["Secrétaire DSI", "Adjoint DSI", "DSI", "Admin"])
-    ).all()
+    # Obtenir l'id du ticket sans commiter : ticket, notifications et emails sont
+    # enregistrés dans une seule transaction
+    db.flush()
+    
+    # Notifier les Secrétaires/Adjoints DSI, DSI et Admin (rôles qui assignent les tickets)
+    notify_roles(
+        db,
+        AGENT_ROLES,
+        models.NotificationType.NOUVEAU_TICKET,
+        ticket.id,
+        f"Nouveau ticket #{ticket.number} créé: {ticket.title}",
+    )
     
-    # Préparer l'envoi d'emails en arrière-plan (asynchrone)
-    notified_users = []
-    if target_roles:
-        for role in target_roles:
-            users = (
-                db.query(models.User)
-                .options(joinedload(models.User.role))
-                .filter(
-                    models.User.role_id == role.id,
-                    models.User.actif == True
-                )
-                .all()
-            )
-            for user in users:
-                # Créer une notification dans la base de données
-                notification = models.Notification(
-                    user_id=user.id,
-                    type=models.NotificationType.NOUVEAU_TICKET,
-                    ticket_id=ticket.id,
-                    message=f"Nouveau ticket #{ticket.number} créé: {ticket.title}",
-                    read=False
-                )
-                db.add(notification)
-                
-                # Ajouter l'utilisateur à la liste pour l'envoi d'emails (éviter doublons par email)
-                if user.email and user.email.strip() and user.email not in [u.email for u in notified_users if u.email]:
-                    notified_users.append(user)
-        
-        db.commit()
-        
-        # Ajouter les tâches d'envoi d'emails en arrière-plan
-        for user in notified_users:
-            background_tasks.add_task(
-                email_service.send_ticket_created_notification_with_actions,
-                ticket_id=str(ticket.id),
-                ticket_number=ticket.number,
-                ticket_title=ticket.title,
-                creator_name=current_user.full_name,
-                recipient_email=user.email,
-                recipient_role=user.role.name if user.role else ""
-            )
+    # Mettre les emails en file d'attente (une seule fois par adresse)
+    enqueue_emails(
+        db,
+        "send_ticket_created_notification_with_actions",
+        [
+            {
+                "ticket_id": str(ticket.id),
+                "ticket_number": ticket.number,
+                "ticket_title": ticket.title,
+                "creator_name": current_user.full_name,
+                "recipient_email": recipient_email,
+                "recipient_role": recipient_role,
+            }
+            for recipient_email, recipient_role in role_email_recipients(db, AGENT_ROLES)
+        ],
+    )
     
     # Créer une notification pour le créateur du ticket
     creator_notification = models.Notification(
@@ -101,18 +193,19 @@ def create_ticket(
         read=False
     )
     db.add(creator_notification)
-    db.commit()
     
-    # Envoyer un email de confirmation au créateur en arrière-plan (asynchrone)
+    # Email de confirmation au créateur, mis en file d'attente dans la même transaction
     if current_user.email and current_user.email.strip():
-        background_tasks.add_task(
-            email_service.send_ticket_created_to_creator_notification,
+        enqueue_email(
+            db,
+            "send_ticket_created_to_creator_notification",
             ticket_id=str(ticket.id),
             ticket_number=ticket.number,
             ticket_title=ticket.title,
             creator_email=current_user.email,
             creator_name=current_user.full_name
         )
+    db.commit()
     
     # Charger les relations pour la réponse
     ticket = (
@@ -128,140 +221,202 @@ def create_ticket(
     return ticket
 
 
-@router.get("/me", response_model=List[schemas.TicketRead])
-def list_my_tickets(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+@router.get("/me", response_model=TicketListResponse, response_class=ORJSONResponse)
+async def list_my_tickets(
+    request: Request,
+    response: Response,
+    paginate: bool = Query(True, description="false pour renvoyer la liste complète (ancien format)"),
+    cursor: Optional[str] = Query(None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    view: Literal["full", "compact"] = Query("full", description="compact : champs d'affichage de liste uniquement (TicketListItem)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_async),
 ):
     """Liste des tickets créés par l'utilisateur connecté"""
-    tickets = (
-        db.query(models.Ticket)
-        .options(
-            joinedload(models.Ticket.creator),
-            joinedload(models.Ticket.technician)
-        )
-        .filter(models.Ticket.creator_id == current_user.id)
-        .order_by(models.Ticket.created_at.desc())
-        .all()
+    statement = _ticket_list_statement(view).filter(models.Ticket.creator_id == current_user.id)
+    return await _list_tickets_response(
+        db, request, response, current_user, statement, paginate, cursor, limit, view
     )
-    return tickets
 
 
-@router.get("/", response_model=List[schemas.TicketRead])
-def list_all_tickets(
+@router.get("/", response_model=TicketListResponse, response_class=ORJSONResponse)
+async def list_all_tickets(
+    request: Request,
+    response: Response,
     search: Optional[str] = Query(None, description="Rechercher par ID, Numéro, Titre ou Description"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(
-        require_role("Secrétaire DSI", "Adjoint DSI", "DSI", "Admin")
+    paginate: bool = Query(True, description="false pour renvoyer la liste complète (ancien format)"),
+    cursor: Optional[str] = Query(None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    view: Literal["full", "compact"] = Query("full", description="compact : champs d'affichage de liste uniquement (TicketListItem)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(
+        require_role_async("Secrétaire DSI", "Adjoint DSI", "DSI", "Admin")
     ),
 ):
     """Liste de tous les tickets (pour secrétaire/adjoint/DSI/admin)"""
-    query = (
-        db.query(models.Ticket)
-        .options(
-            joinedload(models.Ticket.creator),
-            joinedload(models.Ticket.technician)
-        )
-    )
+    statement = _ticket_list_statement(view)
     
-    # Ajouter le filtre de recherche si fourni
+    # Ajouter le filtre de recherche si fourni (numéro exact, sinon index plein texte/trigrammes)
     if search:
-        # Essayer de convertir la recherche en nombre pour une recherche exacte
-        search_number = None
-        try:
-            search_number = int(search.strip())
-        except (ValueError, AttributeError):
-            pass
-        
-        # Construire le filtre de recherche
-        if search_number is not None:
-            # Si la recherche est un nombre pur, faire UNIQUEMENT une recherche exacte par numéro de ticket
-            # (le numéro visible par l'utilisateur, pas l'ID interne)
-            # Cela évite les faux positifs si l'ID diffère du numéro
-            search_conditions = [
-                models.Ticket.number == search_number  # Recherche exacte par numéro uniquement
-            ]
-        else:
-            # Si ce n'est pas un nombre, faire une recherche partielle sur tous les champs
-            search_conditions = [
-                cast(models.Ticket.id, String).ilike(f"%{search}%"),
-                models.Ticket.title.ilike(f"%{search}%"),
-                models.Ticket.description.ilike(f"%{search}%"),
-                cast(models.Ticket.number, String).ilike(f"%{search}%")
-            ]
-        
-        search_filter = or_(*search_conditions)
-        query = query.filter(search_filter)
+        statement = statement.filter(ticket_search_filter(search))
     
-    tickets = query.order_by(models.Ticket.created_at.desc()).all()
-    return tickets
+    return await _list_tickets_response(
+        db, request, response, current_user, statement, paginate, cursor, limit, view
+    )
 
 
-@router.get("/assigned", response_model=List[schemas.TicketRead])
-def list_assigned_tickets(
+@router.get("/assigned", response_model=TicketListResponse, response_class=ORJSONResponse)
+async def list_assigned_tickets(
+    request: Request,
+    response: Response,
     search: Optional[str] = Query(None, description="Rechercher par ID, Numéro, Titre ou Description"),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    paginate: bool = Query(True, description="false pour renvoyer la liste complète (ancien format)"),
+    cursor: Optional[str] = Query(None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    view: Literal["full", "compact"] = Query("full", description="compact : champs d'affichage de liste uniquement (TicketListItem)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_async),
 ):
     """Liste des tickets assignés au technicien connecté"""
-    query = (
-        db.query(models.Ticket)
-        .options(
-            joinedload(models.Ticket.creator),
-            joinedload(models.Ticket.technician)
-        )
-        .filter(models.Ticket.technician_id == current_user.id)
-    )
+    statement = _ticket_list_statement(view).filter(models.Ticket.technician_id == current_user.id)
     
-    # Ajouter le filtre de recherche si fourni
+    # Ajouter le filtre de recherche si fourni (numéro exact, sinon index plein texte/trigrammes)
     if search:
-        # Essayer de convertir la recherche en nombre pour une recherche exacte
-        search_number = None
-        try:
-            search_number = int(search.strip())
-        except (ValueError, AttributeError):
-            pass
-        
-        # Construire le filtre de recherche
-        if search_number is not None:
-            # Si la recherche est un nombre pur, faire UNIQUEMENT une recherche exacte par numéro de ticket
-            # (le numéro visible par l'utilisateur, pas l'ID interne)
-            # Cela évite les faux positifs si l'ID diffère du numéro
-            search_conditions = [
-                models.Ticket.number == search_number  # Recherche exacte par numéro uniquement
-            ]
+        statement = statement.filter(ticket_search_filter(search))
+
+    return await _list_tickets_response(
+        db, request, response, current_user, statement, paginate, cursor, limit, view
+    )
+
+
+def _compute_ticket_stats(
+    db: Session,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    agency: Optional[str],
+    ticket_type: Optional[models.TicketType],
+) -> schemas.TicketStats:
+    """
+    Calcule tous les regroupements en un seul parcours de la table grâce à GROUPING SETS.
+    GROUPING(col) = 0 indique la dimension à laquelle appartient chaque ligne.
+    """
+    # Littéral SQL (et non paramètre lié) pour que l'expression du SELECT soit identique à celle du GROUP BY
+    month = func.date_trunc(literal_column("'month'"), models.Ticket.created_at)
+    dimensions = {
+        "by_status": models.Ticket.status,
+        "by_priority": models.Ticket.priority,
+        "by_type": models.Ticket.type,
+        "by_category": models.Ticket.category,
+        "by_agency": models.Ticket.user_agency,
+        "by_month": month,
+    }
+    columns = list(dimensions.values())
+
+    query = db.query(
+        *columns,
+        *[func.grouping(column) for column in columns],
+        func.count(models.Ticket.id),
+    )
+    if date_from:
+        query = query.filter(models.Ticket.created_at >= date_from)
+    if date_to:
+        query = query.filter(models.Ticket.created_at <= date_to)
+    if agency:
+        query = query.filter(models.Ticket.user_agency == agency)
+    if ticket_type:
+        query = query.filter(models.Ticket.type == ticket_type)
+
+    rows = query.group_by(
+        func.grouping_sets(tuple_(), *[tuple_(column) for column in columns])
+    ).all()
+
+    stats = {name: {} for name in dimensions}
+    total = 0
+    names = list(dimensions.keys())
+    for row in rows:
+        values = row[:len(columns)]
+        groupings = row[len(columns):2 * len(columns)]
+        count = row[-1]
+        if all(groupings):
+            # Ensemble vide () : total général
+            total = count
+            continue
+        index = groupings.index(0)
+        value = values[index]
+        if value is None:
+            key = "non_renseigne"
+        elif names[index] == "by_month":
+            key = value.strftime("%Y-%m")
+        elif hasattr(value, "value"):
+            key = value.value
         else:
-            # Si ce n'est pas un nombre, faire une recherche partielle sur tous les champs
-            search_conditions = [
-                cast(models.Ticket.id, String).ilike(f"%{search}%"),
-                models.Ticket.title.ilike(f"%{search}%"),
-                models.Ticket.description.ilike(f"%{search}%"),
-                cast(models.Ticket.number, String).ilike(f"%{search}%")
-            ]
-        
-        search_filter = or_(*search_conditions)
-        query = query.filter(search_filter)
+            key = str(value)
+        stats[names[index]][key] = stats[names[index]].get(key, 0) + count
+
+    return schemas.TicketStats(total=total, **stats)
+
+
+@router.get("/stats", response_model=schemas.TicketStats, response_class=ORJSONResponse)
+def get_ticket_stats(
+    response: Response,
+    date_from: Optional[datetime] = Query(None, description="Tickets créés à partir de cette date"),
+    date_to: Optional[datetime] = Query(None, description="Tickets créés jusqu'à cette date"),
+    agency: Optional[str] = Query(None),
+    ticket_type: Optional[models.TicketType] = Query(None, alias="type"),
+    db: Session = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(
+        require_role("Secrétaire DSI", "Adjoint DSI", "DSI", "Admin")
+    ),
+):
+    """Statistiques agrégées des tickets (par statut, priorité, type, catégorie, agence et mois)"""
+    cache_key = (date_from, date_to, agency, ticket_type)
+    stats = _stats_cache.get(cache_key)
+    if stats is None:
+        stats = _compute_ticket_stats(db, date_from, date_to, agency, ticket_type)
+        _stats_cache.set(cache_key, stats)
+
+    response.headers["Cache-Control"] = f"private, max-age={STATS_CACHE_TTL_SECONDS}"
+    response.headers["Vary"] = "Authorization"
+    return stats
+
+
+@router.get("/search", response_model=List[schemas.TicketSearchHit], response_class=ORJSONResponse)
+def search_tickets(
+    q: str = Query(..., min_length=1, description="Numéro de ticket ou mots recherchés dans le titre/la description"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+):
+    """Recherche de tickets classée par pertinence, avec extraits surlignés"""
+    scope_filter = None
+    is_agent = current_user.role and current_user.role.name in ["Secrétaire DSI", "Adjoint DSI", "DSI", "Admin"]
+    if not is_agent:
+        # Les autres rôles ne voient que leurs tickets créés ou assignés
+        scope_filter = or_(
+            models.Ticket.creator_id == current_user.id,
+            models.Ticket.technician_id == current_user.id,
+        )
 
-    tickets = query.order_by(models.Ticket.created_at.desc()).all()
-    return tickets
+    hits = ranked_ticket_search(db, q, limit, scope_filter)
+    return [
+        schemas.TicketSearchHit(
+            ticket=ticket,
+            rank=rank,
+            title_highlight=title_highlight,
+            description_highlight=description_highlight,
+        )
+        for ticket, rank, title_highlight, description_highlight in hits
+    ]
 
 
 @router.get("/{ticket_id}", response_model=schemas.TicketRead)
-def get_ticket(
+async def get_ticket(
     ticket_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(get_current_user_async),
 ):
     """Récupérer un ticket par son ID"""
-    ticket = (
-        db.query(models.Ticket)
-        .options(
-            joinedload(models.Ticket.creator),
-            joinedload(models.Ticket.technician)
-        )
-        .filter(models.Ticket.id == ticket_id)
-        .first()
-    )
+    ticket = await db.get(models.Ticket, ticket_id, options=TICKET_READ_OPTIONS)
     if not ticket:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Ticket not found"
@@ -285,7 +440,7 @@ def edit_ticket(
     ticket_id: int,
     ticket_in: schemas.TicketEdit,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
     if not ticket:
@@ -344,7 +499,7 @@ def edit_ticket(
 def delete_ticket(
     ticket_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
     if not ticket:
@@ -383,9 +538,8 @@ def delete_ticket(
 def assign_ticket(
     ticket_id: int,
     assign_data: schemas.TicketAssign,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(
+    current_user: schemas.CurrentUser = Depends(
         require_role("Secrétaire DSI", "Adjoint DSI", "DSI", "Admin")
     ),
 ):
@@ -405,6 +559,7 @@ def assign_ticket(
     
     # Enregistrer l'ancien statut pour l'historique
     old_status = ticket.status
+    previous_technician_id = ticket.technician_id
     
     # Assigner le ticket
     ticket.technician_id = assign_data.technician_id
@@ -446,16 +601,16 @@ def assign_ticket(
     )
     db.add(creator_notification)
     
-    db.commit()
-    db.refresh(ticket)
+    refresh_technician_metrics(db, [previous_technician_id, ticket.technician_id])
     
     # Récupérer le créateur du ticket pour l'email
     creator = db.query(models.User).filter(models.User.id == ticket.creator_id).first()
     
-    # Envoyer les emails en arrière-plan (asynchrone)
+    # Mettre les emails en file d'attente dans la même transaction
     if technician.email and technician.email.strip():
-        background_tasks.add_task(
-            email_service.send_ticket_assigned_notification,
+        enqueue_email(
+            db,
+            "send_ticket_assigned_notification",
             ticket_id=str(ticket.id),
             ticket_number=ticket.number,
             ticket_title=ticket.title,
@@ -466,8 +621,9 @@ def assign_ticket(
         )
     
     if creator and creator.email and creator.email.strip():
-        background_tasks.add_task(
-            email_service.send_ticket_assigned_to_creator_notification,
+        enqueue_email(
+            db,
+            "send_ticket_assigned_to_creator_notification",
             ticket_id=str(ticket.id),
             ticket_number=ticket.number,
             ticket_title=ticket.title,
@@ -476,6 +632,9 @@ def assign_ticket(
             technician_name=technician.full_name
         )
     
+    db.commit()
+    db.refresh(ticket)
+    
     # Charger les relations pour la réponse
     ticket = (
         db.query(models.Ticket)
@@ -494,9 +653,8 @@ def assign_ticket(
 def reassign_ticket(
     ticket_id: int,
     assign_data: schemas.TicketAssign,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(
+    current_user: schemas.CurrentUser = Depends(
         require_role("Secrétaire DSI", "Adjoint DSI", "DSI", "Admin")
     ),
 ):
@@ -585,13 +743,13 @@ def reassign_ticket(
     creator = db.query(models.User).filter(models.User.id == ticket.creator_id).first()
     old_technician_name = old_technician.full_name if old_technician else None
     
-    db.commit()
-    db.refresh(ticket)
+    refresh_technician_metrics(db, [old_technician_id, ticket.technician_id])
     
-    # Envoyer un email de notification au nouveau technicien en arrière-plan (asynchrone)
+    # Mettre en file d'attente un email de notification au nouveau technicien
     if technician.email and technician.email.strip():
-        background_tasks.add_task(
-            email_service.send_ticket_assigned_notification,
+        enqueue_email(
+            db,
+            "send_ticket_assigned_notification",
             ticket_id=str(ticket.id),
             ticket_number=ticket.number,
             ticket_title=ticket.title,
@@ -603,8 +761,9 @@ def reassign_ticket(
     
     # Envoyer un email au créateur pour le changement de technicien
     if creator and creator.email and creator.email.strip():
-        background_tasks.add_task(
-            email_service.send_technician_changed_notification,
+        enqueue_email(
+            db,
+            "send_technician_changed_notification",
             ticket_id=str(ticket.id),
             ticket_number=ticket.number,
             ticket_title=ticket.title,
@@ -614,6 +773,9 @@ def reassign_ticket(
             new_technician_name=technician.full_name
         )
     
+    db.commit()
+    db.refresh(ticket)
+    
     # Charger les relations pour la réponse
     ticket = (
         db.query(models.Ticket)
@@ -632,7 +794,7 @@ def reassign_ticket(
 def escalate_ticket(
     ticket_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(
+    current_user: schemas.CurrentUser = Depends(
         require_role("Adjoint DSI", "DSI", "Admin")
     ),
 ):
@@ -671,27 +833,15 @@ def escalate_ticket(
     )
     db.add(history)
     
-    # Créer des notifications pour DSI et Adjoints DSI
-    dsi_roles = db.query(models.Role).filter(
-        models.Role.name.in_(["DSI", "Adjoint DSI"])
-    ).all()
-    
-    for role in dsi_roles:
-        dsi_users = db.query(models.User).filter(
-            models.User.role_id == role.id,
-            models.User.actif == True
-        ).all()
-        for dsi_user in dsi_users:
-            # Ne pas notifier l'utilisateur qui a escaladé
-            if dsi_user.id != current_user.id:
-                escalation_notification = models.Notification(
-                    user_id=dsi_user.id,
-                    type=models.NotificationType.ESCALADE,
-                    ticket_id=ticket.id,
-                    message=f"Ticket #{ticket.number} escaladé à la priorité {ticket.priority}: {ticket.title}",
-                    read=False
-                )
-                db.add(escalation_notification)
+    # Créer des notifications pour DSI et Adjoints DSI (sauf l'utilisateur qui a escaladé)
+    notify_roles(
+        db,
+        ["DSI", "Adjoint DSI"],
+        models.NotificationType.ESCALADE,
+        ticket.id,
+        f"Ticket #{ticket.number} escaladé à la priorité {ticket.priority}: {ticket.title}",
+        exclude_user_ids=[current_user.id],
+    )
     
     # Notifier aussi le technicien assigné s'il existe
     if ticket.technician_id:
@@ -735,9 +885,8 @@ def escalate_ticket(
 def update_ticket_status(
     ticket_id: int,
     status_update: schemas.TicketUpdate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     """Mettre à jour le statut d'un ticket"""
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -772,8 +921,9 @@ def update_ticket_status(
         
         # Envoyer un email au créateur
         if creator and creator.email and creator.email.strip():
-            background_tasks.add_task(
-                email_service.send_ticket_resolved_notification,
+            enqueue_email(
+                db,
+                "send_ticket_resolved_notification",
                 ticket_id=str(ticket.id),
                 ticket_number=ticket.number,
                 ticket_title=ticket.title,
@@ -802,8 +952,9 @@ def update_ticket_status(
         
         # Envoyer un email au créateur
         if creator and creator.email and creator.email.strip():
-            background_tasks.add_task(
-                email_service.send_ticket_closed_notification_to_user,
+            enqueue_email(
+                db,
+                "send_ticket_closed_notification_to_user",
                 ticket_id=str(ticket.id),
                 ticket_number=ticket.number,
                 ticket_title=ticket.title,
@@ -841,8 +992,9 @@ def update_ticket_status(
         
         # Envoyer un email au créateur
         if creator and creator.email and creator.email.strip() and technician:
-            background_tasks.add_task(
-                email_service.send_ticket_in_progress_notification,
+            enqueue_email(
+                db,
+                "send_ticket_in_progress_notification",
                 ticket_id=str(ticket.id),
                 ticket_number=ticket.number,
                 ticket_title=ticket.title,
@@ -863,8 +1015,9 @@ def update_ticket_status(
         
         # Envoyer un email au créateur
         if creator and creator.email and creator.email.strip():
-            background_tasks.add_task(
-                email_service.send_ticket_rejected_notification_to_user,
+            enqueue_email(
+                db,
+                "send_ticket_rejected_notification_to_user",
                 ticket_id=str(ticket.id),
                 ticket_number=ticket.number,
                 ticket_title=ticket.title,
@@ -889,6 +1042,7 @@ def update_ticket_status(
         reason=history_reason,
     )
     db.add(history)
+    refresh_technician_metrics(db, [ticket.technician_id])
     db.commit()
     db.refresh(ticket)
     
@@ -910,9 +1064,8 @@ def update_ticket_status(
 def add_comment(
     ticket_id: int,
     comment_in: schemas.CommentCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     """Ajouter un commentaire à un ticket"""
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -944,12 +1097,12 @@ def add_comment(
                 read=False
             )
             db.add(notification)
-            db.commit()
             
-            # Envoyer un email au créateur
+            # Mettre en file d'attente un email au créateur
             if creator.email and creator.email.strip():
-                background_tasks.add_task(
-                    email_service.send_comment_notification_to_user,
+                enqueue_email(
+                    db,
+                    "send_comment_notification_to_user",
                     ticket_id=str(ticket.id),
                     ticket_number=ticket.number,
                     ticket_title=ticket.title,
@@ -958,6 +1111,7 @@ def add_comment(
                     commenter_name=current_user.full_name,
                     comment_content=comment_in.content
                 )
+            db.commit()
     
     return comment
 
@@ -966,7 +1120,7 @@ def add_comment(
 def get_ticket_comments(
     ticket_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     """Récupérer tous les commentaires d'un ticket"""
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -988,9 +1142,8 @@ def get_ticket_comments(
 def validate_ticket_resolution(
     ticket_id: int,
     validation: schemas.TicketValidation,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     """Valider ou rejeter la résolution d'un ticket (par le créateur du ticket)"""
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -1036,8 +1189,9 @@ def validate_ticket_resolution(
         
         # Envoyer un email au créateur
         if creator and creator.email and creator.email.strip():
-            background_tasks.add_task(
-                email_service.send_ticket_closed_notification_to_user,
+            enqueue_email(
+                db,
+                "send_ticket_closed_notification_to_user",
                 ticket_id=str(ticket.id),
                 ticket_number=ticket.number,
                 ticket_title=ticket.title,
@@ -1083,7 +1237,9 @@ def validate_ticket_resolution(
             db.add(notification)
             technician = db.query(models.User).filter(models.User.id == ticket.technician_id).first()
             if technician and technician.email and technician.email.strip():
-                email_service.send_ticket_rejected_notification(
+                enqueue_email(
+                    db,
+                    "send_ticket_rejected_notification",
                     ticket_number=ticket.number,
                     ticket_title=ticket.title,
                     technician_email=technician.email,
@@ -1092,24 +1248,13 @@ def validate_ticket_resolution(
                 )
         
         # Notifier DSI, Adjoints DSI et Secrétaires DSI
-        admin_roles = db.query(models.Role).filter(
-            models.Role.name.in_(["DSI", "Adjoint DSI", "Secrétaire DSI"])
-        ).all()
-        
-        for role in admin_roles:
-            admin_users = db.query(models.User).filter(
-                models.User.role_id == role.id,
-                models.User.actif == True
-            ).all()
-            for admin_user in admin_users:
-                admin_notification = models.Notification(
-                    user_id=admin_user.id,
-                    type=models.NotificationType.REJET_RESOLUTION,
-                    ticket_id=ticket.id,
-                    message=f"L'utilisateur a rejeté la résolution du ticket #{ticket.number}: {ticket.title}. Motif: {validation.rejection_reason}",
-                    read=False
-                )
-                db.add(admin_notification)
+        notify_roles(
+            db,
+            ["DSI", "Adjoint DSI", "Secrétaire DSI"],
+            models.NotificationType.REJET_RESOLUTION,
+            ticket.id,
+            f"L'utilisateur a rejeté la résolution du ticket #{ticket.number}: {ticket.title}. Motif: {validation.rejection_reason}",
+        )
         
         # Construire la raison pour l'historique avec le motif
         history_reason = f"Validation utilisateur: Rejeté. Motif: {validation.rejection_reason}"
@@ -1123,6 +1268,7 @@ def validate_ticket_resolution(
         reason=history_reason
     )
     db.add(history)
+    refresh_technician_metrics(db, [ticket.technician_id])
     db.commit()
     db.refresh(ticket)
     
@@ -1142,9 +1288,8 @@ def validate_ticket_resolution(
 def delegate_to_adjoint(
     ticket_id: int,
     delegate_data: schemas.TicketDelegate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_role("DSI")),
+    current_user: schemas.CurrentUser = Depends(require_role("DSI")),
 ):
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
     if not ticket:
@@ -1157,6 +1302,7 @@ def delegate_to_adjoint(
             status_code=status.HTTP_404_NOT_FOUND, detail="Adjoint DSI not found"
         )
     old_status = ticket.status
+    previous_technician_id = ticket.technician_id
     ticket.technician_id = None
     ticket.secretary_id = delegate_data.adjoint_id
     if ticket.status != models.TicketStatus.EN_ATTENTE_ANALYSE:
@@ -1180,12 +1326,13 @@ def delegate_to_adjoint(
         read=False
     )
     db.add(notification)
-    db.commit()
+    refresh_technician_metrics(db, [previous_technician_id])
     
-    # Envoyer un email à l'adjoint DSI en arrière-plan
+    # Mettre en file d'attente un email à l'adjoint DSI
     if adjoint.email and adjoint.email.strip():
-        background_tasks.add_task(
-            email_service.send_ticket_delegated_to_adjoint_notification,
+        enqueue_email(
+            db,
+            "send_ticket_delegated_to_adjoint_notification",
             ticket_id=str(ticket.id),
             ticket_number=ticket.number,
             ticket_title=ticket.title,
@@ -1194,6 +1341,7 @@ def delegate_to_adjoint(
             dsi_name=current_user.full_name,
             notes=delegate_data.notes
         )
+    db.commit()
     
     db.refresh(ticket)
     ticket = (
@@ -1212,7 +1360,7 @@ def delegate_to_adjoint(
 def accept_assignment(
     ticket_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     """Accepter une assignation de ticket"""
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -1263,7 +1411,7 @@ def accept_assignment(
 def reject_assignment(
     ticket_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
     reason: Optional[str] = Query(None),
 ):
     """Refuser une assignation de ticket (demande de réassignation)"""
@@ -1312,6 +1460,7 @@ def reject_assignment(
         )
         db.add(notification)
     
+    refresh_technician_metrics(db, [current_user.id])
     db.commit()
     db.refresh(ticket)
     
@@ -1332,7 +1481,7 @@ def submit_ticket_feedback(
     ticket_id: int,
     feedback: schemas.TicketFeedback,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     """Soumettre le feedback/satisfaction pour un ticket clôturé"""
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -1385,9 +1534,8 @@ def submit_ticket_feedback(
 @router.put("/{ticket_id}/reopen-by-user", response_model=schemas.TicketRead)
 def reopen_ticket_by_user(
     ticket_id: int,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     """Permet à l'utilisateur créateur de réouvrir un ticket clôturé automatiquement (dans les 7 jours)"""
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -1427,6 +1575,7 @@ def reopen_ticket_by_user(
         )
     
     old_status = ticket.status
+    previous_technician_id = ticket.technician_id
     
     # Réouvrir le ticket : remettre en attente d'analyse
     ticket.status = models.TicketStatus.EN_ATTENTE_ANALYSE
@@ -1456,44 +1605,30 @@ def reopen_ticket_by_user(
     db.add(creator_notification)
     
     # Notifier les secrétaires/adjoints/DSI
-    target_roles = db.query(models.Role).filter(
-        models.Role.name.in_(["Secrétaire DSI", "Adjoint DSI", "DSI", "Admin"])
-    ).all()
-    
-    for role in target_roles:
-        users = (
-            db.query(models.User)
-            .options(joinedload(models.User.role))
-            .filter(
-                models.User.role_id == role.id,
-                models.User.actif == True
-            )
-            .all()
-        )
-        for user in users:
-            notification = models.Notification(
-                user_id=user.id,
-                type=models.NotificationType.NOUVEAU_TICKET,
-                ticket_id=ticket.id,
-                message=f"Ticket #{ticket.number} réouvert par l'utilisateur: {ticket.title}",
-                read=False
-            )
-            db.add(notification)
+    notify_roles(
+        db,
+        AGENT_ROLES,
+        models.NotificationType.NOUVEAU_TICKET,
+        ticket.id,
+        f"Ticket #{ticket.number} réouvert par l'utilisateur: {ticket.title}",
+    )
     
-    db.commit()
-    db.refresh(ticket)
+    refresh_technician_metrics(db, [previous_technician_id])
     
-    # Envoyer un email au créateur
+    # Mettre en file d'attente un email au créateur
     creator = db.query(models.User).filter(models.User.id == ticket.creator_id).first()
     if creator and creator.email and creator.email.strip():
-        background_tasks.add_task(
-            email_service.send_ticket_reopened_notification,
+        enqueue_email(
+            db,
+            "send_ticket_reopened_notification",
             ticket_id=str(ticket.id),
             ticket_number=ticket.number,
             ticket_title=ticket.title,
             creator_email=creator.email,
             creator_name=creator.full_name
         )
+    db.commit()
+    db.refresh(ticket)
     
     # Charger les relations pour la réponse
     ticket = (
@@ -1513,9 +1648,8 @@ def reopen_ticket_by_user(
 def reopen_ticket(
     ticket_id: int,
     assign_data: schemas.TicketAssign,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(
+    current_user: schemas.CurrentUser = Depends(
         require_role("Secrétaire DSI", "Adjoint DSI", "DSI", "Admin")
     ),
 ):
@@ -1541,6 +1675,7 @@ def reopen_ticket(
         )
     
     old_status = ticket.status
+    previous_technician_id = ticket.technician_id
     
     # Réassigner et remettre en statut "assigné"
     ticket.technician_id = assign_data.technician_id
@@ -1570,19 +1705,21 @@ def reopen_ticket(
         )
         db.add(creator_notification)
     
-    db.commit()
-    db.refresh(ticket)
+    refresh_technician_metrics(db, [previous_technician_id, ticket.technician_id])
     
-    # Envoyer un email au créateur
+    # Mettre en file d'attente un email au créateur
     if creator and creator.email and creator.email.strip():
-        background_tasks.add_task(
-            email_service.send_ticket_reopened_notification,
+        enqueue_email(
+            db,
+            "send_ticket_reopened_notification",
             ticket_id=str(ticket.id),
             ticket_number=ticket.number,
             ticket_title=ticket.title,
             creator_email=creator.email,
             creator_name=creator.full_name
         )
+    db.commit()
+    db.refresh(ticket)
     
     # Charger les relations pour la réponse
     ticket = (
@@ -1601,7 +1738,7 @@ def reopen_ticket(
 def get_ticket_history(
     ticket_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
 ):
     """Récupérer l'historique d'un ticket"""
     ticket = db.query(models.Ticket).filter(models.Ticket.id == ticket_id).first()
@@ -1,15 +1,17 @@
-from typing import List
+from typing import List, Optional
 import secrets
 import string
-from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import and_, func
 from sqlalchemy.orm import Session
 
 from .. import models, schemas
 from ..database import get_db
-from ..security import get_current_user, require_role, get_password_hash
+from ..reference_data import reference_data
+from ..security import get_current_user, require_role, get_password_hash_offloaded, invalidate_cached_user
+from ..technician_metrics import get_technician_metrics
 
 router = APIRouter()
 
@@ -18,54 +20,57 @@ class TechnicianWithWorkload(schemas.UserRead):
     """Schéma étendu pour inclure la charge de travail"""
     assigned_tickets_count: int = 0
     in_progress_tickets_count: int = 0
+    available_capacity: Optional[int] = None  # Places restantes avant max_tickets_capacity (None si pas de limite)
 
     class Config:
         from_attributes = True
 
 
-@router.get("/technicians", response_model=List[schemas.UserRead])
+@router.get("/technicians", response_model=List[TechnicianWithWorkload], response_class=ORJSONResponse)
 def list_technicians(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(
+    current_user: schemas.CurrentUser = Depends(
         require_role("Secrétaire DSI", "Adjoint DSI", "DSI", "Admin")
     ),
 ):
     """Liste tous les techniciens avec leur charge de travail pour l'assignation de tickets"""
-    technician_role = db.query(models.Role).filter(models.Role.name == "Technicien").first()
-    if not technician_role:
+    # Une seule requête : techniciens actifs + rôle + compteurs conditionnels (COUNT ... FILTER)
+    # La jointure ne porte que sur les tickets actifs pour limiter les lignes agrégées
+    active_statuses = [
+        models.TicketStatus.ASSIGNE_TECHNICIEN,
+        models.TicketStatus.EN_COURS
+    ]
+    assigned_count = func.count(models.Ticket.id)
+    in_progress_count = func.count(models.Ticket.id).filter(
+        models.Ticket.status == models.TicketStatus.EN_COURS
+    )
+    # Rôle lu dans le cache des données de référence : plus de jointure sur roles
+    technician_role = reference_data.get(db).roles_by_name.get("Technicien")
+    if technician_role is None:
         return []
-    
-    technicians = (
-        db.query(models.User)
+    rows = (
+        db.query(models.User, assigned_count, in_progress_count)
+        .outerjoin(
+            models.Ticket,
+            and_(
+                models.Ticket.technician_id == models.User.id,
+                models.Ticket.status.in_(active_statuses)
+            )
+        )
         .filter(
             models.User.role_id == technician_role.id,
             models.User.actif == True
         )
+        .group_by(models.User.id)
+        .order_by(models.User.full_name.asc())
         .all()
     )
     
-    # Ajouter la charge de travail pour chaque technicien
     result = []
-    for tech in technicians:
-        assigned_count = (
-            db.query(models.Ticket)
-            .filter(
-                models.Ticket.technician_id == tech.id,
-                models.Ticket.status.in_([
-                    models.TicketStatus.ASSIGNE_TECHNICIEN,
-                    models.TicketStatus.EN_COURS
-                ])
-            )
-            .count()
-        )
-        in_progress_count = (
-            db.query(models.Ticket)
-            .filter(
-                models.Ticket.technician_id == tech.id,
-                models.Ticket.status == models.TicketStatus.EN_COURS
-            )
-            .count()
-        )
+    for tech, assigned, in_progress in rows:
+        available_capacity = None
+        if tech.max_tickets_capacity is not None:
+            available_capacity = max(tech.max_tickets_capacity - assigned, 0)
         
         tech_dict = {
             "id": tech.id,
@@ -73,15 +78,13 @@ def list_technicians(
             "email": tech.email,
             "agency": tech.agency,
             "phone": tech.phone,
-            "role": {
-                "id": tech.role.id,
-                "name": tech.role.name,
-                "description": tech.role.description,
-            },
+            "role": technician_role.model_dump(),
             "actif": tech.actif,
             "specialization": tech.specialization,
-            "assigned_tickets_count": assigned_count,
-            "in_progress_tickets_count": in_progress_count,
+            "max_tickets_capacity": tech.max_tickets_capacity,
+            "assigned_tickets_count": assigned,
+            "in_progress_tickets_count": in_progress,
+            "available_capacity": available_capacity,
         }
         result.append(tech_dict)
     
@@ -92,148 +95,31 @@ def list_technicians(
 def get_technician_stats(
     technician_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(
+    current_user: schemas.CurrentUser = Depends(
         require_role("Secrétaire DSI", "Adjoint DSI", "DSI", "Admin")
     ),
 ):
     """Récupère les statistiques détaillées d'un technicien"""
-    technician = db.query(models.User).filter(
-        models.User.id == technician_id,
-        models.User.role.has(models.Role.name == "Technicien")
-    ).first()
+    technician_role = reference_data.get(db).roles_by_name.get("Technicien")
+    technician = db.query(models.User).filter(models.User.id == technician_id).first()
     
-    if not technician:
+    if not technician or technician_role is None or technician.role_id != technician_role.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Technicien not found"
         )
     
-    # Tickets résolus
-    resolved_tickets = (
-        db.query(models.Ticket)
-        .filter(
-            models.Ticket.technician_id == technician_id,
-            models.Ticket.status == models.TicketStatus.RESOLU
-        )
-        .all()
-    )
-    
-    # Tickets clôturés
-    closed_tickets = (
-        db.query(models.Ticket)
-        .filter(
-            models.Ticket.technician_id == technician_id,
-            models.Ticket.status == models.TicketStatus.CLOTURE
-        )
-        .all()
-    )
-    
-    # Calculer le temps moyen de résolution (en jours)
-    # Formule : Temps moyen = (Somme des temps de résolution) / (Nombre de tickets résolus/clôturés)
-    # Temps de résolution = Date de clôture (ou résolution) - Date de création
-    total_resolution_time = 0
-    resolved_count = 0
-    for ticket in resolved_tickets + closed_tickets:
-        if ticket.created_at:
-            # Utiliser closed_at si disponible (ticket clôturé), sinon resolved_at (ticket résolu mais pas encore clôturé)
-            end_date = ticket.closed_at if ticket.closed_at else ticket.resolved_at
-            if end_date:
-                time_diff = (end_date - ticket.created_at).total_seconds() / 86400  # Convertir en jours
-                # Ne compter que si le résultat est valide (différence positive)
-                if time_diff >= 0:
-                    total_resolution_time += time_diff
-                    resolved_count += 1
-    
-    avg_resolution_time = round(total_resolution_time / resolved_count, 1) if resolved_count > 0 else 0
-    
-    # Taux de réussite (tickets clôturés / tickets assignés)
-    total_assigned = (
-        db.query(models.Ticket)
-        .filter(models.Ticket.technician_id == technician_id)
-        .count()
-    )
-    
-    success_rate = round((len(closed_tickets) / total_assigned * 100), 1) if total_assigned > 0 else 0
-    
-    # Tickets résolus ce mois
-    first_day_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    resolved_this_month = (
-        db.query(models.Ticket)
-        .filter(
-            models.Ticket.technician_id == technician_id,
-            models.Ticket.status.in_([models.TicketStatus.RESOLU, models.TicketStatus.CLOTURE]),
-            models.Ticket.resolved_at.isnot(None),
-            models.Ticket.resolved_at >= first_day_of_month
-        )
-        .count()
-    )
-    
-    # Compter les tickets en cours pour les statistiques
-    in_progress_count = (
-        db.query(models.Ticket)
-        .filter(
-            models.Ticket.technician_id == technician_id,
-            models.Ticket.status == models.TicketStatus.EN_COURS
-        )
-        .count()
-    )
+    # Métriques précalculées (une ligne), recalculées en SQL lors des transitions de statut
+    metrics = get_technician_metrics(db, technician_id)
     
     # Disponibilité basée uniquement sur actif (True/False)
     is_available = technician.actif
     
-    # Calculer le temps de réponse moyen (temps entre assignation et première action du technicien)
-    # Le temps de réponse = temps entre assigned_at et le moment où le ticket passe à "en_cours"
-    total_response_time = 0
-    response_count = 0
-    
-    for ticket in resolved_tickets + closed_tickets:
-        if ticket.assigned_at:
-            # Chercher dans l'historique le moment où le ticket est passé à "en_cours"
-            first_en_cours_history = (
-                db.query(models.TicketHistory)
-                .filter(
-                    models.TicketHistory.ticket_id == ticket.id,
-                    models.TicketHistory.new_status == models.TicketStatus.EN_COURS
-                )
-                .order_by(models.TicketHistory.changed_at.asc())
-                .first()
-            )
-            
-            if first_en_cours_history:
-                # Temps de réponse = temps entre assignation et première prise en charge
-                time_diff = (first_en_cours_history.changed_at - ticket.assigned_at).total_seconds() / 60  # Convertir en minutes
-                if time_diff >= 0:  # S'assurer que le temps est positif
-                    total_response_time += time_diff
-                    response_count += 1
-            # Si pas d'historique "en_cours" mais que le ticket est résolu/clôturé,
-            # on peut utiliser resolved_at comme approximation (mais moins précis)
-            elif ticket.resolved_at and ticket.assigned_at:
-                # Utiliser le temps jusqu'à la résolution comme approximation
-                time_diff = (ticket.resolved_at - ticket.assigned_at).total_seconds() / 60
-                if time_diff >= 0:
-                    total_response_time += time_diff
-                    response_count += 1
-    
-    avg_response_time_minutes = round(total_response_time / response_count, 0) if response_count > 0 else 0
-    
     # Calculer la charge de travail (basée sur les tickets en cours, max 5)
     max_workload = 5
-    current_workload = min(in_progress_count, max_workload)
+    current_workload = min(metrics.in_progress_tickets_count, max_workload)
     workload_ratio = f"{current_workload}/{max_workload}"
     
-    # Tickets résolus aujourd'hui
-    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    resolved_today = (
-        db.query(models.Ticket)
-        .filter(
-            models.Ticket.technician_id == technician_id,
-            models.Ticket.status.in_([models.TicketStatus.RESOLU, models.TicketStatus.CLOTURE]),
-            models.Ticket.resolved_at.isnot(None),
-            models.Ticket.resolved_at >= today_start
-        )
-        .count()
-    )
-    
     return {
         "id": str(technician.id),
         "full_name": technician.full_name,
@@ -243,15 +129,15 @@ def get_technician_stats(
         "specialization": technician.specialization,
         "actif": technician.actif,
         "last_login_at": technician.last_login_at.isoformat() if technician.last_login_at else None,
-        "assigned_tickets_count": total_assigned,
-        "in_progress_tickets_count": in_progress_count,
-        "resolved_tickets_count": len(resolved_tickets),
-        "closed_tickets_count": len(closed_tickets),
-        "resolved_this_month": resolved_this_month,
-        "resolved_today": resolved_today,
-        "avg_resolution_time_days": avg_resolution_time,
-        "avg_response_time_minutes": avg_response_time_minutes,
-        "success_rate": success_rate,
+        "assigned_tickets_count": metrics.assigned_tickets_count,
+        "in_progress_tickets_count": metrics.in_progress_tickets_count,
+        "resolved_tickets_count": metrics.resolved_tickets_count,
+        "closed_tickets_count": metrics.closed_tickets_count,
+        "resolved_this_month": metrics.resolved_this_month,
+        "resolved_today": metrics.resolved_today,
+        "avg_resolution_time_days": metrics.avg_resolution_time_days,
+        "avg_response_time_minutes": metrics.avg_response_time_minutes,
+        "success_rate": metrics.success_rate,
         # Disponibilité basée uniquement sur actif (True/False)
         "is_available": is_available,
         "workload_ratio": workload_ratio
@@ -262,7 +148,7 @@ def get_technician_stats(
 def create_user(
     user_in: schemas.UserCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_role("DSI", "Admin")),
+    current_user: schemas.CurrentUser = Depends(require_role("DSI", "Admin")),
 ):
     """Créer un nouvel utilisateur (Admin uniquement)"""
     # Vérifier si l'email ou le username existe déjà
@@ -281,7 +167,7 @@ def create_user(
         )
     
     # Vérifier que le rôle existe
-    role = db.query(models.Role).filter(models.Role.id == user_in.role_id).first()
+    role = reference_data.role_by_id(user_in.role_id, db)
     if not role:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -294,7 +180,7 @@ def create_user(
         agency=user_in.agency,
         phone=user_in.phone,
         username=user_in.username,
-        password_hash=get_password_hash(user_in.password),
+        password_hash=get_password_hash_offloaded(user_in.password),
         role_id=user_in.role_id,
         specialization=user_in.specialization,
         max_tickets_capacity=user_in.max_tickets_capacity,
@@ -311,10 +197,10 @@ def create_user(
     return db_user
 
 
-@router.get("/", response_model=List[schemas.UserRead])
+@router.get("/", response_model=List[schemas.UserRead], response_class=ORJSONResponse)
 def list_all_users(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_role("DSI", "Admin")),
+    current_user: schemas.CurrentUser = Depends(require_role("DSI", "Admin")),
 ):
     """Liste tous les utilisateurs (Admin uniquement)"""
     users = db.query(models.User).all()
@@ -344,7 +230,7 @@ def list_all_users(
 def get_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_role("DSI", "Admin")),
+    current_user: schemas.CurrentUser = Depends(require_role("DSI", "Admin")),
 ):
     """Récupérer un utilisateur par son ID"""
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -361,7 +247,7 @@ def update_user(
     user_id: int,
     user_update: schemas.UserUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_role("DSI", "Admin")),
+    current_user: schemas.CurrentUser = Depends(require_role("DSI", "Admin")),
 ):
     """Modifier un utilisateur"""
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -402,7 +288,7 @@ def update_user(
         user.notes = user_update.notes
     if user_update.role_id is not None:
         # Vérifier que le rôle existe
-        role = db.query(models.Role).filter(models.Role.id == user_update.role_id).first()
+        role = reference_data.role_by_id(user_update.role_id, db)
         if not role:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -411,6 +297,7 @@ def update_user(
         user.role_id = user_update.role_id
     
     db.commit()
+    invalidate_cached_user(user_id)
     db.refresh(user)
     
     # Charger le rôle pour la réponse
@@ -423,7 +310,7 @@ def update_user(
 def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_role("DSI", "Admin")),
+    current_user: schemas.CurrentUser = Depends(require_role("DSI", "Admin")),
 ):
     """Supprimer un utilisateur"""
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -448,10 +335,12 @@ def delete_user(
         # Au lieu de supprimer, désactiver l'utilisateur
         user.actif = False
         db.commit()
+        invalidate_cached_user(user_id)
         return {"message": "User deactivated (has associated tickets)", "user_id": user_id}
     
     db.delete(user)
     db.commit()
+    invalidate_cached_user(user_id)
     
     return {"message": "User deleted successfully", "user_id": user_id}
 
@@ -461,7 +350,7 @@ def reset_user_password(
     user_id: int,
     password_reset: schemas.PasswordReset,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_role("DSI", "Admin")),
+    current_user: schemas.CurrentUser = Depends(require_role("DSI", "Admin")),
 ):
     """Réinitialiser le mot de passe d'un utilisateur"""
     user = db.query(models.User).filter(models.User.id == user_id).first()
@@ -480,8 +369,9 @@ def reset_user_password(
         new_password = ''.join(secrets.choice(alphabet) for i in range(12))
     
     # Hasher et sauvegarder le nouveau mot de passe
-    user.password_hash = get_password_hash(new_password)
+    user.password_hash = get_password_hash_offloaded(new_password)
     db.commit()
+    invalidate_cached_user(user_id)
     
     return {
         "message": "Password reset successfully",
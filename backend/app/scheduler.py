@@ -1,239 +1,490 @@
 """
 Système de tâches planifiées pour les notifications et clôtures automatiques
+
+Les tâches ne s'exécutent qu'une fois quel que soit le nombre de processus :
+- dans l'API (SCHEDULER_ENABLED=true, par défaut), chaque worker uvicorn démarre un scheduler mais
+  seul le détenteur du verrou consultatif PostgreSQL SCHEDULER_LOCK_KEY (le « leader ») exécute
+  les tâches ; les autres les ignorent et prennent le relais si le leader s'arrête ;
+- ou dans un processus dédié : python -m app.scheduler (avec SCHEDULER_ENABLED=false pour l'API),
+  qui expose ses métriques sur SCHEDULER_METRICS_HOST:SCHEDULER_METRICS_PORT (mêmes règles d'accès
+  que GET /metrics).
 """
+import os
+import threading
+import time
 from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import insert, literal, select, union_all, update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Callable, List, Optional
+
+import psycopg2
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.base import BaseScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.cron import CronTrigger
 
-from .database import SessionLocal
+from .database import DATABASE_URL, SessionLocal
 from . import models
-from .email_service import email_service
+from .email_queue import enqueue_emails
+from .metrics import (
+    JOB_DURATION_BUCKETS, Counter, Gauge, Histogram, metrics_access_allowed, register, render_metrics,
+)
+from .notification_retention import manage_notification_partitions
+from .technician_metrics import refresh_stale_technician_metrics, refresh_technician_metrics
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Clé du verrou consultatif (pg_try_advisory_lock) partagée par tous les processus
+SCHEDULER_LOCK_KEY = int(os.getenv("SCHEDULER_LOCK_KEY", "7215001"))
+SCHEDULER_METRICS_PORT = int(os.getenv("SCHEDULER_METRICS_PORT", "9101"))
+# Interface d'écoute du serveur de métriques : locale par défaut (voir METRICS_TOKEN)
+SCHEDULER_METRICS_HOST = os.getenv("SCHEDULER_METRICS_HOST", "127.0.0.1")
+# Retard maximal (secondes) d'une exécution manquée encore rattrapée (une seule fois, coalesce)
+MISFIRE_GRACE_SECONDS = 15 * 60
+
+
+# Niveaux de rappel : (numéro, jours depuis la résolution, type de notification, message)
+VALIDATION_REMINDER_LEVELS = [
+    (1, 3, models.NotificationType.RAPPEL_VALIDATION_1,
+     "Rappel : Veuillez valider la résolution de votre ticket #{number}"),
+    (2, 7, models.NotificationType.RAPPEL_VALIDATION_2,
+     "Second rappel : Validation requise pour votre ticket #{number}"),
+    (3, 10, models.NotificationType.RAPPEL_VALIDATION_3,
+     "Dernier rappel : Veuillez valider votre ticket #{number}"),
+]
+REMINDER_BATCH_SIZE = 500
 
 
-def check_validation_reminders():
+def _pending_validation_reminders(db: Session, now: datetime):
     """
-    Vérifie les tickets résolus non validés et envoie des rappels
-    Rappels à 3, 7 et 10 jours après résolution
+    Une seule requête : pour chaque ticket résolu, le plus petit niveau de rappel
+    échu et pas encore envoyé au créateur (anti-jointure NOT EXISTS sur notifications).
+    Un seul rappel par ticket et par exécution, comme auparavant.
     """
-    db: Session = SessionLocal()
-    try:
-        # Récupérer tous les tickets résolus non clôturés
-        resolved_tickets = (
-            db.query(models.Ticket)
-            .filter(
+    per_level = []
+    for number, min_days, notification_type, _ in VALIDATION_REMINDER_LEVELS:
+        already_sent = (
+            select(models.Notification.id)
+            .where(
+                models.Notification.ticket_id == models.Ticket.id,
+                models.Notification.user_id == models.Ticket.creator_id,
+                models.Notification.type == notification_type,
+            )
+            .exists()
+        )
+        per_level.append(
+            select(
+                models.Ticket.id.label("ticket_id"),
+                models.Ticket.number.label("number"),
+                models.Ticket.title.label("title"),
+                models.Ticket.creator_id.label("creator_id"),
+                models.Ticket.resolved_at.label("resolved_at"),
+                literal(number).label("level"),
+            ).where(
                 models.Ticket.status == models.TicketStatus.RESOLU,
-                models.Ticket.resolved_at.isnot(None)
+                models.Ticket.resolved_at.isnot(None),
+                models.Ticket.resolved_at <= now - timedelta(days=min_days),
+                ~already_sent,
             )
-            .all()
         )
-        
+    pending = union_all(*per_level).subquery()
+    return db.execute(
+        select(pending)
+        .distinct(pending.c.ticket_id)
+        .order_by(pending.c.ticket_id, pending.c.level)
+    ).all()
+
+
+def check_validation_reminders() -> int:
+    """
+    Vérifie les tickets résolus non validés et envoie des rappels
+    Rappels à 3, 7 et 10 jours après résolution. Retourne le nombre de rappels envoyés.
+    """
+    db: Session = SessionLocal()
+    try:
         now = datetime.utcnow()
+        levels = {number: (notification_type, message) for number, _, notification_type, message in VALIDATION_REMINDER_LEVELS}
+        pending = _pending_validation_reminders(db, now)
+        sent_count = 0
         
-        for ticket in resolved_tickets:
-            if not ticket.resolved_at:
-                continue
-                
-            days_since_resolution = (now - ticket.resolved_at).days
+        for start in range(0, len(pending), REMINDER_BATCH_SIZE):
+            batch = pending[start:start + REMINDER_BATCH_SIZE]
             
-            # Vérifier si des rappels ont déjà été envoyés
-            existing_reminders = (
-                db.query(models.Notification)
-                .filter(
-                    models.Notification.ticket_id == ticket.id,
-                    models.Notification.user_id == ticket.creator_id,
-                    models.Notification.type.in_([
-                        models.NotificationType.RAPPEL_VALIDATION_1,
-                        models.NotificationType.RAPPEL_VALIDATION_2,
-                        models.NotificationType.RAPPEL_VALIDATION_3
-                    ])
-                )
+            # Récupérer tous les créateurs du lot en une requête
+            creator_ids = {row.creator_id for row in batch}
+            creators = {
+                user.id: user
+                for user in db.query(models.User.id, models.User.email, models.User.full_name)
+                .filter(models.User.id.in_(creator_ids))
                 .all()
-            )
-            
-            reminder_numbers_sent = set()
-            for reminder in existing_reminders:
-                if reminder.type == models.NotificationType.RAPPEL_VALIDATION_1:
-                    reminder_numbers_sent.add(1)
-                elif reminder.type == models.NotificationType.RAPPEL_VALIDATION_2:
-                    reminder_numbers_sent.add(2)
-                elif reminder.type == models.NotificationType.RAPPEL_VALIDATION_3:
-                    reminder_numbers_sent.add(3)
+            }
             
-            # Envoyer le premier rappel après 3 jours
-            if days_since_resolution >= 3 and 1 not in reminder_numbers_sent:
-                creator = db.query(models.User).filter(models.User.id == ticket.creator_id).first()
-                if creator and creator.email and creator.email.strip():
-                    # Créer la notification
-                    notification = models.Notification(
-                        user_id=ticket.creator_id,
-                        type=models.NotificationType.RAPPEL_VALIDATION_1,
-                        ticket_id=ticket.id,
-                        message=f"Rappel : Veuillez valider la résolution de votre ticket #{ticket.number}",
-                        read=False
-                    )
-                    db.add(notification)
-                    db.commit()
-                    
-                    # Envoyer l'email
-                    email_service.send_validation_reminder(
-                        ticket_id=str(ticket.id),
-                        ticket_number=ticket.number,
-                        ticket_title=ticket.title,
-                        creator_email=creator.email,
-                        creator_name=creator.full_name,
-                        reminder_number=1,
-                        days_since_resolution=days_since_resolution
-                    )
-            
-            # Envoyer le second rappel après 7 jours
-            elif days_since_resolution >= 7 and 2 not in reminder_numbers_sent:
-                creator = db.query(models.User).filter(models.User.id == ticket.creator_id).first()
-                if creator and creator.email and creator.email.strip():
-                    # Créer la notification
-                    notification = models.Notification(
-                        user_id=ticket.creator_id,
-                        type=models.NotificationType.RAPPEL_VALIDATION_2,
-                        ticket_id=ticket.id,
-                        message=f"Second rappel : Validation requise pour votre ticket #{ticket.number}",
-                        read=False
-                    )
-                    db.add(notification)
-                    db.commit()
-                    
-                    # Envoyer l'email
-                    email_service.send_validation_reminder(
-                        ticket_id=str(ticket.id),
-                        ticket_number=ticket.number,
-                        ticket_title=ticket.title,
-                        creator_email=creator.email,
-                        creator_name=creator.full_name,
-                        reminder_number=2,
-                        days_since_resolution=days_since_resolution
-                    )
+            notifications = []
+            emails = []
+            for row in batch:
+                creator = creators.get(row.creator_id)
+                if not (creator and creator.email and creator.email.strip()):
+                    continue
+                notification_type, message = levels[row.level]
+                notifications.append({
+                    "user_id": row.creator_id,
+                    "type": notification_type,
+                    "ticket_id": row.ticket_id,
+                    "message": message.format(number=row.number),
+                    "read": False,
+                })
+                emails.append({
+                    "ticket_id": str(row.ticket_id),
+                    "ticket_number": row.number,
+                    "ticket_title": row.title,
+                    "creator_email": creator.email,
+                    "creator_name": creator.full_name,
+                    "reminder_number": row.level,
+                    "days_since_resolution": (now - row.resolved_at).days,
+                })
             
-            # Envoyer le troisième rappel après 10 jours
-            elif days_since_resolution >= 10 and 3 not in reminder_numbers_sent:
-                creator = db.query(models.User).filter(models.User.id == ticket.creator_id).first()
-                if creator and creator.email and creator.email.strip():
-                    # Créer la notification
-                    notification = models.Notification(
-                        user_id=ticket.creator_id,
-                        type=models.NotificationType.RAPPEL_VALIDATION_3,
-                        ticket_id=ticket.id,
-                        message=f"Dernier rappel : Veuillez valider votre ticket #{ticket.number}",
-                        read=False
-                    )
-                    db.add(notification)
-                    db.commit()
-                    
-                    # Envoyer l'email
-                    email_service.send_validation_reminder(
-                        ticket_id=str(ticket.id),
-                        ticket_number=ticket.number,
-                        ticket_title=ticket.title,
-                        creator_email=creator.email,
-                        creator_name=creator.full_name,
-                        reminder_number=3,
-                        days_since_resolution=days_since_resolution
-                    )
+            if notifications:
+                db.execute(insert(models.Notification), notifications)
+            # Les emails sont mis en file dans la même transaction que les notifications
+            enqueue_emails(db, "send_validation_reminder", emails)
+            db.commit()
+            sent_count += len(notifications)
+        
+        print(f"Rappels de validation: {sent_count} rappel(s) envoyé(s)")
+        return sent_count
     
     except Exception as e:
         print(f"Erreur lors de la vérification des rappels de validation: {str(e)}")
         db.rollback()
+        raise  # Comptée en échec par ScheduledJob
     finally:
         db.close()
 
 
-def auto_close_unvalidated_tickets():
+AUTO_CLOSE_DELAY_DAYS = 14
+AUTO_CLOSE_CHUNK_SIZE = 200
+
+
+def _auto_close_chunk(db: Session, now: datetime, cutoff_date: datetime):
     """
-    Clôture automatiquement les tickets résolus non validés après 14 jours
+    Clôture un lot de tickets en une instruction :
+    UPDATE ... FROM (SELECT ... LIMIT n FOR UPDATE SKIP LOCKED) ... RETURNING.
+    Les lignes déjà verrouillées par une autre exécution sont ignorées, et un ticket
+    déjà clôturé ne correspond plus au filtre : relancer le job est sans effet de bord.
+    """
+    due = (
+        select(models.Ticket.id)
+        .where(
+            models.Ticket.status == models.TicketStatus.RESOLU,
+            models.Ticket.resolved_at.isnot(None),
+            models.Ticket.resolved_at <= cutoff_date,
+            models.Ticket.closed_at.is_(None)  # Pas encore clôturé
+        )
+        .order_by(models.Ticket.id)
+        .limit(AUTO_CLOSE_CHUNK_SIZE)
+        .with_for_update(skip_locked=True)
+        .cte("due")
+    )
+    statement = (
+        update(models.Ticket)
+        .where(models.Ticket.id == due.c.id)
+        .values(
+            status=models.TicketStatus.CLOTURE,
+            closed_at=now,
+            auto_closed_at=now,  # Marquer comme clôture automatique
+        )
+        .returning(
+            models.Ticket.id,
+            models.Ticket.number,
+            models.Ticket.title,
+            models.Ticket.creator_id,
+            models.Ticket.technician_id,
+        )
+    )
+    return db.execute(statement, execution_options={"synchronize_session": False}).all()
+
+
+def auto_close_unvalidated_tickets() -> int:
+    """
+    Clôture automatiquement les tickets résolus non validés après 14 jours.
+    Traitement par lots : chaque lot est clôturé, historisé et notifié puis commité ;
+    les emails sont mis dans email_outbox dans la même transaction et envoyés par le worker.
+    Retourne le nombre de tickets clôturés (lots commités).
     """
     db: Session = SessionLocal()
+    started = time.monotonic()
+    closed_count = 0
+    chunk_count = 0
     try:
-        # Récupérer tous les tickets résolus non clôturés depuis plus de 14 jours
         now = datetime.utcnow()
-        cutoff_date = now - timedelta(days=14)
+        cutoff_date = now - timedelta(days=AUTO_CLOSE_DELAY_DAYS)
         
-        unvalidated_tickets = (
-            db.query(models.Ticket)
-            .filter(
-                models.Ticket.status == models.TicketStatus.RESOLU,
-                models.Ticket.resolved_at.isnot(None),
-                models.Ticket.resolved_at <= cutoff_date,
-                models.Ticket.closed_at.is_(None)  # Pas encore clôturé
-            )
-            .all()
-        )
-        
-        for ticket in unvalidated_tickets:
-            # Clôturer le ticket automatiquement
-            ticket.status = models.TicketStatus.CLOTURE
-            ticket.closed_at = now
-            ticket.auto_closed_at = now  # Marquer comme clôture automatique
+        while True:
+            closed = _auto_close_chunk(db, now, cutoff_date)
+            if not closed:
+                break
             
-            # Créer une entrée d'historique
-            history = models.TicketHistory(
-                ticket_id=ticket.id,
-                old_status=models.TicketStatus.RESOLU,
-                new_status=models.TicketStatus.CLOTURE,
-                user_id=ticket.creator_id,  # Utiliser le créateur comme user_id pour l'historique
-                reason="Clôture automatique après 14 jours sans validation"
-            )
-            db.add(history)
-            
-            # Créer une notification pour le créateur
-            notification = models.Notification(
-                user_id=ticket.creator_id,
-                type=models.NotificationType.CLOTURE_AUTOMATIQUE,
-                ticket_id=ticket.id,
-                message=f"Votre ticket #{ticket.number} a été clôturé automatiquement après 14 jours sans validation. Vous pouvez le réouvrir dans les 7 prochains jours si nécessaire.",
-                read=False
-            )
-            db.add(notification)
+            history_rows = []
+            notification_rows = []
+            for ticket in closed:
+                history_rows.append({
+                    "ticket_id": ticket.id,
+                    "old_status": models.TicketStatus.RESOLU,
+                    "new_status": models.TicketStatus.CLOTURE,
+                    "user_id": ticket.creator_id,  # Utiliser le créateur comme user_id pour l'historique
+                    "reason": "Clôture automatique après 14 jours sans validation",
+                })
+                notification_rows.append({
+                    "user_id": ticket.creator_id,
+                    "type": models.NotificationType.CLOTURE_AUTOMATIQUE,
+                    "ticket_id": ticket.id,
+                    "message": f"Votre ticket #{ticket.number} a été clôturé automatiquement après 14 jours sans validation. Vous pouvez le réouvrir dans les 7 prochains jours si nécessaire.",
+                    "read": False,
+                })
+                # Notifier le technicien si assigné
+                if ticket.technician_id:
+                    notification_rows.append({
+                        "user_id": ticket.technician_id,
+                        "type": models.NotificationType.TICKET_CLOTURE,
+                        "ticket_id": ticket.id,
+                        "message": f"Le ticket #{ticket.number} a été clôturé automatiquement après 14 jours sans validation: {ticket.title}",
+                        "read": False,
+                    })
+            db.execute(insert(models.TicketHistory), history_rows)
+            db.execute(insert(models.Notification), notification_rows)
+            refresh_technician_metrics(db, [ticket.technician_id for ticket in closed])
             
-            # Récupérer le créateur pour l'email
-            creator = db.query(models.User).filter(models.User.id == ticket.creator_id).first()
-            if creator and creator.email and creator.email.strip():
-                # Envoyer l'email
-                email_service.send_ticket_auto_closed_notification(
-                    ticket_id=str(ticket.id),
-                    ticket_number=ticket.number,
-                    ticket_title=ticket.title,
-                    creator_email=creator.email,
-                    creator_name=creator.full_name
-                )
+            # Récupérer les créateurs du lot en une requête pour les emails
+            creators = {
+                user.id: user
+                for user in db.query(models.User.id, models.User.email, models.User.full_name)
+                .filter(models.User.id.in_({ticket.creator_id for ticket in closed}))
+                .all()
+            }
+            emails = []
+            for ticket in closed:
+                creator = creators.get(ticket.creator_id)
+                if creator and creator.email and creator.email.strip():
+                    emails.append({
+                        "ticket_id": str(ticket.id),
+                        "ticket_number": ticket.number,
+                        "ticket_title": ticket.title,
+                        "creator_email": creator.email,
+                        "creator_name": creator.full_name,
+                    })
+            enqueue_emails(db, "send_ticket_auto_closed_notification", emails)
+            db.commit()
             
-            # Notifier le technicien si assigné
-            if ticket.technician_id:
-                tech_notification = models.Notification(
-                    user_id=ticket.technician_id,
-                    type=models.NotificationType.TICKET_CLOTURE,
-                    ticket_id=ticket.id,
-                    message=f"Le ticket #{ticket.number} a été clôturé automatiquement après 14 jours sans validation: {ticket.title}",
-                    read=False
-                )
-                db.add(tech_notification)
-        
-        db.commit()
-        print(f"Clôture automatique: {len(unvalidated_tickets)} tickets clôturés")
+            closed_count += len(closed)
+            chunk_count += 1
+            if len(closed) < AUTO_CLOSE_CHUNK_SIZE:
+                break
     
     except Exception as e:
+        # Les lots déjà commités restent clôturés ; l'exécution est comptée en échec par ScheduledJob
         print(f"Erreur lors de la clôture automatique: {str(e)}")
         db.rollback()
+        raise
     finally:
         db.close()
+        duration = time.monotonic() - started
+        print(
+            f"Clôture automatique: {closed_count} tickets clôturés "
+            f"en {chunk_count} lot(s), durée {duration:.2f}s"
+        )
+    return closed_count
 
 
-def run_scheduled_tasks():
+def run_scheduled_tasks() -> int:
     """
     Fonction principale pour exécuter toutes les tâches planifiées
     À appeler périodiquement (ex: toutes les heures via cron ou APScheduler)
+    Retourne le nombre de rappels envoyés et de tickets clôturés.
+    Une tâche en erreur n'empêche pas l'autre de s'exécuter ; la première erreur est ensuite relancée.
     """
     print(f"[{datetime.utcnow()}] Exécution des tâches planifiées...")
-    check_validation_reminders()
-    auto_close_unvalidated_tickets()
+    processed = 0
+    errors = []
+    for task in (check_validation_reminders, auto_close_unvalidated_tickets):
+        try:
+            processed += task()
+        except Exception as e:
+            errors.append(e)
     print(f"[{datetime.utcnow()}] Tâches planifiées terminées")
+    if errors:
+        raise errors[0]
+    return processed
+
+
+class SchedulerLeader:
+    """
+    Élection du leader par verrou consultatif de session, tenu sur une connexion dédiée (hors pool)
+    pendant toute la vie du processus. Si le processus ou la connexion disparaît, PostgreSQL libère
+    le verrou et un autre processus l'obtient à sa prochaine tâche.
+    """
+
+    def __init__(self, lock_key: int = SCHEDULER_LOCK_KEY):
+        self.lock_key = lock_key
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def is_leader(self) -> bool:
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    # Vérifie que la connexion (donc le verrou) est toujours vivante
+                    with self._connection.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    return True
+                except psycopg2.Error as e:
+                    print(f"[SCHEDULER] Connexion du verrou perdue, nouvelle élection: {e}")
+                    self._close()
+            return self._try_acquire()
+
+    def _try_acquire(self) -> bool:
+        try:
+            connection = psycopg2.connect(DATABASE_URL, connect_timeout=5)
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_key,))
+                acquired = cursor.fetchone()[0]
+        except psycopg2.Error as e:
+            print(f"[SCHEDULER] Élection impossible: {e}")
+            return False
+        if not acquired:
+            connection.close()
+            return False
+        self._connection = connection
+        print(f"[SCHEDULER] Processus {os.getpid()} élu pour exécuter les tâches planifiées")
+        return True
+
+    @property
+    def leading(self) -> bool:
+        return self._connection is not None
+
+    def release(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except psycopg2.Error:
+                pass
+            self._connection = None
 
 
+scheduler_leader = SchedulerLeader()
+register(Gauge(
+    "scheduler_is_leader",
+    "1 si ce processus détient le verrou des tâches planifiées",
+    lambda: 1 if scheduler_leader.leading else 0,
+))
 
 
+class ScheduledJob:
+    """Tâche exécutée par le seul leader, avec durée et nombre d'éléments traités en métriques"""
+
+    def __init__(self, job_id: str, func: Callable[[], int], items: str):
+        self.job_id = job_id
+        self.func = func
+        self.duration = register(Histogram(
+            f"scheduler_{job_id}_duration_seconds",
+            f"Durée d'exécution de la tâche {job_id}",
+            JOB_DURATION_BUCKETS,
+        ))
+        self.items = register(Counter(f"scheduler_{job_id}_items_total", f"{items} par la tâche {job_id}"))
+        self.runs = register(Counter(f"scheduler_{job_id}_runs_total", f"Exécutions de la tâche {job_id}"))
+        self.skipped = register(Counter(
+            f"scheduler_{job_id}_skipped_total",
+            f"Déclenchements de {job_id} ignorés (processus non leader)",
+        ))
+        self.failures = register(Counter(f"scheduler_{job_id}_failures_total", f"Exécutions de {job_id} en erreur"))
+
+    def __call__(self) -> None:
+        if not scheduler_leader.is_leader():
+            self.skipped.inc()
+            return
+        started = time.perf_counter()
+        try:
+            self.items.inc(self.func() or 0)
+        except Exception as e:
+            self.failures.inc()
+            print(f"[SCHEDULER] Erreur de la tâche {self.job_id}: {e}")
+        finally:
+            self.runs.inc()
+            self.duration.observe(time.perf_counter() - started)
+
+
+SCHEDULED_JOBS = [
+    (
+        ScheduledJob("run_scheduled_tasks", run_scheduled_tasks, "Rappels envoyés et tickets clôturés"),
+        CronTrigger(minute=0),  # Toutes les heures à la minute 0
+        'Exécuter les tâches planifiées (rappels et clôtures)',
+    ),
+    (
+        # Chaque nuit : partitions mensuelles à venir et rétention des notifications lues
+        ScheduledJob("manage_notification_partitions", manage_notification_partitions, "Partitions supprimées"),
+        CronTrigger(hour=3, minute=15),
+        'Partitions et rétention des notifications',
+    ),
+    (
+        # Changement de jour : resolved_today et resolved_this_month des métriques des techniciens
+        ScheduledJob("refresh_technician_metrics", refresh_stale_technician_metrics, "Techniciens recalculés"),
+        CronTrigger(hour=0, minute=5, timezone="UTC"),  # computed_at est en UTC
+        'Métriques des techniciens (changement de jour)',
+    ),
+]
+
+
+def create_scheduler(scheduler_class=BackgroundScheduler) -> BaseScheduler:
+    """
+    Scheduler avec les tâches de SCHEDULED_JOBS : une seule exécution à la fois par tâche
+    (max_instances=1) et les déclenchements manqués regroupés en un seul (coalesce)
+    """
+    scheduler = scheduler_class(job_defaults={
+        "max_instances": 1,
+        "coalesce": True,
+        "misfire_grace_time": MISFIRE_GRACE_SECONDS,
+    })
+    for job, trigger, name in SCHEDULED_JOBS:
+        scheduler.add_job(job, trigger=trigger, id=job.job_id, name=name, replace_existing=True)
+    return scheduler
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if not metrics_access_allowed(self.headers.get("Authorization"), self.client_address[0]):
+            self.send_error(403, "Permission denied")
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_scheduler(metrics_port: Optional[int] = SCHEDULER_METRICS_PORT) -> None:
+    """Processus dédié : python -m app.scheduler (plusieurs instances possibles, une seule leader)"""
+    if metrics_port:
+        server = ThreadingHTTPServer((SCHEDULER_METRICS_HOST, metrics_port), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="scheduler-metrics", daemon=True).start()
+        print(f"[SCHEDULER] Métriques sur http://{SCHEDULER_METRICS_HOST}:{metrics_port}/metrics")
+    scheduler_leader.is_leader()
+    print("[SCHEDULER] Démarrage")
+    try:
+        create_scheduler(BlockingScheduler).start()
+    finally:
+        scheduler_leader.release()
+
+
+if __name__ == "__main__":
+    try:
+        run_scheduler()
+    except KeyboardInterrupt:
+        print("[SCHEDULER] Arrêt")
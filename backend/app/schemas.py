@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from .models import TicketPriority, TicketStatus, TicketType, CommentType, NotificationType, TicketTypeModel, TicketCategory
 
@@ -55,6 +55,16 @@ class UserRead(UserBase):
         from_attributes = True
 
 
+class CurrentUser(UserRead):
+    """
+    Instantané immuable de l'utilisateur authentifié, partagé entre requêtes par le cache
+    d'authentification (voir security.py) : aucune instance ORM n'est conservée entre requêtes
+    """
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    role: Optional[RoleRead] = None
+
+
 class PasswordReset(BaseModel):
     new_password: Optional[str] = None  # Si None, génère un mot de passe aléatoire
 
@@ -117,6 +127,62 @@ class TicketRead(TicketBase):
         from_attributes = True
 
 
+class TicketPage(BaseModel):
+    """Page de tickets paginée par curseur (created_at, id)"""
+    items: List[TicketRead]
+    next_cursor: Optional[str] = None  # None lorsqu'il n'y a plus de page suivante
+
+
+class TicketListItem(BaseModel):
+    """
+    Ticket dans une liste (view=compact) : colonnes affichées et noms du créateur et du
+    technicien, sans description, pièces jointes ni utilisateurs imbriqués
+    """
+    id: int
+    number: int
+    title: str
+    type: TicketType
+    priority: TicketPriority
+    status: TicketStatus
+    category: Optional[str] = None
+    created_at: datetime
+    assigned_at: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
+    closed_at: Optional[datetime] = None
+    creator_id: int
+    creator_name: Optional[str] = None
+    technician_id: Optional[int] = None
+    technician_name: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class TicketListPage(BaseModel):
+    """Page de tickets en vue compacte, paginée par curseur (created_at, id)"""
+    items: List[TicketListItem]
+    next_cursor: Optional[str] = None
+
+
+class TicketSearchHit(BaseModel):
+    """Résultat de recherche classé, avec extraits surlignés (<mark>...</mark>)"""
+    ticket: TicketRead
+    rank: float
+    title_highlight: Optional[str] = None
+    description_highlight: Optional[str] = None
+
+
+class TicketStats(BaseModel):
+    """Statistiques agrégées des tickets, calculées côté base de données"""
+    total: int
+    by_status: Dict[str, int]
+    by_priority: Dict[str, int]
+    by_type: Dict[str, int]
+    by_category: Dict[str, int]
+    by_agency: Dict[str, int]
+    by_month: Dict[str, int]  # Clé "AAAA-MM"
+
+
 class TicketTypeConfig(BaseModel):
     id: int
     code: str
@@ -0,0 +1,115 @@
+"""
+Recherche de tickets : index plein texte (tsvector, configuration française)
+et index trigrammes sur le titre, à la place des ILIKE '%...%' sur la description
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Query, Session, joinedload
+
+from . import models
+
+SEARCH_CONFIG = "french"
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def parse_ticket_number(search: str) -> Optional[int]:
+    """Renvoie le numéro de ticket si la recherche est un nombre pur"""
+    try:
+        return int(search.strip())
+    except (ValueError, AttributeError):
+        return None
+
+
+def build_tsquery(search: str):
+    """
+    Construit une tsquery préfixée ("impri:* & bureau:*") pour que la recherche
+    fonctionne pendant la saisie. Renvoie None si aucun mot exploitable.
+    """
+    words = _WORD_RE.findall(search.lower())
+    if not words:
+        return None
+    return func.to_tsquery(SEARCH_CONFIG, " & ".join(f"{word}:*" for word in words))
+
+
+def ticket_search_filter(search: str):
+    """
+    Condition de recherche sur les tickets :
+    - nombre pur : recherche exacte sur le numéro de ticket (pas l'ID interne)
+    - sinon : correspondance plein texte sur titre + description (index GIN)
+      ou correspondance partielle sur le titre (index trigrammes)
+    """
+    search_number = parse_ticket_number(search)
+    if search_number is not None:
+        return models.Ticket.number == search_number
+
+    conditions = [models.Ticket.title.ilike(f"%{search.strip()}%")]
+    tsquery = build_tsquery(search)
+    if tsquery is not None:
+        conditions.append(models.Ticket.search_vector.op("@@")(tsquery))
+    return or_(*conditions)
+
+
+def ranked_ticket_search(db: Session, search: str, limit: int, scope_filter=None):
+    """
+    Recherche classée par pertinence (ts_rank_cd) avec extraits surlignés (HTML échappé, balises <mark>).
+    Les extraits (ts_headline, coûteux) ne sont calculés que pour les `limit` meilleurs résultats.
+    Renvoie une liste de tuples (ticket, rank, title_highlight, description_highlight).
+    """
+    tsquery = build_tsquery(search)
+    if parse_ticket_number(search) is not None or tsquery is None:
+        # Recherche par numéro : pas de classement ni de surlignage
+        query = _with_relations(db.query(models.Ticket)).filter(ticket_search_filter(search))
+        if scope_filter is not None:
+            query = query.filter(scope_filter)
+        tickets = query.order_by(models.Ticket.created_at.desc()).limit(limit).all()
+        return [(ticket, 1.0, None, None) for ticket in tickets]
+
+    rank = func.ts_rank_cd(models.Ticket.search_vector, tsquery)
+    top_query = db.query(models.Ticket.id.label("id"), rank.label("rank")).filter(
+        ticket_search_filter(search)
+    )
+    if scope_filter is not None:
+        top_query = top_query.filter(scope_filter)
+    top = (
+        top_query.order_by(rank.desc(), models.Ticket.created_at.desc())
+        .limit(limit)
+        .subquery()
+    )
+
+    rows = (
+        _with_relations(
+            db.query(
+                models.Ticket,
+                top.c.rank,
+                func.ts_headline(SEARCH_CONFIG, _html_escape(models.Ticket.title), tsquery, HEADLINE_OPTIONS),
+                func.ts_headline(SEARCH_CONFIG, _html_escape(models.Ticket.description), tsquery, HEADLINE_OPTIONS),
+            )
+        )
+        .join(top, top.c.id == models.Ticket.id)
+        .order_by(top.c.rank.desc(), models.Ticket.created_at.desc())
+        .all()
+    )
+    return [(ticket, float(rank_value or 0), title_hl, description_hl) for ticket, rank_value, title_hl, description_hl in rows]
+
+
+def _html_escape(column):
+    """
+    Échappe le texte en SQL avant ts_headline : les extraits ne contiennent alors pas d'autre
+    balise que <mark>, même si le titre ou la description contient du HTML (XSS stocké)
+    """
+    escaped = func.replace(column, "&", "&amp;")
+    for character, entity in (("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&apos;")):
+        escaped = func.replace(escaped, character, entity)
+    return escaped
+
+
+def _with_relations(query: Query) -> Query:
+    """Créateur, technicien et leur rôle (sérialisés par TicketRead) chargés dans la même requête"""
+    return query.options(
+        joinedload(models.Ticket.creator).joinedload(models.User.role),
+        joinedload(models.Ticket.technician).joinedload(models.User.role),
+    )
@@ -5,11 +5,22 @@ import os
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-import bcrypt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 
 from . import models, schemas
-from .database import get_db
+from .cache import TTLCache
+from .database import get_async_db, get_db
+from .reference_data import reference_data
+from .password_hashing import (
+    check_password,
+    check_password_async,
+    hash_password,
+    hash_password_async,
+    hash_password_in_pool,
+    needs_rehash,
+)
 
 SECRET_KEY = os.getenv("SECRET_KEY", "CHANGE_ME_SECRET_KEY_VERY_IMPORTANT_TO_CHANGE")
 ALGORITHM = "HS256"
@@ -17,30 +28,52 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
+# Instantanés des utilisateurs authentifiés (schemas.CurrentUser, avec leur rôle) mis en cache
+# par id (sub du jeton) : évite deux requêtes SQL par appel API pour les tableaux de bord qui
+# interrogent en boucle. Chaque processus a son cache ; une modification faite par un autre
+# processus est visible au plus tard après AUTH_CACHE_TTL_SECONDS. Le cache est vidé dès qu'un
+# rôle est modifié (notification de reference_data).
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+_user_cache = TTLCache(maxsize=4096, ttl=AUTH_CACHE_TTL_SECONDS)
+reference_data.on_roles_changed(_user_cache.clear)
+
+
+def _is_bcrypt_hash(hashed_password) -> bool:
+    # S'assurer que le hash est bien une chaîne au format bcrypt ($2b$...)
+    return bool(hashed_password) and isinstance(hashed_password, str) and hashed_password.startswith('$2')
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Vérifie un mot de passe avec bcrypt"""
+    """Vérifie un mot de passe avec bcrypt (dans le processus appelant : scripts d'administration)"""
     try:
-        # S'assurer que le hash est bien une chaîne
-        if not hashed_password or not isinstance(hashed_password, str):
+        if not _is_bcrypt_hash(hashed_password):
             return False
-        
-        # Vérifier que le hash commence par $2b$ (format bcrypt)
-        if not hashed_password.startswith('$2'):
-            return False
-        
-        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+        return check_password(plain_password, hashed_password)
     except Exception as e:
         # Logger l'erreur pour le débogage (en production, utiliser un vrai logger)
         print(f"Erreur lors de la vérification du mot de passe: {e}")
         return False
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Vérifie un mot de passe avec bcrypt dans le pool de processus dédié"""
+    try:
+        if not _is_bcrypt_hash(hashed_password):
+            return False
+        return await check_password_async(plain_password, hashed_password)
+    except Exception as e:
+        print(f"Erreur lors de la vérification du mot de passe: {e}")
+        return False
+
+
 def get_password_hash(password: str) -> str:
-    """Hash un mot de passe avec bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    """Hash un mot de passe avec bcrypt (coût BCRYPT_ROUNDS, dans le processus appelant)"""
+    return hash_password(password)
+
+
+def get_password_hash_offloaded(password: str) -> str:
+    """Hash un mot de passe dans le pool de processus dédié (endpoints synchrones)"""
+    return hash_password_in_pool(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -53,12 +86,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def get_user_by_username(db: Session, username: str) -> Optional[models.User]:
-    return db.query(models.User).filter(models.User.username == username).first()
-
-
-def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
-    user = get_user_by_username(db, username)
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[models.User]:
+    """
+    Authentifie un utilisateur (rôle chargé dans la même requête).
+    La vérification bcrypt se fait dans le pool de processus ; si le hachage stocké n'utilise
+    pas le coût configuré (BCRYPT_ROUNDS), il est recalculé avec le mot de passe fourni.
+    """
+    result = await db.execute(
+        select(models.User)
+        .options(joinedload(models.User.role))
+        .filter(models.User.username == username)
+    )
+    user = result.scalars().first()
     if not user:
         return None
     
@@ -67,15 +106,19 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[mod
         return None
     
     # Vérifier le mot de passe
-    if not verify_password(password, user.password_hash):
+    if not await verify_password_async(password, user.password_hash):
         return None
     
+    if needs_rehash(user.password_hash):
+        user.password_hash = await hash_password_async(password)
+        await db.commit()
+        invalidate_cached_user(user.id)
+    
     return user
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> models.User:
+def _token_user_id(token: str) -> int:
+    """Extrait l'id utilisateur (sub) du JWT ; lève 401 si le jeton est invalide"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -89,22 +132,79 @@ async def get_current_user(
         token_data = schemas.TokenData(user_id=int(user_id))
     except (JWTError, ValueError):
         raise credentials_exception
+    return token_data.user_id
 
-    user = db.get(models.User, token_data.user_id)
+
+def _check_user(user: Optional[models.User]) -> models.User:
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+
+def _check_role(current_user: schemas.CurrentUser, allowed_roles) -> schemas.CurrentUser:
+    if current_user.role is None or current_user.role.name not in allowed_roles:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Permission denied",
+        )
+    return current_user
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    """À appeler quand un utilisateur est modifié, désactivé, supprimé ou change de mot de passe"""
+    _user_cache.pop(user_id)
+
+
+def _cache_user(user: Optional[models.User]) -> schemas.CurrentUser:
+    """
+    Copie l'utilisateur (et son rôle) dans un instantané immuable puis le met en cache :
+    l'instance ORM reste dans la session de la requête.
+    """
+    snapshot = schemas.CurrentUser.model_validate(_check_user(user))
+    _user_cache.set(snapshot.id, snapshot)
+    return snapshot
+
+
+# Dépendance synchrone (exécutée dans le threadpool, comme la session get_db qu'elle utilise)
+def get_current_user(
+    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
+) -> schemas.CurrentUser:
+    user_id = _token_user_id(token)
+    user = _user_cache.get(user_id)
+    if user is None:
+        # Rôle chargé dans la même requête : require_role n'a plus besoin d'un second aller-retour
+        user = _cache_user(db.get(models.User, user_id, options=[joinedload(models.User.role)]))
     return user
 
 
 def require_role(*allowed_roles: str):
-    def dependency(current_user: models.User = Depends(get_current_user)) -> models.User:
-        if current_user.role is None or current_user.role.name not in allowed_roles:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Permission denied",
-            )
-        return current_user
+    def dependency(current_user: schemas.CurrentUser = Depends(get_current_user)) -> schemas.CurrentUser:
+        return _check_role(current_user, allowed_roles)
 
     return dependency
 
 
+async def load_current_user_async(db: AsyncSession, user_id: int) -> schemas.CurrentUser:
+    """Utilisateur authentifié par son id (cache, sinon une requête avec son rôle) ; 401 s'il n'existe plus"""
+    user = _user_cache.get(user_id)
+    if user is None:
+        user = _cache_user(await db.get(models.User, user_id, options=[joinedload(models.User.role)]))
+    return user
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+) -> schemas.CurrentUser:
+    """Équivalent de get_current_user pour les endpoints async def (rôle chargé dans la même requête)"""
+    return await load_current_user_async(db, _token_user_id(token))
+
+
+def require_role_async(*allowed_roles: str):
+    async def dependency(current_user: schemas.CurrentUser = Depends(get_current_user_async)) -> schemas.CurrentUser:
+        return _check_role(current_user, allowed_roles)
+
+    return dependency
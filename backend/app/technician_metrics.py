@@ -0,0 +1,170 @@
+"""
+Métriques par technicien calculées en SQL (ensemble) et matérialisées dans technician_metrics.
+
+- refresh_technician_metrics : recalcul dans la transaction de chaque transition de statut,
+  sous verrou consultatif par technicien (deux transitions concurrentes ne peuvent pas
+  enregistrer un état plus ancien que celui déjà validé) ;
+- refresh_stale_technician_metrics : tâche planifiée de changement de jour (resolved_today,
+  resolved_this_month), pour que la lecture n'écrive jamais.
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import extract, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+
+# Espace de clés des verrous consultatifs à deux clés (classe, technician_id), distinct de la clé
+# du verrou du scheduler
+TECHNICIAN_METRICS_LOCK_CLASS = 5001
+
+FINISHED_STATUSES = [models.TicketStatus.RESOLU, models.TicketStatus.CLOTURE]
+
+
+def _epoch(interval):
+    return extract("epoch", interval)
+
+
+def compute_technician_metrics(db: Session, technician_id: int, now: Optional[datetime] = None) -> dict:
+    """
+    Calcule toutes les métriques d'un technicien en une seule requête :
+    - première transition vers EN_COURS par ticket via DISTINCT ON (plus de requête par ticket)
+    - compteurs et moyennes via des agrégats conditionnels (COUNT/AVG ... FILTER)
+    """
+    now = now or datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    first_day_of_month = today_start.replace(day=1)
+
+    first_en_cours = (
+        db.query(
+            models.TicketHistory.ticket_id.label("ticket_id"),
+            models.TicketHistory.changed_at.label("changed_at"),
+        )
+        .join(models.Ticket, models.Ticket.id == models.TicketHistory.ticket_id)
+        .filter(
+            models.Ticket.technician_id == technician_id,
+            models.TicketHistory.new_status == models.TicketStatus.EN_COURS,
+        )
+        .distinct(models.TicketHistory.ticket_id)
+        .order_by(models.TicketHistory.ticket_id, models.TicketHistory.changed_at.asc())
+        .subquery()
+    )
+
+    is_finished = models.Ticket.status.in_(FINISHED_STATUSES)
+    # Temps de résolution = clôture (ou résolution si pas encore clôturé) - création
+    resolution_end = func.coalesce(models.Ticket.closed_at, models.Ticket.resolved_at)
+    # Temps de réponse = première prise en charge (ou résolution à défaut) - assignation
+    response_end = func.coalesce(first_en_cours.c.changed_at, models.Ticket.resolved_at)
+
+    row = (
+        db.query(
+            func.count(models.Ticket.id),
+            func.count(models.Ticket.id).filter(models.Ticket.status == models.TicketStatus.EN_COURS),
+            func.count(models.Ticket.id).filter(models.Ticket.status == models.TicketStatus.RESOLU),
+            func.count(models.Ticket.id).filter(models.Ticket.status == models.TicketStatus.CLOTURE),
+            func.count(models.Ticket.id).filter(is_finished, models.Ticket.resolved_at >= first_day_of_month),
+            func.count(models.Ticket.id).filter(is_finished, models.Ticket.resolved_at >= today_start),
+            func.avg(_epoch(resolution_end - models.Ticket.created_at) / 86400).filter(
+                is_finished, resolution_end >= models.Ticket.created_at
+            ),
+            func.avg(_epoch(response_end - models.Ticket.assigned_at) / 60).filter(
+                is_finished, response_end >= models.Ticket.assigned_at
+            ),
+        )
+        .outerjoin(first_en_cours, first_en_cours.c.ticket_id == models.Ticket.id)
+        .filter(models.Ticket.technician_id == technician_id)
+        .one()
+    )
+    (
+        assigned,
+        in_progress,
+        resolved,
+        closed,
+        resolved_this_month,
+        resolved_today,
+        avg_resolution_days,
+        avg_response_minutes,
+    ) = row
+
+    return {
+        "technician_id": technician_id,
+        "assigned_tickets_count": assigned,
+        "in_progress_tickets_count": in_progress,
+        "resolved_tickets_count": resolved,
+        "closed_tickets_count": closed,
+        "resolved_this_month": resolved_this_month,
+        "resolved_today": resolved_today,
+        "avg_resolution_time_days": round(float(avg_resolution_days), 1) if avg_resolution_days is not None else 0,
+        "avg_response_time_minutes": round(float(avg_response_minutes), 0) if avg_response_minutes is not None else 0,
+        "success_rate": round(closed / assigned * 100, 1) if assigned > 0 else 0,
+        "computed_at": now,
+    }
+
+
+def refresh_technician_metrics(db: Session, technician_ids: Iterable[Optional[int]]) -> None:
+    """
+    Recalcule et enregistre (UPSERT) les métriques des techniciens concernés par une transition.
+    À appeler avant le commit de la transition : la mise à jour fait partie de la même transaction.
+    """
+    ids = {technician_id for technician_id in technician_ids if technician_id}
+    if not ids:
+        return
+    # La session n'a pas d'autoflush : envoyer les modifications en attente avant de recalculer
+    db.flush()
+    # Ordre croissant : deux transactions sur les mêmes techniciens ne peuvent pas s'interbloquer
+    for technician_id in sorted(ids):
+        # Verrou jusqu'à la fin de la transaction : une transition concurrente du même technicien
+        # attend notre commit, puis recalcule en voyant nos modifications (READ COMMITTED)
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:lock_class, :technician_id)"),
+            {"lock_class": TECHNICIAN_METRICS_LOCK_CLASS, "technician_id": technician_id},
+        )
+        values = compute_technician_metrics(db, technician_id)
+        statement = insert(models.TechnicianMetrics).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=[models.TechnicianMetrics.technician_id],
+            set_={key: value for key, value in values.items() if key != "technician_id"},
+        )
+        db.execute(statement)
+
+
+def get_technician_metrics(db: Session, technician_id: int) -> models.TechnicianMetrics:
+    """
+    Lit la ligne de métriques d'un technicien, sans écrire.
+    Si elle n'existe pas encore ou date d'un autre jour (tâche de changement de jour pas encore
+    passée), les métriques sont calculées pour cette réponse seulement.
+    """
+    metrics = db.get(models.TechnicianMetrics, technician_id)
+    today = datetime.utcnow().date()
+    if metrics is None or metrics.computed_at is None or metrics.computed_at.date() != today:
+        metrics = models.TechnicianMetrics(**compute_technician_metrics(db, technician_id))
+    return metrics
+
+
+def refresh_stale_technician_metrics() -> int:
+    """
+    Tâche planifiée (après minuit) : recalcule les métriques calculées un jour précédent.
+    Retourne le nombre de techniciens recalculés.
+    """
+    db = SessionLocal()
+    try:
+        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        stale_ids = [
+            technician_id
+            for (technician_id,) in db.query(models.TechnicianMetrics.technician_id).filter(
+                models.TechnicianMetrics.computed_at < today_start
+            )
+        ]
+        refresh_technician_metrics(db, stale_ids)
+        db.commit()
+        print(f"[{datetime.utcnow()}] Métriques des techniciens : {len(stale_ids)} technicien(s) recalculé(s)")
+        return len(stale_ids)
+    except Exception as e:
+        db.rollback()
+        print(f"Erreur lors du recalcul des métriques des techniciens: {e}")
+        raise  # Comptée en échec par ScheduledJob
+    finally:
+        db.close()
@@ -0,0 +1,61 @@
+"""
+Benchmark : coût de la requête de test "SELECT 1" exécutée dans get_db avant chaque requête
+
+Simule N requêtes API (emprunt d'une session, une requête applicative, fermeture) :
+  1. avec SELECT 1 avant la requête (ancien get_db)
+  2. sans (get_db actuel : seul pool_pre_ping vérifie la connexion à l'emprunt)
+
+Usage : python benchmark_get_db.py --requests 2000
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from app import models
+from app.database import SessionLocal
+
+
+def simulate_request(probe: bool) -> float:
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        if probe:
+            db.execute(text("SELECT 1"))
+        db.query(models.Role.id, models.Role.name).all()
+    finally:
+        db.close()
+    return (time.perf_counter() - started) * 1000
+
+
+def run(label: str, probe: bool, requests: int) -> float:
+    durations = sorted(simulate_request(probe) for _ in range(requests))
+    mean = statistics.mean(durations)
+    p95 = durations[int(len(durations) * 0.95) - 1]
+    print(
+        f"{label:<22} moyenne {mean:.3f} ms, médiane {statistics.median(durations):.3f} ms, "
+        f"p95 {p95:.3f} ms"
+    )
+    return mean
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Chauffer le pool de connexions
+    for _ in range(50):
+        simulate_request(probe=False)
+
+    with_probe = run("Avec SELECT 1", True, args.requests)
+    without_probe = run("Sans SELECT 1", False, args.requests)
+    print(
+        f"\nGain par requête : {with_probe - without_probe:.3f} ms "
+        f"({(with_probe - without_probe) / with_probe * 100:.0f} %)"
+    )
+
+
+if __name__ == "__main__":
+    main()
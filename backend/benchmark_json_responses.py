@@ -0,0 +1,77 @@
+"""
+Micro-benchmark : chemin de sérialisation des grandes listes de tickets
+
+Trois endpoints FastAPI sur les mêmes données en mémoire (pas de base de données),
+appelés par TestClient pour mesurer toute la pile de réponse :
+  1. response_model=List[TicketRead] et encodeur JSON standard (ancien /tickets/?paginate=false)
+  2. même validation, réponse ORJSONResponse (view=full actuel)
+  3. lignes de la requête compacte encodées par orjson sans validation (view=compact actuel)
+
+Usage : python benchmark_json_responses.py --tickets 2000 --requests 10
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+
+from app import schemas
+from benchmark_ticket_list_payload import compact_rows, make_tickets
+
+
+def build_app(tickets, rows) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/standard", response_model=List[schemas.TicketRead])
+    def standard():
+        return tickets
+
+    @app.get("/orjson", response_model=List[schemas.TicketRead], response_class=ORJSONResponse)
+    def orjson_full():
+        return tickets
+
+    @app.get("/compact", response_model=List[schemas.TicketListItem], response_class=ORJSONResponse)
+    def orjson_compact():
+        return ORJSONResponse([vars(row) for row in rows])
+
+    return app
+
+
+def run(client: TestClient, label: str, path: str, count: int, requests: int) -> float:
+    client.get(path)  # Échauffement
+    durations = []
+    size = 0
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(path)
+        durations.append(time.perf_counter() - started)
+        size = len(response.content)
+    median = statistics.median(durations)
+    print(
+        f"{label:<34} médiane {median * 1000:7.1f} ms, {count / median:8.0f} tickets/s, "
+        f"{size / 1024:7.1f} Kio"
+    )
+    return median
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=10)
+    args = parser.parse_args()
+
+    tickets = make_tickets(args.tickets)
+    client = TestClient(build_app(tickets, compact_rows(tickets)))
+    print(f"{args.tickets} tickets par réponse, {args.requests} requêtes par endpoint\n")
+    standard = run(client, "List[TicketRead] + json", "/standard", args.tickets, args.requests)
+    orjson_full = run(client, "List[TicketRead] + orjson", "/orjson", args.tickets, args.requests)
+    compact = run(client, "Compact, sans validation + orjson", "/compact", args.tickets, args.requests)
+    print(f"\nGain orjson (vue complète) : x{standard / orjson_full:.2f}")
+    print(f"Gain vue compacte sans validation : x{standard / compact:.1f}")
+
+
+if __name__ == "__main__":
+    main()
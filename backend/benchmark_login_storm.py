@@ -0,0 +1,110 @@
+"""
+Benchmark : vague de connexions (vérification bcrypt) dans le threadpool contre le pool de processus
+
+Simule N connexions simultanées au coût BCRYPT_ROUNDS :
+  1. vérification bcrypt dans un threadpool de 40 threads (ancien /auth/token synchrone)
+  2. vérification dans le pool de processus dédié, depuis la boucle asyncio (/auth/token actuel)
+
+Pour chaque mode : connexions par seconde, par seconde et par cœur utilisé, et latence
+d'une requête légère exécutée pendant la vague. La sonde est la même dans les deux modes :
+un passage par le threadpool de 40 threads, comme un endpoint synchrone servi par Starlette.
+
+Usage : python benchmark_login_storm.py --logins 200 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import password_hashing
+from app.password_hashing import check_password, check_password_async, hash_password
+
+STARLETTE_THREADS = 40
+
+
+async def probe_latency(stop: asyncio.Event, samples: list, threads: ThreadPoolExecutor) -> None:
+    """
+    Requête légère répétée pendant la vague : un endpoint synchrone attend un thread libre
+    du threadpool puis la boucle asyncio pour renvoyer sa réponse
+    """
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = time.perf_counter()
+        await loop.run_in_executor(threads, lambda: None)
+        samples.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def storm_in_threads(password: str, hashed: str, logins: int, samples: list, threads) -> float:
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_latency(stop, samples, threads))
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        loop.run_in_executor(threads, check_password, password, hashed) for _ in range(logins)
+    ])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    return elapsed
+
+
+async def storm_in_processes(password: str, hashed: str, logins: int, samples: list, threads) -> float:
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_latency(stop, samples, threads))
+    started = time.perf_counter()
+    await asyncio.gather(*[check_password_async(password, hashed) for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    return elapsed
+
+
+def report(label: str, logins: int, elapsed: float, cores: int, samples: list) -> None:
+    samples = sorted(samples) or [0.0]
+    p95 = samples[max(int(len(samples) * 0.95) - 1, 0)]
+    print(
+        f"{label:<30} {logins / elapsed:6.1f} connexions/s, {logins / elapsed / cores:5.1f} /s/cœur "
+        f"({cores} cœur(s)) ; requête légère : médiane {statistics.median(samples):.1f} ms, p95 {p95:.1f} ms"
+    )
+
+
+async def main_async(args) -> None:
+    password = "MotDePasse!2024"
+    hashed = hash_password(password, args.rounds)
+    cpu_count = os.cpu_count() or 1
+
+    # Threadpool des endpoints synchrones, partagé par la sonde dans les deux modes
+    threads = ThreadPoolExecutor(max_workers=STARLETTE_THREADS)
+    samples = []
+    elapsed = await storm_in_threads(password, hashed, args.logins, samples, threads)
+    report("Threadpool (40 threads)", args.logins, elapsed, min(cpu_count, STARLETTE_THREADS), samples)
+
+    # Démarrer les processus avant la mesure (import de bcrypt dans chaque processus)
+    await asyncio.gather(*[check_password_async(password, hashed) for _ in range(password_hashing.PASSWORD_HASH_WORKERS)])
+    samples = []
+    elapsed = await storm_in_processes(password, hashed, args.logins, samples, threads)
+    report(
+        f"Pool de processus ({password_hashing.PASSWORD_HASH_WORKERS})",
+        args.logins,
+        elapsed,
+        min(cpu_count, password_hashing.PASSWORD_HASH_WORKERS),
+        samples,
+    )
+    threads.shutdown()
+    password_hashing.shutdown_executor()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=password_hashing.BCRYPT_ROUNDS)
+    args = parser.parse_args()
+    print(f"{args.logins} connexions, bcrypt coût {args.rounds}\n")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark : débit d'envoi d'emails avec et sans le pool de connexions SMTP
+
+Lance un serveur SMTP local minimal (équivalent d'un aiosmtpd "sink" qui accepte et jette
+les messages) puis envoie N messages :
+  1. une connexion par message (ancien comportement de EmailService.send_email)
+  2. via SMTPConnectionPool (comportement actuel)
+
+Le serveur peut simuler le coût d'établissement d'une connexion réelle (TCP + STARTTLS + login)
+avec --handshake-delay.
+
+Usage : python benchmark_smtp_pool.py --messages 200 --threads 4 --handshake-delay 0.05
+"""
+import argparse
+import smtplib
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+
+from app.email_service import SMTPConnectionPool
+
+
+class SinkSMTPHandler(socketserver.StreamRequestHandler):
+    """Serveur SMTP minimal : accepte toutes les commandes et jette les messages"""
+    handshake_delay = 0.0
+    connections = 0
+    messages = 0
+    counter_lock = threading.Lock()
+
+    def reply(self, line: str) -> None:
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        with SinkSMTPHandler.counter_lock:
+            SinkSMTPHandler.connections += 1
+        time.sleep(self.handshake_delay)
+        self.reply("220 localhost benchmark SMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("ascii", "replace").strip().upper()
+            if command.startswith("EHLO"):
+                self.reply("250-localhost")
+                self.reply("250 8BITMIME")
+            elif command.startswith("HELO"):
+                self.reply("250 localhost")
+            elif command.startswith("DATA"):
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with SinkSMTPHandler.counter_lock:
+                    SinkSMTPHandler.messages += 1
+                self.reply("250 OK")
+            elif command.startswith("QUIT"):
+                self.reply("221 Bye")
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP...
+                self.reply("250 OK")
+
+
+class ThreadedSMTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def build_message(index: int) -> MIMEText:
+    msg = MIMEText(f"Message de test #{index}", "plain", "utf-8")
+    msg["From"] = "tickets@entreprise.com"
+    msg["To"] = "destinataire@entreprise.com"
+    msg["Subject"] = f"Benchmark {index}"
+    return msg
+
+
+def run(label: str, send, messages: int, threads: int) -> float:
+    SinkSMTPHandler.connections = 0
+    SinkSMTPHandler.messages = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(send, range(messages)))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<28} {messages} messages en {elapsed:.2f}s "
+        f"-> {messages / elapsed:.1f} msg/s ({SinkSMTPHandler.connections} connexions)"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--handshake-delay", type=float, default=0.05,
+                        help="Délai simulé (s) à l'ouverture d'une connexion")
+    args = parser.parse_args()
+
+    SinkSMTPHandler.handshake_delay = args.handshake_delay
+    server = ThreadedSMTPServer(("127.0.0.1", 0), SinkSMTPHandler)
+    host, port = server.server_address
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serveur SMTP de test sur {host}:{port}\n")
+
+    def connect():
+        return smtplib.SMTP(host, port, timeout=30)
+
+    def send_without_pool(index):
+        smtp = connect()
+        smtp.send_message(build_message(index))
+        smtp.quit()
+
+    pool = SMTPConnectionPool(connect, size=args.pool_size)
+
+    def send_with_pool(index):
+        with pool.connection() as smtp:
+            smtp.send_message(build_message(index))
+
+    try:
+        baseline = run("Connexion par message", send_without_pool, args.messages, args.threads)
+        pooled = run(f"Pool ({args.pool_size} connexions)", send_with_pool, args.messages, args.threads)
+        print(f"\nGain : x{baseline / pooled:.1f}")
+    finally:
+        pool.reset()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
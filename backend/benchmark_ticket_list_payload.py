@@ -0,0 +1,131 @@
+"""
+Benchmark : sérialisation d'une liste de tickets, vue complète (TicketRead) contre vue compacte (TicketListItem)
+
+Reproduit le travail fait par FastAPI après la requête SQL, sur des données générées en mémoire :
+  1. view=full : objets ORM Ticket avec créateur, technicien et leurs rôles -> List[TicketRead]
+  2. view=compact : lignes de colonnes (requête TICKET_LIST_COLUMNS) -> List[TicketListItem]
+validation (from_attributes), conversion en types JSON puis encodage, comme pour la réponse HTTP.
+
+Affiche les lignes sérialisées par seconde et la taille de la réponse (octets par ticket et total).
+
+Usage : python benchmark_ticket_list_payload.py --tickets 2000 --repeat 5
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app import models, schemas
+
+DESCRIPTION = (
+    "Bonjour, depuis ce matin l'imprimante du deuxième étage n'imprime plus les documents envoyés "
+    "depuis les postes du service comptabilité. Le voyant orange clignote et un message d'erreur "
+    "indique un bourrage papier alors qu'aucune feuille n'est coincée. Nous avons déjà essayé "
+    "d'éteindre et de rallumer l'appareil, sans succès. Merci de votre intervention rapide. "
+) * 3
+
+
+def make_user(user_id: int, role: models.Role) -> models.User:
+    return models.User(
+        id=user_id,
+        full_name=f"Utilisateur {user_id}",
+        email=f"utilisateur{user_id}@example.com",
+        agency="Agence Centrale",
+        phone="+225 01 02 03 04",
+        specialization="materiel",
+        actif=True,
+        username=f"utilisateur{user_id}",
+        password_hash="-",
+        role=role,
+    )
+
+
+def make_tickets(count: int) -> List[models.Ticket]:
+    user_role = models.Role(id=1, name="Utilisateur", description="Utilisateur standard qui peut créer des tickets")
+    technician_role = models.Role(id=4, name="Technicien", description="Peut prendre en charge et résoudre les tickets")
+    creators = [make_user(index, user_role) for index in range(1, 51)]
+    technicians = [make_user(100 + index, technician_role) for index in range(1, 11)]
+    now = datetime.utcnow()
+    tickets = []
+    for index in range(count):
+        creator, technician = creators[index % len(creators)], technicians[index % len(technicians)]
+        tickets.append(models.Ticket(
+            id=index + 1,
+            number=index + 1,
+            title=f"Imprimante en panne au bureau {index}",
+            description=DESCRIPTION,
+            type=models.TicketType.MATERIEL,
+            priority=models.TicketPriority.MOYENNE,
+            status=models.TicketStatus.EN_COURS,
+            category="Imprimante",
+            creator_id=creator.id,
+            creator=creator,
+            technician_id=technician.id,
+            technician=technician,
+            user_agency="Agence Centrale",
+            created_at=now - timedelta(hours=index),
+            assigned_at=now - timedelta(hours=index) + timedelta(minutes=30),
+        ))
+    return tickets
+
+
+def compact_rows(tickets: List[models.Ticket]) -> List[SimpleNamespace]:
+    """Équivalent des lignes renvoyées par la requête de la vue compacte"""
+    return [
+        SimpleNamespace(
+            id=ticket.id, number=ticket.number, title=ticket.title, type=ticket.type,
+            priority=ticket.priority, status=ticket.status, category=ticket.category,
+            created_at=ticket.created_at, assigned_at=ticket.assigned_at, resolved_at=ticket.resolved_at,
+            closed_at=ticket.closed_at, creator_id=ticket.creator_id, creator_name=ticket.creator.full_name,
+            technician_id=ticket.technician_id, technician_name=ticket.technician.full_name,
+        )
+        for ticket in tickets
+    ]
+
+
+def serialize_full(tickets) -> bytes:
+    adapter = TypeAdapter(List[schemas.TicketRead])
+    return json.dumps(adapter.dump_python(adapter.validate_python(tickets), mode="json")).encode("utf-8")
+
+
+def serialize_compact(rows) -> bytes:
+    items = [schemas.TicketListItem.model_validate(row) for row in rows]
+    adapter = TypeAdapter(List[schemas.TicketListItem])
+    return json.dumps(adapter.dump_python(adapter.validate_python(items), mode="json")).encode("utf-8")
+
+
+def run(label: str, serialize, data, repeat: int):
+    body = serialize(data)  # Échauffement
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = serialize(data)
+    elapsed = (time.perf_counter() - started) / repeat
+    rows_per_second = len(data) / elapsed
+    print(
+        f"{label:<10} {rows_per_second:10.0f} lignes/s ({elapsed * 1000:7.1f} ms pour {len(data)}), "
+        f"{len(body) / len(data):6.0f} octets/ticket, {len(body) / 1024:8.1f} Kio au total"
+    )
+    return rows_per_second, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tickets = make_tickets(args.tickets)
+    full_rate, full_size = run("full", serialize_full, tickets, args.repeat)
+    compact_rate, compact_size = run("compact", serialize_compact, compact_rows(tickets), args.repeat)
+    print(
+        f"\nVue compacte : x{compact_rate / full_rate:.1f} lignes/s, "
+        f"réponse {100 - compact_size / full_size * 100:.0f} % plus petite"
+    )
+
+
+if __name__ == "__main__":
+    main()
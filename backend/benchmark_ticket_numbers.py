@@ -0,0 +1,121 @@
+"""
+Benchmark : création concurrente de tickets, numéro calculé (MAX + 1) contre séquence PostgreSQL
+
+Chaque thread crée des tickets dans sa propre session :
+  1. ancien calcul : SELECT du plus grand numéro puis INSERT avec numéro + 1
+     (une violation de la contrainte d'unicité est comptée comme collision puis retentée)
+  2. séquence tickets_number_seq (comportement actuel de create_ticket)
+
+Les tickets créés par le benchmark sont supprimés à la fin. À lancer sur une base de test :
+les numéros consommés dans la séquence ne sont pas réutilisés.
+
+Usage : python benchmark_ticket_numbers.py --threads 16 --tickets 50
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+from app.database import SessionLocal
+
+BENCHMARK_TITLE = "[benchmark] numérotation des tickets"
+
+
+def new_ticket(creator_id: int, number=None) -> models.Ticket:
+    ticket = models.Ticket(
+        title=BENCHMARK_TITLE,
+        description="Ticket créé par benchmark_ticket_numbers.py",
+        type=models.TicketType.MATERIEL,
+        priority=models.TicketPriority.FAIBLE,
+        status=models.TicketStatus.EN_ATTENTE_ANALYSE,
+        creator_id=creator_id,
+    )
+    if number is not None:
+        ticket.number = number
+    return ticket
+
+
+def create_with_max_plus_one(creator_id: int, count: int, collisions: list) -> None:
+    db = SessionLocal()
+    try:
+        created = 0
+        while created < count:
+            last_ticket = db.query(models.Ticket).order_by(models.Ticket.number.desc()).first()
+            next_number = (last_ticket.number + 1) if last_ticket and last_ticket.number else 1
+            db.add(new_ticket(creator_id, next_number))
+            try:
+                db.commit()
+                created += 1
+            except IntegrityError:
+                db.rollback()
+                collisions.append(1)
+    finally:
+        db.close()
+
+
+def create_with_sequence(creator_id: int, count: int, collisions: list) -> None:
+    db = SessionLocal()
+    try:
+        for _ in range(count):
+            db.add(new_ticket(creator_id))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                collisions.append(1)
+    finally:
+        db.close()
+
+
+def cleanup() -> None:
+    db = SessionLocal()
+    try:
+        db.query(models.Ticket).filter(models.Ticket.title == BENCHMARK_TITLE).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def run(label: str, worker, creator_id: int, threads: int, tickets: int) -> float:
+    collisions = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(worker, creator_id, tickets, collisions) for _ in range(threads)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - started
+    total = threads * tickets
+    print(
+        f"{label:<22} {total} tickets en {elapsed:.2f}s -> {total / elapsed:.1f} insertions/s, "
+        f"{len(collisions)} collision(s)"
+    )
+    cleanup()
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--tickets", type=int, default=50, help="Tickets créés par thread")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        creator = db.query(models.User).order_by(models.User.id).first()
+    finally:
+        db.close()
+    if not creator:
+        print("Aucun utilisateur en base : lancer init_db.py d'abord")
+        return
+
+    print(f"{args.threads} threads x {args.tickets} tickets (créateur : {creator.username})\n")
+    cleanup()
+    baseline = run("MAX(number) + 1", create_with_max_plus_one, creator.id, args.threads, args.tickets)
+    sequence = run("Séquence", create_with_sequence, creator.id, args.threads, args.tickets)
+    print(f"\nGain : x{sequence / baseline:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Vérification : chaque requête fréquente des routers et du scheduler utilise un index
+
+Le script insère un jeu de données (utilisateurs, tickets, notifications, historique,
+commentaires) dans une transaction, met à jour les statistiques (ANALYZE), puis lit le plan
+(EXPLAIN) de chaque requête : la table filtrée doit être lue par un parcours d'index et non
+par un parcours séquentiel. La transaction est annulée à la fin, la base n'est pas modifiée.
+
+Prérequis : index créés (add_query_indexes.py) et au moins un rôle en base (init_db.py).
+
+Usage : python check_query_indexes.py --tickets 50000
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+
+from app import models
+from app.database import engine
+from app.pagination import apply_keyset
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+SEED_PREFIX = "check_index_"
+
+
+def seed(conn, users: int, tickets: int) -> dict:
+    """Insère le jeu de données et renvoie quelques identifiants à utiliser dans les requêtes"""
+    role_id = conn.execute(text("SELECT min(id) FROM roles")).scalar()
+    if role_id is None:
+        raise RuntimeError("Aucun rôle en base : lancer init_db.py d'abord")
+
+    conn.execute(text(f"""
+        INSERT INTO users (full_name, email, username, password_hash, role_id, actif, unread_notifications_count)
+        SELECT 'Utilisateur ' || g, '{SEED_PREFIX}' || g || '@example.invalid', '{SEED_PREFIX}' || g, '-', :role_id, true, 0
+        FROM generate_series(1, :users) AS g
+    """), {"role_id": role_id, "users": users})
+    user_ids = conn.execute(
+        text(f"SELECT array_agg(id ORDER BY id) FROM users WHERE username LIKE '{SEED_PREFIX}%'")
+    ).scalar()
+
+    # Répartition proche de la production : la plupart des tickets sont clôturés
+    conn.execute(text("""
+        INSERT INTO tickets (number, title, description, type, priority, status, creator_id, technician_id,
+                             created_at, assigned_at, resolved_at)
+        SELECT
+            -g, 'Ticket ' || g, 'Description du ticket ' || g, 'MATERIEL', 'MOYENNE',
+            (CASE
+                WHEN g % 10 < 7 THEN 'CLOTURE'
+                WHEN g % 10 = 7 THEN 'RESOLU'
+                WHEN g % 10 = 8 THEN 'EN_COURS'
+                ELSE 'ASSIGNE_TECHNICIEN'
+            END)::ticketstatus,
+            (:user_ids)[1 + g % cardinality(:user_ids)],
+            (:user_ids)[1 + (g * 7) % cardinality(:user_ids)],
+            now() - g * interval '10 minutes',
+            now() - g * interval '10 minutes' + interval '1 hour',
+            CASE WHEN g % 10 <= 7 THEN now() - g * interval '10 minutes' + interval '1 day' END
+        FROM generate_series(1, :tickets) AS g
+    """), {"user_ids": user_ids, "tickets": tickets})
+    ticket_ids = conn.execute(text("SELECT array_agg(id ORDER BY id) FROM tickets WHERE number < 0")).scalar()
+
+    conn.execute(text("""
+        INSERT INTO notifications (user_id, type, ticket_id, message, read, created_at)
+        SELECT (:user_ids)[1 + g % cardinality(:user_ids)], 'TICKET_CREE',
+               (:ticket_ids)[1 + g % cardinality(:ticket_ids)], 'Notification ' || g,
+               g % 5 <> 0, now() - g * interval '3 minutes'
+        FROM generate_series(1, :count) AS g
+    """), {"user_ids": user_ids, "ticket_ids": ticket_ids, "count": tickets * 4})
+    conn.execute(text("""
+        INSERT INTO ticket_history (ticket_id, old_status, new_status, user_id, changed_at)
+        SELECT (:ticket_ids)[1 + g % cardinality(:ticket_ids)], NULL,
+               (ARRAY['ASSIGNE_TECHNICIEN', 'EN_COURS', 'RESOLU'])[1 + g % 3]::ticketstatus,
+               (:user_ids)[1 + g % cardinality(:user_ids)], now() - g * interval '5 minutes'
+        FROM generate_series(1, :count) AS g
+    """), {"user_ids": user_ids, "ticket_ids": ticket_ids, "count": tickets * 3})
+    conn.execute(text("""
+        INSERT INTO comments (ticket_id, user_id, content, type, created_at)
+        SELECT (:ticket_ids)[1 + g % cardinality(:ticket_ids)], (:user_ids)[1 + g % cardinality(:user_ids)],
+               'Commentaire ' || g, 'TECHNIQUE', now() - g * interval '7 minutes'
+        FROM generate_series(1, :count) AS g
+    """), {"user_ids": user_ids, "ticket_ids": ticket_ids, "count": tickets})
+
+    conn.execute(text("ANALYZE users, tickets, notifications, ticket_history, comments"))
+    return {"user_id": user_ids[0], "technician_id": user_ids[7 % len(user_ids)], "ticket_id": ticket_ids[0]}
+
+
+def router_queries(ids: dict):
+    """(libellé, table qui doit être lue par index, requête) pour les formes de requêtes des routers"""
+    now = datetime.utcnow()
+    Ticket, Notification = models.Ticket, models.Notification
+    return [
+        ("GET /tickets/ (page)", "tickets",
+         apply_keyset(select(Ticket), Ticket.created_at, Ticket.id, None, 50)),
+        ("GET /tickets/me (page)", "tickets",
+         apply_keyset(select(Ticket).filter(Ticket.creator_id == ids["user_id"]),
+                      Ticket.created_at, Ticket.id, None, 50)),
+        ("GET /tickets/assigned (page)", "tickets",
+         apply_keyset(select(Ticket).filter(Ticket.technician_id == ids["technician_id"]),
+                      Ticket.created_at, Ticket.id, None, 50)),
+        ("Charge d'un technicien", "tickets",
+         select(Ticket.id).filter(
+             Ticket.technician_id == ids["technician_id"],
+             Ticket.status.in_([models.TicketStatus.ASSIGNE_TECHNICIEN, models.TicketStatus.EN_COURS]),
+         )),
+        ("Scheduler : tickets résolus anciens", "tickets",
+         select(Ticket.id).filter(
+             Ticket.status == models.TicketStatus.RESOLU,
+             Ticket.resolved_at.isnot(None),
+             Ticket.resolved_at <= now - timedelta(days=7),
+         )),
+        ("Scheduler : rappel déjà envoyé", "notifications",
+         select(Notification.id).filter(
+             Notification.ticket_id == ids["ticket_id"],
+             Notification.type == models.NotificationType.TICKET_CREE,
+         )),
+        ("GET /notifications/", "notifications",
+         select(Notification).filter(Notification.user_id == ids["user_id"])
+         .order_by(Notification.created_at.desc()).limit(50)),
+        ("GET /notifications/?unread_only", "notifications",
+         select(Notification).filter(Notification.user_id == ids["user_id"], Notification.read == False)
+         .order_by(Notification.created_at.desc()).limit(50)),
+        ("GET /tickets/{id}/history", "ticket_history",
+         select(models.TicketHistory).filter(models.TicketHistory.ticket_id == ids["ticket_id"])
+         .order_by(models.TicketHistory.changed_at.desc())),
+        ("Métriques : première prise en charge", "ticket_history",
+         select(models.TicketHistory.changed_at).filter(
+             models.TicketHistory.ticket_id == ids["ticket_id"],
+             models.TicketHistory.new_status == models.TicketStatus.EN_COURS,
+         ).order_by(models.TicketHistory.changed_at.asc())),
+        ("GET /tickets/{id}/comments", "comments",
+         select(models.Comment).filter(models.Comment.ticket_id == ids["ticket_id"])
+         .order_by(models.Comment.created_at.asc())),
+    ]
+
+
+def table_relations(conn, table: str) -> set:
+    """
+    La table et ses partitions (pg_inherits, récursivement) : le plan d'une table partitionnée
+    nomme les partitions lues (notifications_default, notifications_pAAAAMM), pas la table mère
+    """
+    return set(conn.execute(text("""
+        WITH RECURSIVE relations AS (
+            SELECT CAST(:table AS regclass) AS relid
+            UNION ALL
+            SELECT inhrelid FROM pg_inherits JOIN relations ON inhparent = relations.relid
+        )
+        SELECT relname FROM relations JOIN pg_class ON pg_class.oid = relations.relid
+    """), {"table": table}).scalars())
+
+
+def scans(plan: dict, relations: set):
+    """(type de parcours, index) des nœuds du plan qui lisent la table ou l'une de ses partitions"""
+    found = []
+    if plan.get("Relation Name") in relations:
+        index_name = plan.get("Index Name")
+        if plan["Node Type"] == "Bitmap Heap Scan":
+            index_name = ", ".join(child.get("Index Name", "?") for child in plan.get("Plans", []))
+        found.append((plan["Node Type"], index_name))
+    for child in plan.get("Plans", []):
+        found.extend(scans(child, relations))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--tickets", type=int, default=50000)
+    args = parser.parse_args()
+
+    failures = 0
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            print(f"Insertion du jeu de données ({args.users} utilisateurs, {args.tickets} tickets)...")
+            ids = seed(conn, args.users, args.tickets)
+            print()
+            for label, table, statement in router_queries(ids):
+                sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+                plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                table_scans = scans(plan[0]["Plan"], table_relations(conn, table))
+                indexed = bool(table_scans) and all(node_type in INDEX_SCANS for node_type, _ in table_scans)
+                detail = ", ".join(f"{node_type}{f' ({index})' if index else ''}" for node_type, index in table_scans)
+                print(f"{'OK     ' if indexed else 'ÉCHEC  '} {label:<40} {table}: {detail or 'non lue'}")
+                if not indexed:
+                    failures += 1
+        finally:
+            # Ne rien conserver du jeu de données
+            transaction.rollback()
+
+    print(f"\n{failures} requête(s) sans parcours d'index" if failures else "\nToutes les requêtes utilisent un index")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ Crée les tables et les rôles par défaut
 """
 from app.database import Base, engine, SessionLocal
 from app import models
+from app.notification_retention import ensure_partitions
 from app.security import get_password_hash
 from sqlalchemy import text
 
@@ -146,6 +147,9 @@ def main():
         init_roles(db)
         init_admin_user(db)
         init_ticket_types_and_categories(db)
+        # Partitions mensuelles de la table notifications
+        ensure_partitions(db)
+        db.commit()
     finally:
         db.close()
     
@@ -0,0 +1,83 @@
+"""
+Script de migration : partitionnement mensuel de la table notifications (par created_at)
+- renomme l'ancienne table en notifications_legacy
+- crée la table partitionnée (clé primaire (id, created_at)), ses partitions, index et triggers
+- recopie les notifications puis supprime l'ancienne table
+
+La table est verrouillée pendant la copie : à lancer hors des heures d'utilisation.
+À lancer après add_unread_notifications_counter.py et add_realtime_triggers.py.
+"""
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app import models
+from app.database import SessionLocal
+from app.notification_retention import ensure_partitions
+
+NOTIFICATION_COLUMNS = "id, user_id, type, ticket_id, message, read, created_at, read_at"
+
+
+def migrate_database():
+    """Remplace la table notifications par une table partitionnée par mois"""
+    db = SessionLocal()
+    try:
+        print("Début de la migration...")
+        dialect = postgresql.dialect()
+        table = models.Notification.__table__
+
+        relkind = db.execute(text("SELECT relkind FROM pg_class WHERE relname = 'notifications'")).scalar()
+        if relkind == "p":
+            print("OK - La table 'notifications' est déjà partitionnée")
+            return
+
+        db.execute(text("LOCK TABLE notifications IN ACCESS EXCLUSIVE MODE"))
+
+        # Libérer les noms utilisés par la nouvelle table (clé primaire, séquence, index)
+        db.execute(text("ALTER TABLE notifications RENAME TO notifications_legacy"))
+        db.execute(text("ALTER TABLE notifications_legacy RENAME CONSTRAINT notifications_pkey TO notifications_legacy_pkey"))
+        db.execute(text("ALTER SEQUENCE notifications_id_seq RENAME TO notifications_legacy_id_seq"))
+        for index in table.indexes:
+            db.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        print("OK - Ancienne table renommée en 'notifications_legacy'")
+
+        db.execute(text(str(CreateTable(table).compile(dialect=dialect))))
+        oldest = db.execute(text("SELECT min(created_at) FROM notifications_legacy")).scalar()
+        ensure_partitions(db, since=oldest)
+        print("OK - Table partitionnée 'notifications' et partitions mensuelles créées")
+
+        # Copie avant la création des triggers : le compteur de non lues est déjà à jour
+        copied = db.execute(text(f"""
+            INSERT INTO notifications ({NOTIFICATION_COLUMNS})
+            SELECT id, user_id, type, ticket_id, message, read,
+                   coalesce(created_at, read_at, now() AT TIME ZONE 'utc'), read_at
+            FROM notifications_legacy
+        """)).rowcount
+        db.execute(text("""
+            SELECT setval(pg_get_serial_sequence('notifications', 'id'), coalesce(max(id), 0) + 1, false)
+            FROM notifications
+        """))
+        print(f"OK - {copied} notification(s) copiée(s)")
+
+        for index in table.indexes:
+            db.execute(text(str(CreateIndex(index).compile(dialect=dialect))))
+        for statement in models.UNREAD_COUNTER_DDL + models.REALTIME_DDL["notifications"]:
+            db.execute(text(statement))
+        print("OK - Index et triggers recréés")
+
+        db.execute(text("DROP TABLE notifications_legacy"))
+        db.execute(text("ANALYZE notifications"))
+        db.commit()
+        print("OK - Ancienne table supprimée")
+
+        print("\nMigration terminée avec succès !")
+
+    except Exception as e:
+        db.rollback()
+        print(f"ERREUR lors de la migration: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    migrate_database()
@@ -1,5 +1,6 @@
 @echo off
 cd /d "%~dp0"
 call venv\Scripts\activate.bat
+REM Worker d'envoi des emails (file email_outbox), dans une fenetre separee
+start "Email worker" cmd /k python -m app.email_worker
 python -m uvicorn app.main:app --reload --host 127.0.0.1 --port 8000
-
@@ -1,4 +1,10 @@
 cd $PSScriptRoot
 .\venv\Scripts\Activate.ps1
-python -m uvicorn app.main:app --reload --host 127.0.0.1 --port 8000
-
+# Worker d'envoi des emails (file email_outbox), dans une fenetre separee
+$emailWorker = Start-Process python -ArgumentList "-m", "app.email_worker" -PassThru
+try {
+    python -m uvicorn app.main:app --reload --host 127.0.0.1 --port 8000
+}
+finally {
+    Stop-Process -Id $emailWorker.Id -ErrorAction SilentlyContinue
+}
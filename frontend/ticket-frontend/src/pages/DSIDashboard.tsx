@@ -3,6 +3,9 @@ import { useSearchParams, useLocation, useNavigate } from "react-router-dom";
 import { Users, Clock3, TrendingUp, Award, UserCheck, Star, LayoutDashboard, ChevronLeft, ChevronRight, Bell, BarChart3, Search, Ticket, Wrench, CheckCircle2, AlertTriangle, Clock, Briefcase, UserPlus, CornerUpRight, Box } from "lucide-react";
 import React from "react";
 import helpdeskLogo from "../assets/helpdesk-logo.png";
+import { openRealtimeStream } from "../realtime";
+import { countByStatus, fetchTicketPages, fetchTicketStats, mergeTickets, refetchTickets } from "../tickets";
+import type { TicketStats } from "../tickets";
 import jsPDF from "jspdf";
 import autoTable from "jspdf-autotable";
 import * as XLSX from "xlsx";
@@ -193,6 +196,8 @@ function DSIDashboard({ token }: DSIDashboardProps) {
   }
 
   const [allTickets, setAllTickets] = useState<Ticket[]>([]);
+  // Compteurs globaux calculés par le serveur (GET /tickets/stats), indépendants de la recherche
+  const [ticketStats, setTicketStats] = useState<TicketStats | null>(null);
   const [technicians, setTechnicians] = useState<Technician[]>([]);
   const [selectedTechnician, setSelectedTechnician] = useState<string>("");
   const [assignmentNotes, setAssignmentNotes] = useState<string>("");
@@ -269,6 +274,9 @@ function DSIDashboard({ token }: DSIDashboardProps) {
   const [userAgencyFilter, setUserAgencyFilter] = useState<string>("all");
   const [searchQuery, setSearchQuery] = useState<string>("");
   const [ticketSearchQuery, setTicketSearchQuery] = useState<string>("");
+  // Valeur courante pour les callbacks du flux temps réel (ouvert une seule fois par jeton)
+  const ticketSearchQueryRef = useRef(ticketSearchQuery);
+  ticketSearchQueryRef.current = ticketSearchQuery;
   const [currentPage, setCurrentPage] = useState<number>(1);
   const [usersPerPage] = useState<number>(10);
   const [sidebarCollapsed, setSidebarCollapsed] = useState(false);
@@ -1291,29 +1299,30 @@ function DSIDashboard({ token }: DSIDashboardProps) {
     }
     
     try {
-      const url = new URL("http://localhost:8000/tickets/");
+      const params: Record<string, string> = {};
       if (searchTerm && searchTerm.trim() !== "") {
-        url.searchParams.append("search", searchTerm.trim());
+        params.search = searchTerm.trim();
       }
       
-      const ticketsRes = await fetch(url.toString(), {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-      let ticketsData: Ticket[] = [];
-      if (ticketsRes.ok) {
-        ticketsData = await ticketsRes.json();
-        setAllTickets(ticketsData);
-        // Calculer les métriques
-        const openCount = ticketsData.filter((t: Ticket) => 
-          t.status !== "cloture" && t.status !== "resolu"
-        ).length;
-        setMetrics(prev => ({ ...prev, openTickets: openCount }));
-      }
+      // Liste chargée page par page (curseur), jamais en une seule réponse
+      const ticketsData = await fetchTicketPages<Ticket>(token, "/tickets/", params);
+      setAllTickets(ticketsData);
     } catch (err) {
       console.error("Erreur lors du chargement des tickets:", err);
     }
+    await loadTicketStats();
+  }
+
+  // Compteurs de tickets agrégés côté serveur, sans parcourir la liste chargée
+  async function loadTicketStats() {
+    try {
+      const stats = await fetchTicketStats(token);
+      setTicketStats(stats);
+      const openCount = stats.total - countByStatus(stats, "resolu", "cloture");
+      setMetrics(prev => ({ ...prev, openTickets: openCount }));
+    } catch (err) {
+      console.error("Erreur lors du chargement des statistiques des tickets:", err);
+    }
   }
 
   useEffect(() => {
@@ -1737,16 +1746,34 @@ function DSIDashboard({ token }: DSIDashboardProps) {
     void loadNotifications();
     void loadUnreadCount();
 
-    // Recharger automatiquement les tickets et notifications toutes les 30 secondes
-    // Cela permet aux métriques (temps moyen, satisfaction, etc.) de se mettre à jour automatiquement avec les données réelles
-    const interval = setInterval(() => {
-      void loadTickets(ticketSearchQuery); // Rafraîchir les tickets pour mettre à jour les métriques automatiquement
-      void loadNotifications();
-      void loadUnreadCount();
-    }, 30000);
-     
-     return () => clearInterval(interval);
-  }, [token, ticketSearchQuery]);
+    // Flux temps réel (Server-Sent Events) : les données ne sont rechargées que lorsqu'une
+    // notification arrive ou qu'un ticket change, au lieu d'interroger l'API toutes les 30 secondes.
+    // Les événements "ticket" rapprochés ne déclenchent qu'un rechargement ; le terme de recherche
+    // est lu dans une ref pour ne pas rouvrir le flux à chaque frappe.
+    return openRealtimeStream(token, {
+      onNotification: () => {
+        void loadNotifications();
+        void loadUnreadCount();
+      },
+      onTickets: (ticketIds) => {
+        // Une recherche filtre la liste côté serveur : la recharger plutôt que d'y insérer des tickets
+        if (ticketIds === null || ticketSearchQueryRef.current.trim() !== "") {
+          void loadTickets(ticketSearchQueryRef.current);
+          return;
+        }
+        // Recharger seulement les tickets modifiés, et les compteurs
+        void loadTicketStats();
+        refetchTickets<Ticket>(token, ticketIds)
+          .then((update) => setAllTickets(update))
+          .catch((err) => console.error("Erreur lors du rafraîchissement des tickets:", err));
+      },
+      onResync: () => {
+        void loadTickets(ticketSearchQueryRef.current);
+        void loadNotifications();
+        void loadUnreadCount();
+      },
+    });
+  }, [token]);
 
   // Debounce pour la recherche de tickets
   useEffect(() => {
@@ -2119,15 +2146,9 @@ function DSIDashboard({ token }: DSIDashboardProps) {
       });
 
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         setSelectedTechnician("");
         setAssignmentNotes("");
         setShowAssignModal(false);
@@ -2215,15 +2236,9 @@ function DSIDashboard({ token }: DSIDashboardProps) {
       });
 
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         setSelectedTechnician("");
         setAssignmentNotes("");
         setShowReassignModal(false);
@@ -2280,15 +2295,9 @@ function DSIDashboard({ token }: DSIDashboardProps) {
         }),
       });
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         setSelectedAdjoint("");
         setAssignmentNotes("");
         setShowDelegateModal(false);
@@ -2324,15 +2333,9 @@ function DSIDashboard({ token }: DSIDashboardProps) {
       });
 
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         alert("Ticket escaladé avec succès");
       } else {
         const error = await res.json();
@@ -2363,15 +2366,9 @@ function DSIDashboard({ token }: DSIDashboardProps) {
       });
 
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         alert("Ticket clôturé avec succès");
       } else {
         const error = await res.json();
@@ -2460,15 +2457,9 @@ function DSIDashboard({ token }: DSIDashboardProps) {
       });
 
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         setSelectedTechnician("");
         setAssignmentNotes("");
         setReopenTicketId(null);
@@ -2494,11 +2485,14 @@ function DSIDashboard({ token }: DSIDashboardProps) {
   const closedTickets = allTickets.filter((t) => t.status === "cloture");
   const rejectedTickets = allTickets.filter((t) => t.status === "rejete");
 
-  const pendingCount = pendingTickets.length;
-  const assignedCount = assignedTickets.length;
-  const resolvedCount = resolvedTickets.length;
-  const closedCount = closedTickets.length;
-  const totalTicketsCount = allTickets.length;
+  // Compteurs : statistiques du serveur (tous les tickets, même pendant une recherche),
+  // liste chargée tant qu'elles ne sont pas disponibles
+  const pendingCount = ticketStats ? countByStatus(ticketStats, "en_attente_analyse") : pendingTickets.length;
+  const assignedCount = ticketStats ? countByStatus(ticketStats, "assigne_technicien", "en_cours") : assignedTickets.length;
+  const resolvedCount = ticketStats ? countByStatus(ticketStats, "resolu") : resolvedTickets.length;
+  const closedCount = ticketStats ? countByStatus(ticketStats, "cloture") : closedTickets.length;
+  const rejectedCount = ticketStats ? countByStatus(ticketStats, "rejete") : rejectedTickets.length;
+  const totalTicketsCount = ticketStats ? ticketStats.total : allTickets.length;
   // Taux de résolution GLOBAL = (résolu + clôturé) / total
   const resolvedOrClosedCount = resolvedCount + closedCount;
   const resolutionRate =
@@ -3281,7 +3275,7 @@ function DSIDashboard({ token }: DSIDashboardProps) {
         doc.text("Métriques principales", 14, yPos);
         yPos += 10;
         doc.setFontSize(11);
-        doc.text(`Nombre total de tickets: ${allTickets.length}`, 14, yPos);
+        doc.text(`Nombre total de tickets: ${totalTicketsCount}`, 14, yPos);
         yPos += 7;
         doc.text(`Tickets résolus/clôturés: ${resolvedCount + closedCount}`, 14, yPos);
         yPos += 15;
@@ -3293,11 +3287,11 @@ function DSIDashboard({ token }: DSIDashboardProps) {
         
         const statusData = [
           ["Statut", "Nombre", "Pourcentage"],
-          ["En attente", pendingCount.toString(), allTickets.length > 0 ? ((pendingCount / allTickets.length) * 100).toFixed(1) + "%" : "0%"],
-          ["Assignés/En cours", assignedCount.toString(), allTickets.length > 0 ? ((assignedCount / allTickets.length) * 100).toFixed(1) + "%" : "0%"],
-          ["Résolus", resolvedCount.toString(), allTickets.length > 0 ? ((resolvedCount / allTickets.length) * 100).toFixed(1) + "%" : "0%"],
-          ["Clôturés", closedCount.toString(), allTickets.length > 0 ? ((closedCount / allTickets.length) * 100).toFixed(1) + "%" : "0%"],
-          ["Relancés", rejectedTickets.length.toString(), allTickets.length > 0 ? ((rejectedTickets.length / allTickets.length) * 100).toFixed(1) + "%" : "0%"]
+          ["En attente", pendingCount.toString(), totalTicketsCount > 0 ? ((pendingCount / totalTicketsCount) * 100).toFixed(1) + "%" : "0%"],
+          ["Assignés/En cours", assignedCount.toString(), totalTicketsCount > 0 ? ((assignedCount / totalTicketsCount) * 100).toFixed(1) + "%" : "0%"],
+          ["Résolus", resolvedCount.toString(), totalTicketsCount > 0 ? ((resolvedCount / totalTicketsCount) * 100).toFixed(1) + "%" : "0%"],
+          ["Clôturés", closedCount.toString(), totalTicketsCount > 0 ? ((closedCount / totalTicketsCount) * 100).toFixed(1) + "%" : "0%"],
+          ["Relancés", rejectedCount.toString(), totalTicketsCount > 0 ? ((rejectedCount / totalTicketsCount) * 100).toFixed(1) + "%" : "0%"]
         ];
         
         autoTable(doc, {
@@ -4002,7 +3996,7 @@ function DSIDashboard({ token }: DSIDashboardProps) {
           ['Généré par', userInfo?.full_name || 'Utilisateur'],
           [''],
           ['Métriques principales'],
-          ['Nombre total de tickets', allTickets.length],
+          ['Nombre total de tickets', totalTicketsCount],
           ['Tickets résolus/clôturés', resolvedCount + closedCount],
           ['']
         ];
@@ -4012,11 +4006,11 @@ function DSIDashboard({ token }: DSIDashboardProps) {
         // Feuille 2: Répartition par statut
         const statusData = [
           ['Statut', 'Nombre', 'Pourcentage'],
-          ['En attente', pendingCount, allTickets.length > 0 ? ((pendingCount / allTickets.length) * 100).toFixed(1) + '%' : '0%'],
-          ['Assignés/En cours', assignedCount, allTickets.length > 0 ? ((assignedCount / allTickets.length) * 100).toFixed(1) + '%' : '0%'],
-          ['Résolus', resolvedCount, allTickets.length > 0 ? ((resolvedCount / allTickets.length) * 100).toFixed(1) + '%' : '0%'],
-          ['Clôturés', closedCount, allTickets.length > 0 ? ((closedCount / allTickets.length) * 100).toFixed(1) + '%' : '0%'],
-          ['Relancés', rejectedTickets.length, allTickets.length > 0 ? ((rejectedTickets.length / allTickets.length) * 100).toFixed(1) + '%' : '0%']
+          ['En attente', pendingCount, totalTicketsCount > 0 ? ((pendingCount / totalTicketsCount) * 100).toFixed(1) + '%' : '0%'],
+          ['Assignés/En cours', assignedCount, totalTicketsCount > 0 ? ((assignedCount / totalTicketsCount) * 100).toFixed(1) + '%' : '0%'],
+          ['Résolus', resolvedCount, totalTicketsCount > 0 ? ((resolvedCount / totalTicketsCount) * 100).toFixed(1) + '%' : '0%'],
+          ['Clôturés', closedCount, totalTicketsCount > 0 ? ((closedCount / totalTicketsCount) * 100).toFixed(1) + '%' : '0%'],
+          ['Relancés', rejectedCount, totalTicketsCount > 0 ? ((rejectedCount / totalTicketsCount) * 100).toFixed(1) + '%' : '0%']
         ];
         const statusWs = XLSX.utils.aoa_to_sheet(statusData);
         XLSX.utils.book_append_sheet(wb, statusWs, sanitizeSheetName("Par statut"));
@@ -6615,11 +6609,11 @@ Les données détaillées seront disponibles dans une prochaine version.</pre>
             </h3>
             {(() => {
               const statusData = [
-                { name: "En attente", value: allTickets.filter((t) => t.status === "en_attente_analyse").length, color: "#f97316" },
-                { name: "Assignés / En cours", value: allTickets.filter((t) => t.status === "assigne_technicien" || t.status === "en_cours").length, color: "#3b82f6" },
-                { name: "Résolus", value: allTickets.filter((t) => t.status === "resolu").length, color: "#22c55e" },
-                { name: "Clôturés", value: allTickets.filter((t) => t.status === "cloture").length, color: "#facc15" },
-                { name: "Relancés", value: allTickets.filter((t) => t.status === "rejete").length, color: "#ef4444" }
+                { name: "En attente", value: pendingCount, color: "#f97316" },
+                { name: "Assignés / En cours", value: assignedCount, color: "#3b82f6" },
+                { name: "Résolus", value: resolvedCount, color: "#22c55e" },
+                { name: "Clôturés", value: closedCount, color: "#facc15" },
+                { name: "Relancés", value: rejectedCount, color: "#ef4444" }
               ].filter(item => item.value > 0);
 
               return statusData.length > 0 ? (
@@ -1,7 +1,10 @@
-import { useEffect, useState } from "react";
+import { useEffect, useState, useRef } from "react";
 import { useSearchParams, useLocation, useNavigate } from "react-router-dom";
 import { Clock3, Users, CheckCircle2, ChevronRight, ChevronLeft, ChevronDown, LayoutDashboard, Bell, Search, Clock, Monitor, Wrench, Forward, AlertTriangle, BarChart3, TrendingUp, Box, UserPlus } from "lucide-react";
 import helpdeskLogo from "../assets/helpdesk-logo.png";
+import { openRealtimeStream } from "../realtime";
+import { countByStatus, fetchTicketPages, fetchTicketStats, mergeTickets, refetchTickets } from "../tickets";
+import type { TicketStats } from "../tickets";
 import jsPDF from "jspdf";
 import autoTable from "jspdf-autotable";
 import * as XLSX from "xlsx";
@@ -164,6 +167,8 @@ function SecretaryDashboard({ token }: SecretaryDashboardProps) {
   };
   
   const [allTickets, setAllTickets] = useState<Ticket[]>([]);
+  // Compteurs globaux calculés par le serveur (GET /tickets/stats), indépendants de la recherche
+  const [ticketStats, setTicketStats] = useState<TicketStats | null>(null);
   const [technicians, setTechnicians] = useState<Technician[]>([]);
   const [selectedTicket, setSelectedTicket] = useState<string | null>(null);
   const [selectedTechnician, setSelectedTechnician] = useState<string>("");
@@ -213,6 +218,9 @@ function SecretaryDashboard({ token }: SecretaryDashboardProps) {
   const [sidebarCollapsed, setSidebarCollapsed] = useState(false);
   const [openActionsMenuFor, setOpenActionsMenuFor] = useState<string | null>(null);
   const [ticketSearchQuery, setTicketSearchQuery] = useState<string>("");
+  // Valeur courante pour les callbacks du flux temps réel (ouvert une seule fois par jeton)
+  const ticketSearchQueryRef = useRef(ticketSearchQuery);
+  ticketSearchQueryRef.current = ticketSearchQuery;
   const [delegatedTicketsByDSI, setDelegatedTicketsByDSI] = useState<Set<string>>(new Set());
 
   // Fonction pour déterminer la section active basée sur l'URL (uniquement pour Adjoint DSI)
@@ -382,23 +390,27 @@ function SecretaryDashboard({ token }: SecretaryDashboardProps) {
     }
     
     try {
-      const url = new URL("http://localhost:8000/tickets/");
+      const params: Record<string, string> = {};
       if (searchTerm && searchTerm.trim() !== "") {
-        url.searchParams.append("search", searchTerm.trim());
+        params.search = searchTerm.trim();
       }
       
-      const ticketsRes = await fetch(url.toString(), {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-      if (ticketsRes.ok) {
-        const ticketsData = await ticketsRes.json();
-        setAllTickets(ticketsData);
-      }
+      // Liste chargée page par page (curseur), jamais en une seule réponse
+      const ticketsData = await fetchTicketPages<Ticket>(token, "/tickets/", params);
+      setAllTickets(ticketsData);
     } catch (err) {
       console.error("Erreur lors du chargement des tickets:", err);
     }
+    await loadTicketStats();
+  }
+
+  // Compteurs de tickets agrégés côté serveur, sans parcourir la liste chargée
+  async function loadTicketStats() {
+    try {
+      setTicketStats(await fetchTicketStats(token));
+    } catch (err) {
+      console.error("Erreur lors du chargement des statistiques des tickets:", err);
+    }
   }
 
   useEffect(() => {
@@ -447,16 +459,34 @@ function SecretaryDashboard({ token }: SecretaryDashboardProps) {
     }
     void loadData();
 
-    // Recharger automatiquement les tickets et notifications toutes les 30 secondes
-    // Cela permet aux métriques de se mettre à jour automatiquement avec les données réelles
-    const interval = setInterval(() => {
-      void loadTickets(ticketSearchQuery); // Rafraîchir les tickets pour mettre à jour les métriques automatiquement
-      void loadNotifications();
-      void loadUnreadCount();
-    }, 30000);
-    
-    return () => clearInterval(interval);
-  }, [token, ticketSearchQuery]);
+    // Flux temps réel (Server-Sent Events) : les données ne sont rechargées que lorsqu'une
+    // notification arrive ou qu'un ticket change, au lieu d'interroger l'API toutes les 30 secondes.
+    // Les événements "ticket" rapprochés ne déclenchent qu'un rechargement ; le terme de recherche
+    // est lu dans une ref pour ne pas rouvrir le flux à chaque frappe.
+    return openRealtimeStream(token, {
+      onNotification: () => {
+        void loadNotifications();
+        void loadUnreadCount();
+      },
+      onTickets: (ticketIds) => {
+        // Une recherche filtre la liste côté serveur : la recharger plutôt que d'y insérer des tickets
+        if (ticketIds === null || ticketSearchQueryRef.current.trim() !== "") {
+          void loadTickets(ticketSearchQueryRef.current);
+          return;
+        }
+        // Recharger seulement les tickets modifiés, et les compteurs
+        void loadTicketStats();
+        refetchTickets<Ticket>(token, ticketIds)
+          .then((update) => setAllTickets(update))
+          .catch((err) => console.error("Erreur lors du rafraîchissement des tickets:", err));
+      },
+      onResync: () => {
+        void loadTickets(ticketSearchQueryRef.current);
+        void loadNotifications();
+        void loadUnreadCount();
+      },
+    });
+  }, [token]);
 
   // Identifier les tickets délégués par le DSI
   // Un ticket est délégué par le DSI si :
@@ -2451,18 +2481,7 @@ Les données détaillées seront disponibles dans une prochaine version.</pre>
 
       if (res.ok) {
         const updated = await res.json();
-        setAllTickets(prev => prev.map(t => t.id === updated.id ? updated : t));
-        void (async () => {
-          try {
-            const ticketsRes = await fetch("http://localhost:8000/tickets/", {
-              headers: { Authorization: `Bearer ${token}` },
-            });
-            if (ticketsRes.ok) {
-              const ticketsData = await ticketsRes.json();
-              setAllTickets(ticketsData);
-            }
-          } catch {}
-        })();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         setSelectedTicket(null);
         setSelectedTechnician("");
         setAssignmentNotes("");
@@ -2686,15 +2705,9 @@ Les données détaillées seront disponibles dans une prochaine version.</pre>
       });
 
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         setSelectedTechnician("");
         setAssignmentNotes("");
         setShowReassignModal(false);
@@ -2726,15 +2739,9 @@ Les données détaillées seront disponibles dans une prochaine version.</pre>
       });
 
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         alert("Ticket escaladé avec succès");
       } else {
         const error = await res.json();
@@ -2765,15 +2772,9 @@ Les données détaillées seront disponibles dans une prochaine version.</pre>
       });
 
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         alert("Ticket clôturé avec succès");
       } else {
         const error = await res.json();
@@ -2862,15 +2863,9 @@ Les données détaillées seront disponibles dans une prochaine version.</pre>
       });
 
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         setSelectedTicket(null);
         setSelectedTechnician("");
         setAssignmentNotes("");
@@ -2895,9 +2890,14 @@ Les données détaillées seront disponibles dans une prochaine version.</pre>
   const assignedTickets = allTickets.filter((t) => t.status === "assigne_technicien" || t.status === "en_cours");
   const resolvedTickets = allTickets.filter((t) => t.status === "resolu");
 
-  const pendingCount = pendingTickets.length;
-  const assignedCount = assignedTickets.length;
-  const resolvedCount = resolvedTickets.length;
+  // Compteurs : statistiques du serveur (tous les tickets, même pendant une recherche),
+  // liste chargée tant qu'elles ne sont pas disponibles
+  const pendingCount = ticketStats ? countByStatus(ticketStats, "en_attente_analyse") : pendingTickets.length;
+  const assignedCount = ticketStats ? countByStatus(ticketStats, "assigne_technicien", "en_cours") : assignedTickets.length;
+  const resolvedCount = ticketStats ? countByStatus(ticketStats, "resolu") : resolvedTickets.length;
+  const closedCount = ticketStats ? countByStatus(ticketStats, "cloture") : allTickets.filter((t) => t.status === "cloture").length;
+  const rejectedCount = ticketStats ? countByStatus(ticketStats, "rejete") : allTickets.filter((t) => t.status === "rejete").length;
+  const totalTicketsCount = ticketStats ? ticketStats.total : allTickets.length;
 
   // Filtrer les tickets selon les filtres sélectionnés
   let filteredTickets = allTickets;
@@ -8189,28 +8189,28 @@ Les données détaillées seront disponibles dans une prochaine version.</pre>
                         <tbody>
                           <tr>
                             <td style={{ padding: "12px" }}>En attente</td>
-                            <td style={{ padding: "12px", textAlign: "right" }}>{pendingTickets.length}</td>
-                            <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.length > 0 ? ((pendingTickets.length / allTickets.length) * 100).toFixed(1) : 0}%</td>
+                            <td style={{ padding: "12px", textAlign: "right" }}>{pendingCount}</td>
+                            <td style={{ padding: "12px", textAlign: "right" }}>{totalTicketsCount > 0 ? ((pendingCount / totalTicketsCount) * 100).toFixed(1) : 0}%</td>
                           </tr>
                           <tr>
                             <td style={{ padding: "12px" }}>Assignés/En cours</td>
-                            <td style={{ padding: "12px", textAlign: "right" }}>{assignedTickets.length}</td>
-                            <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.length > 0 ? ((assignedTickets.length / allTickets.length) * 100).toFixed(1) : 0}%</td>
+                            <td style={{ padding: "12px", textAlign: "right" }}>{assignedCount}</td>
+                            <td style={{ padding: "12px", textAlign: "right" }}>{totalTicketsCount > 0 ? ((assignedCount / totalTicketsCount) * 100).toFixed(1) : 0}%</td>
                           </tr>
                           <tr>
                             <td style={{ padding: "12px" }}>Résolus</td>
                             <td style={{ padding: "12px", textAlign: "right" }}>{resolvedCount}</td>
-                            <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.length > 0 ? ((resolvedCount / allTickets.length) * 100).toFixed(1) : 0}%</td>
+                            <td style={{ padding: "12px", textAlign: "right" }}>{totalTicketsCount > 0 ? ((resolvedCount / totalTicketsCount) * 100).toFixed(1) : 0}%</td>
                           </tr>
                           <tr>
                             <td style={{ padding: "12px" }}>Clôturés</td>
-                            <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.filter((t) => t.status === "cloture").length}</td>
-                            <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.length > 0 ? ((allTickets.filter((t) => t.status === "cloture").length / allTickets.length) * 100).toFixed(1) : 0}%</td>
+                            <td style={{ padding: "12px", textAlign: "right" }}>{closedCount}</td>
+                            <td style={{ padding: "12px", textAlign: "right" }}>{totalTicketsCount > 0 ? ((closedCount / totalTicketsCount) * 100).toFixed(1) : 0}%</td>
                           </tr>
                           <tr>
                             <td style={{ padding: "12px" }}>Rejetés</td>
-                            <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.filter((t) => t.status === "rejete").length}</td>
-                            <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.length > 0 ? ((allTickets.filter((t) => t.status === "rejete").length / allTickets.length) * 100).toFixed(1) : 0}%</td>
+                            <td style={{ padding: "12px", textAlign: "right" }}>{rejectedCount}</td>
+                            <td style={{ padding: "12px", textAlign: "right" }}>{totalTicketsCount > 0 ? ((rejectedCount / totalTicketsCount) * 100).toFixed(1) : 0}%</td>
                           </tr>
                         </tbody>
                       </table>
@@ -8218,11 +8218,11 @@ Les données détaillées seront disponibles dans une prochaine version.</pre>
                         <ResponsiveContainer width="100%" height={300}>
                           <BarChart
                             data={[
-                              { name: "En attente", value: pendingTickets.length },
-                              { name: "Assignés/En cours", value: assignedTickets.length },
+                              { name: "En attente", value: pendingCount },
+                              { name: "Assignés/En cours", value: assignedCount },
                               { name: "Résolus", value: resolvedCount },
-                              { name: "Clôturés", value: allTickets.filter((t) => t.status === "cloture").length },
-                              { name: "Rejetés", value: allTickets.filter((t) => t.status === "rejete").length }
+                              { name: "Clôturés", value: closedCount },
+                              { name: "Rejetés", value: rejectedCount }
                             ]}
                             margin={{ top: 20, right: 30, left: 20, bottom: 5 }}
                           >
@@ -8997,28 +8997,28 @@ Les données détaillées seront disponibles dans une prochaine version.</pre>
                       <tbody>
                         <tr>
                           <td style={{ padding: "12px" }}>En attente</td>
-                          <td style={{ padding: "12px", textAlign: "right" }}>{pendingTickets.length}</td>
-                          <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.length > 0 ? ((pendingTickets.length / allTickets.length) * 100).toFixed(1) : 0}%</td>
+                          <td style={{ padding: "12px", textAlign: "right" }}>{pendingCount}</td>
+                          <td style={{ padding: "12px", textAlign: "right" }}>{totalTicketsCount > 0 ? ((pendingCount / totalTicketsCount) * 100).toFixed(1) : 0}%</td>
                         </tr>
                         <tr>
                           <td style={{ padding: "12px" }}>Assignés/En cours</td>
-                          <td style={{ padding: "12px", textAlign: "right" }}>{assignedTickets.length}</td>
-                          <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.length > 0 ? ((assignedTickets.length / allTickets.length) * 100).toFixed(1) : 0}%</td>
+                          <td style={{ padding: "12px", textAlign: "right" }}>{assignedCount}</td>
+                          <td style={{ padding: "12px", textAlign: "right" }}>{totalTicketsCount > 0 ? ((assignedCount / totalTicketsCount) * 100).toFixed(1) : 0}%</td>
                         </tr>
                         <tr>
                           <td style={{ padding: "12px" }}>Résolus</td>
                           <td style={{ padding: "12px", textAlign: "right" }}>{resolvedCount}</td>
-                          <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.length > 0 ? ((resolvedCount / allTickets.length) * 100).toFixed(1) : 0}%</td>
+                          <td style={{ padding: "12px", textAlign: "right" }}>{totalTicketsCount > 0 ? ((resolvedCount / totalTicketsCount) * 100).toFixed(1) : 0}%</td>
                         </tr>
                         <tr>
                           <td style={{ padding: "12px" }}>Clôturés</td>
-                          <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.filter((t) => t.status === "cloture").length}</td>
-                          <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.length > 0 ? ((allTickets.filter((t) => t.status === "cloture").length / allTickets.length) * 100).toFixed(1) : 0}%</td>
+                          <td style={{ padding: "12px", textAlign: "right" }}>{closedCount}</td>
+                          <td style={{ padding: "12px", textAlign: "right" }}>{totalTicketsCount > 0 ? ((closedCount / totalTicketsCount) * 100).toFixed(1) : 0}%</td>
                         </tr>
                         <tr>
                           <td style={{ padding: "12px" }}>Rejetés</td>
-                          <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.filter((t) => t.status === "rejete").length}</td>
-                          <td style={{ padding: "12px", textAlign: "right" }}>{allTickets.length > 0 ? ((allTickets.filter((t) => t.status === "rejete").length / allTickets.length) * 100).toFixed(1) : 0}%</td>
+                          <td style={{ padding: "12px", textAlign: "right" }}>{rejectedCount}</td>
+                          <td style={{ padding: "12px", textAlign: "right" }}>{totalTicketsCount > 0 ? ((rejectedCount / totalTicketsCount) * 100).toFixed(1) : 0}%</td>
                         </tr>
                       </tbody>
                     </table>
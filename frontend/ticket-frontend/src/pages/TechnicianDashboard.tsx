@@ -2,6 +2,8 @@ import { useEffect, useState, useRef } from "react";
 import { useSearchParams, useLocation, useNavigate } from "react-router-dom";
 import { ClipboardList, Clock3, CheckCircle2, LayoutDashboard, ChevronLeft, ChevronRight, Bell, Search, Box, Clock, Monitor, Wrench } from "lucide-react";
 import helpdeskLogo from "../assets/helpdesk-logo.png";
+import { openRealtimeStream } from "../realtime";
+import { fetchTicketPages, mergeTickets, refetchTickets } from "../tickets";
 
 interface Notification {
   id: string;
@@ -97,6 +99,9 @@ function TechnicianDashboard({ token }: TechnicianDashboardProps) {
   const [typeFilter, setTypeFilter] = useState<string>("all");
   const [openActionsMenuFor, setOpenActionsMenuFor] = useState<string | null>(null);
   const [ticketSearchQuery, setTicketSearchQuery] = useState<string>("");
+  // Valeur courante pour les callbacks du flux temps réel (ouvert une seule fois par jeton)
+  const ticketSearchQueryRef = useRef(ticketSearchQuery);
+  ticketSearchQueryRef.current = ticketSearchQuery;
 
   // Fonction pour déterminer la section active basée sur l'URL
   function getActiveSectionFromPath(): string {
@@ -260,20 +265,14 @@ function TechnicianDashboard({ token }: TechnicianDashboardProps) {
     }
     
     try {
-      const url = new URL("http://localhost:8000/tickets/assigned");
+      const params: Record<string, string> = {};
       if (searchTerm && searchTerm.trim() !== "") {
-        url.searchParams.append("search", searchTerm.trim());
+        params.search = searchTerm.trim();
       }
       
-      const res = await fetch(url.toString(), {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      });
-      if (res.ok) {
-        const data = await res.json();
-        setAllTickets(data);
-      }
+      // Liste chargée page par page (curseur), jamais en une seule réponse
+      const data = await fetchTicketPages<Ticket>(token, "/tickets/assigned", params);
+      setAllTickets(data);
     } catch (err) {
       console.error("Erreur chargement tickets:", err);
     }
@@ -306,14 +305,31 @@ function TechnicianDashboard({ token }: TechnicianDashboardProps) {
     void loadNotifications();
     void loadUnreadCount();
 
-    // Recharger les notifications toutes les 30 secondes
-    const interval = setInterval(() => {
-      void loadNotifications();
-      void loadUnreadCount();
-      void loadTickets(ticketSearchQuery);
-    }, 30000);
-    
-    return () => clearInterval(interval);
+    // Flux temps réel (Server-Sent Events) : les données ne sont rechargées que lorsqu'une
+    // notification arrive ou qu'un ticket change, au lieu d'interroger l'API toutes les 30 secondes.
+    // Les événements "ticket" rapprochés ne déclenchent qu'un rechargement ; le terme de recherche
+    // est lu dans une ref pour ne pas rouvrir le flux à chaque frappe.
+    return openRealtimeStream(token, {
+      onNotification: () => {
+        void loadNotifications();
+        void loadUnreadCount();
+      },
+      onTickets: (ticketIds) => {
+        // Une recherche filtre la liste côté serveur : la recharger plutôt que d'y insérer des tickets
+        if (ticketIds === null || ticketSearchQueryRef.current.trim() !== "") {
+          void loadTickets(ticketSearchQueryRef.current);
+          return;
+        }
+        refetchTickets<Ticket>(token, ticketIds)
+          .then((update) => setAllTickets(update))
+          .catch((err) => console.error("Erreur rafraîchissement tickets:", err));
+      },
+      onResync: () => {
+        void loadTickets(ticketSearchQueryRef.current);
+        void loadNotifications();
+        void loadUnreadCount();
+      },
+    });
   }, [token]);
 
   // Debounce pour la recherche de tickets
@@ -556,15 +572,9 @@ function TechnicianDashboard({ token }: TechnicianDashboardProps) {
       });
 
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/assigned", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         alert("Ticket pris en charge");
       } else {
         const error = await res.json();
@@ -678,15 +688,9 @@ function TechnicianDashboard({ token }: TechnicianDashboardProps) {
       });
 
       if (res.ok) {
-        const ticketsRes = await fetch("http://localhost:8000/tickets/assigned", {
-          headers: {
-            Authorization: `Bearer ${token}`,
-          },
-        });
-        if (ticketsRes.ok) {
-          const ticketsData = await ticketsRes.json();
-          setAllTickets(ticketsData);
-        }
+        // La réponse contient le ticket à jour : inutile de recharger toute la liste
+        const updated = await res.json();
+        setAllTickets(prev => mergeTickets(prev, [updated]));
         setResolveTicket(null);
         setResolutionSummary("");
         alert("Ticket marqué comme résolu. L'utilisateur a été notifié.");
@@ -3,6 +3,8 @@ import type { FormEvent } from "react";
 import { useLocation, useNavigate } from "react-router-dom";
 import { Clock, CheckCircle, LayoutDashboard, PlusCircle, Ticket, ChevronLeft, ChevronRight, Bell, Wrench, Monitor, Search, Send, Info, CheckCircle2, AlertTriangle, XCircle, Check, Pencil, Trash2, RefreshCcw } from "lucide-react";
 import helpdeskLogo from "../assets/helpdesk-logo.png";
+import { openRealtimeStream } from "../realtime";
+import { fetchTicketPages, refetchTickets, TicketLoadError } from "../tickets";
 
 interface UserDashboardProps {
   token: string;
@@ -255,24 +257,18 @@ function UserDashboard({ token: tokenProp }: UserDashboardProps) {
       tokenToUse = storedToken;
     }
     try {
-      const res = await fetch("http://localhost:8000/tickets/me", {
-        headers: {
-          Authorization: `Bearer ${tokenToUse}`,
-        },
-      });
-      if (res.ok) {
-        const data = await res.json();
-        console.log("Tickets chargés:", data);
-        setTickets(data);
-      } else if (res.status === 401) {
+      // Liste chargée page par page (curseur), jamais en une seule réponse
+      const data = await fetchTicketPages<Ticket>(tokenToUse, "/tickets/me");
+      console.log("Tickets chargés:", data);
+      setTickets(data);
+    } catch (err) {
+      if (err instanceof TicketLoadError && err.status === 401) {
         // Token invalide, rediriger vers la page de connexion
         localStorage.removeItem("token");
         localStorage.removeItem("userRole");
         window.location.href = "/";
-      } else {
-        console.error("Erreur lors du chargement des tickets:", res.status, res.statusText);
+        return;
       }
-    } catch (err) {
       console.error("Erreur lors du chargement des tickets:", err);
     }
   }
@@ -663,13 +659,30 @@ function UserDashboard({ token: tokenProp }: UserDashboardProps) {
       }
       void loadUserInfo();
       
-      // Recharger les notifications toutes les 30 secondes
-      const interval = setInterval(() => {
-        void loadNotifications();
-        void loadUnreadCount();
-      }, 30000);
-      
-      return () => clearInterval(interval);
+      // Flux temps réel (Server-Sent Events) : les données ne sont rechargées que lorsqu'une
+      // notification arrive ou qu'un ticket change, au lieu d'interroger l'API toutes les 30 secondes.
+      // Les événements "ticket" rapprochés sont regroupés ; seuls les tickets modifiés sont rechargés.
+      return openRealtimeStream(actualToken, {
+        onNotification: () => {
+          void loadNotifications();
+          void loadUnreadCount();
+        },
+        onTickets: (ticketIds) => {
+          if (ticketIds === null) {
+            void loadTickets();
+            return;
+          }
+          // Recharger seulement les tickets modifiés
+          refetchTickets<Ticket>(actualToken, ticketIds)
+            .then((update) => setTickets(update))
+            .catch((err) => console.error("Erreur lors du rafraîchissement des tickets:", err));
+        },
+        onResync: () => {
+          void loadTickets();
+          void loadNotifications();
+          void loadUnreadCount();
+        },
+      });
     }
   }, [actualToken]);
 
@@ -0,0 +1,141 @@
+// Flux temps réel (Server-Sent Events) partagé par les tableaux de bord.
+// EventSource ne peut pas envoyer l'en-tête Authorization : chaque (re)connexion demande
+// d'abord un ticket à usage unique (POST /notifications/stream-ticket) passé dans l'URL,
+// le JWT n'apparaît donc jamais dans l'URL.
+
+const API_URL = "http://localhost:8000";
+// Délai avant reconnexion après une coupure (ms)
+const RECONNECT_DELAY_MS = 5000;
+// Les événements "ticket" reçus dans cette fenêtre ne déclenchent qu'un appel à onTickets (ms)
+const TICKET_COALESCE_MS = 1000;
+// Au-delà de ce nombre de tickets modifiés, la liste est rechargée au lieu de chaque ticket
+const MAX_TICKET_REFETCH = 20;
+// Intervalle minimal entre deux rechargements complets demandés par onTickets(null) (ms)
+const TICKET_RELOAD_INTERVAL_MS = 30000;
+
+export type RealtimeHandlers = {
+  onNotification: () => void;
+  // Des tickets ont changé (appel regroupé sur TICKET_COALESCE_MS) : recharger ces tickets seulement.
+  // null : l'événement ne liste pas les tickets (instruction trop large), recharger la liste ;
+  // ces rechargements sont espacés d'au moins TICKET_RELOAD_INTERVAL_MS
+  onTickets: (ticketIds: number[] | null) => void;
+  // Des événements ont pu être perdus (reconnexion, redémarrage de l'écoute) : tout recharger
+  onResync: () => void;
+};
+
+// Ouvre le flux et retourne la fonction de fermeture (à appeler au démontage du composant)
+export function openRealtimeStream(token: string, handlers: RealtimeHandlers): () => void {
+  let events: EventSource | null = null;
+  let reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+  let ticketTimer: ReturnType<typeof setTimeout> | null = null;
+  let closed = false;
+  let connectedOnce = false;
+  let pendingTicketIds = new Set<number>();
+  let pendingReload = false;
+  let lastReload = 0;
+
+  const flushTickets = () => {
+    ticketTimer = null;
+    if (pendingReload || pendingTicketIds.size > MAX_TICKET_REFETCH) {
+      // Rechargement complet : reporté tant que le précédent est trop récent, les événements
+      // reçus entre-temps y sont inclus
+      const wait = lastReload + TICKET_RELOAD_INTERVAL_MS - Date.now();
+      if (wait > 0) {
+        pendingReload = true;
+        ticketTimer = setTimeout(flushTickets, wait);
+        return;
+      }
+      resetTickets();
+      handlers.onTickets(null);
+      return;
+    }
+    const ticketIds = Array.from(pendingTicketIds);
+    pendingTicketIds = new Set();
+    if (ticketIds.length > 0) handlers.onTickets(ticketIds);
+  };
+
+  // Un rechargement complet (onTickets(null) ou onResync) couvre tous les événements en attente
+  const resetTickets = () => {
+    lastReload = Date.now();
+    pendingReload = false;
+    pendingTicketIds = new Set();
+    if (ticketTimer !== null) {
+      clearTimeout(ticketTimer);
+      ticketTimer = null;
+    }
+  };
+
+  const scheduleTickets = (event: MessageEvent) => {
+    try {
+      const data = JSON.parse(event.data);
+      if (Array.isArray(data.tickets)) {
+        for (const ticket of data.tickets) pendingTicketIds.add(ticket.id);
+      } else {
+        pendingReload = true;
+      }
+    } catch {
+      pendingReload = true;
+    }
+    if (ticketTimer === null) ticketTimer = setTimeout(flushTickets, TICKET_COALESCE_MS);
+  };
+
+  const resync = () => {
+    resetTickets();
+    handlers.onResync();
+  };
+
+  const scheduleReconnect = () => {
+    if (closed || reconnectTimer !== null) return;
+    reconnectTimer = setTimeout(() => {
+      reconnectTimer = null;
+      void connect();
+    }, RECONNECT_DELAY_MS);
+  };
+
+  const connect = async () => {
+    let ticket: string;
+    try {
+      const res = await fetch(`${API_URL}/notifications/stream-ticket`, {
+        method: "POST",
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (!res.ok) {
+        // 401 : session expirée, inutile de réessayer avec le même jeton
+        if (res.status !== 401) scheduleReconnect();
+        return;
+      }
+      ticket = (await res.json()).ticket;
+    } catch (err) {
+      console.error("Erreur ouverture du flux temps réel:", err);
+      scheduleReconnect();
+      return;
+    }
+    if (closed) return;
+
+    events = new EventSource(`${API_URL}/notifications/stream?ticket=${encodeURIComponent(ticket)}`);
+    events.addEventListener("open", () => {
+      // Après une reconnexion, les événements émis pendant la coupure sont perdus
+      if (connectedOnce) resync();
+      connectedOnce = true;
+    });
+    events.addEventListener("notification", () => handlers.onNotification());
+    events.addEventListener("ticket", scheduleTickets);
+    events.addEventListener("resync", resync);
+    // Le ticket est consommé : la reconnexion automatique d'EventSource échouerait,
+    // on ferme et on rouvre avec un nouveau ticket
+    events.addEventListener("error", () => {
+      events?.close();
+      events = null;
+      scheduleReconnect();
+    });
+  };
+
+  void connect();
+
+  return () => {
+    closed = true;
+    events?.close();
+    if (reconnectTimer !== null) clearTimeout(reconnectTimer);
+    if (ticketTimer !== null) clearTimeout(ticketTimer);
+  };
+}
@@ -0,0 +1,111 @@
+// Chargement des listes de tickets partagé par les tableaux de bord.
+// Les listes sont lues page par page (curseur next_cursor) : aucune réponse ne dépasse
+// PAGE_SIZE tickets, et après une action seul le ticket modifié est remplacé dans la liste.
+
+const API_URL = "http://localhost:8000";
+// Taille maximale d'une page acceptée par l'API (MAX_PAGE_SIZE dans app/pagination.py)
+const PAGE_SIZE = 200;
+
+type TicketPage<T> = {
+  items: T[];
+  next_cursor: string | null;
+};
+
+// Réponse HTTP en erreur pendant le chargement d'une liste (status : code HTTP, ex. 401)
+export class TicketLoadError extends Error {
+  status: number;
+
+  constructor(status: number) {
+    super(`Chargement des tickets impossible (HTTP ${status})`);
+    this.status = status;
+  }
+}
+
+// Charge toutes les pages d'une liste (/tickets/, /tickets/me, /tickets/assigned).
+// Lève TicketLoadError si une page est refusée : la liste affichée est alors conservée.
+export async function fetchTicketPages<T>(
+  token: string,
+  path: string,
+  params: Record<string, string> = {},
+): Promise<T[]> {
+  const tickets: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const url = new URL(`${API_URL}${path}`);
+    url.searchParams.set("limit", String(PAGE_SIZE));
+    for (const [key, value] of Object.entries(params)) {
+      url.searchParams.set(key, value);
+    }
+    if (cursor !== null) url.searchParams.set("cursor", cursor);
+
+    const res = await fetch(url.toString(), {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+    if (!res.ok) throw new TicketLoadError(res.status);
+    const page: TicketPage<T> = await res.json();
+    tickets.push(...page.items);
+    cursor = page.next_cursor;
+  } while (cursor !== null);
+  return tickets;
+}
+
+// Remplace dans la liste les tickets mis à jour (même id) ; les nouveaux sont ajoutés en tête,
+// comme dans l'ordre de l'API (plus récents d'abord)
+export function mergeTickets<T extends { id: string | number }>(tickets: T[], updated: T[]): T[] {
+  const byId = new Map(updated.map((ticket) => [String(ticket.id), ticket]));
+  const merged = tickets.map((ticket) => {
+    const replacement = byId.get(String(ticket.id));
+    if (replacement === undefined) return ticket;
+    byId.delete(String(ticket.id));
+    return replacement;
+  });
+  return [...byId.values(), ...merged];
+}
+
+// Charge un seul ticket ; null s'il n'existe plus ou n'est plus visible (404/403)
+export async function fetchTicket<T>(token: string, ticketId: string | number): Promise<T | null> {
+  const res = await fetch(`${API_URL}/tickets/${ticketId}`, {
+    headers: { Authorization: `Bearer ${token}` },
+  });
+  if (res.status === 403 || res.status === 404) return null;
+  if (!res.ok) throw new TicketLoadError(res.status);
+  return res.json();
+}
+
+// Recharge les tickets signalés par le flux temps réel (voir onTickets dans realtime.ts) et
+// retourne la mise à jour de la liste : tickets remplacés ou ajoutés, ceux devenus
+// inaccessibles retirés. S'utilise directement avec le setter d'état : setTickets(await ...)
+export async function refetchTickets<T extends { id: string | number }>(
+  token: string,
+  ticketIds: number[],
+): Promise<(tickets: T[]) => T[]> {
+  const results = await Promise.all(ticketIds.map((id) => fetchTicket<T>(token, id)));
+  const updated = results.filter((ticket): ticket is T => ticket !== null);
+  const removed = new Set(ticketIds.filter((_, i) => results[i] === null).map(String));
+  return (tickets) => mergeTickets(tickets.filter((ticket) => !removed.has(String(ticket.id))), updated);
+}
+
+// Statistiques agrégées côté serveur (GET /tickets/stats, schéma TicketStats) : compteurs sur
+// l'ensemble des tickets, sans charger la liste. Clés : valeurs des statuts, priorités, types...
+export type TicketStats = {
+  total: number;
+  by_status: Record<string, number>;
+  by_priority: Record<string, number>;
+  by_type: Record<string, number>;
+  by_category: Record<string, number>;
+  by_agency: Record<string, number>;
+  by_month: Record<string, number>;
+};
+
+export async function fetchTicketStats(token: string): Promise<TicketStats> {
+  const res = await fetch(`${API_URL}/tickets/stats`, {
+    headers: { Authorization: `Bearer ${token}` },
+  });
+  if (!res.ok) throw new TicketLoadError(res.status);
+  return res.json();
+}
+
+// Nombre de tickets ayant l'un des statuts donnés
+export function countByStatus(stats: TicketStats, ...statuses: string[]): number {
+  return statuses.reduce((count, status) => count + (stats.by_status[status] ?? 0), 0);
+}